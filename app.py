@@ -1,23 +1,52 @@
 import os
+import glob
+import hashlib
 import uuid
 import json
 import tempfile
-from flask import Flask, request, jsonify, send_from_directory, send_file, session
+import time
+from src.importacao import record_startup_phase, import_report, print_import_report
+
+_phase_start = time.perf_counter()
+from flask import Flask, Response, request, jsonify, send_from_directory, session, stream_with_context
 from flask_cors import CORS
+from werkzeug.formparser import parse_form_data
 from werkzeug.utils import secure_filename
+_phase_start = record_startup_phase("flask", _phase_start)
 
 # Importar funções existentes
-from src.transcricao import transcribe_with_whisper
-from src.processa_texto import improve_transcript
 from src.processa_audio import process_audio_for_radio
+from src.utilidades_ffmpeg import resolve_ffmpeg
+from src.registro_modelos import get_model_registry
+from src.cache_transcricao import get_transcript_cache
+from src.armazenamento_audio import get_audio_store, PROCESSED_SAMPLE_RATE, PROCESSED_CHANNELS
+from src.montagem import clip_frame_ranges, stream_assembly, EXPORT_FORMATS
+from src.transcricao import DECODING_PROFILES, VALID_MODELS
+from src.indice_palavras import WordIndex
+from src.transcricao_compacta import CompactTranscript
+from src.armazenamento_decupagens import get_decupagem_store
+from src.recebe_upload import (UploadError, UploadSessionManager, HashingFileWriter, check_upload_name,
+                               receive_stream, finalize_upload, UPLOAD_MAX_BYTES)
+from src.admissao import ServerBusyError, get_admission_controller, admission_stats
+from src.tarefas import transcribe_file, stream_transcribe_file, get_job_manager, QueueFullError
+_phase_start = record_startup_phase("módulos do projeto", _phase_start)
 
 # Função para limpar a pasta de uploads
-def clean_uploads_folder(folder_path):
-    """Remove todos os arquivos da pasta de uploads."""
+def clean_uploads_folder(folder_path, keep_paths=()):
+    """
+    Remove os arquivos da pasta de uploads que não pertencem a nenhuma decupagem salva.
+    
+    Os arquivos em `keep_paths` (caminhos absolutos) e os PCM brutos gravados
+    ao lado deles são mantidos.
+    """
+    keep_paths = set(keep_paths)
     if os.path.exists(folder_path):
         file_count = 0
         for filename in os.listdir(folder_path):
             file_path = os.path.join(folder_path, filename)
+            absolute_path = os.path.abspath(file_path)
+            if absolute_path in keep_paths or absolute_path.rsplit('.', 2)[0] in keep_paths:
+                continue
             if os.path.isfile(file_path):
                 try:
                     os.remove(file_path)
@@ -39,12 +68,32 @@ app.secret_key = os.urandom(24)  # Adicionar chave secreta para sessões
 UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
-else:
-    # Limpar a pasta de uploads na inicialização
-    clean_uploads_folder(UPLOAD_FOLDER)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # Limitar uploads a 100MB
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES  # Limite configurável (UPLOAD_MAX_MB)
+upload_sessions = UploadSessionManager(UPLOAD_FOLDER)
+_phase_start = record_startup_phase("aplicação e uploads", _phase_start)
+
+def startup():
+    """
+    Limpeza da inicialização do servidor: marca as tarefas que o último
+    processo deixou pela metade como interrompidas, esquece os uploads antigos
+    sem transcrição e apaga os arquivos da pasta de uploads que não pertencem
+    a nenhuma decupagem salva.
+    
+    Chamada uma única vez, por quem inicia o servidor (`python app.py`,
+    wsgi.py ou o processo mestre do gunicorn), e nunca ao importar este
+    módulo: outros processos que o importam (como os do pool de transcrição)
+    apagariam os uploads em andamento.
+    """
+    store = get_decupagem_store()
+    interrupted = store.recover_interrupted_jobs()
+    if interrupted:
+        print(f"{interrupted} tarefa(s) interrompida(s) pelo último encerramento do servidor.")
+    forgotten = store.prune_uploads()
+    if forgotten:
+        print(f"{forgotten} upload(s) sem transcrição esquecido(s).")
+    clean_uploads_folder(UPLOAD_FOLDER, store.referenced_paths())
 
 # Servir o arquivo HTML
 @app.route('/')
@@ -65,30 +114,34 @@ def serve_scripts(filename):
 def serve_upload(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
-@app.route('/api/upload', methods=['POST'])
-def upload_file():
-    if 'file' not in request.files:
-        return jsonify({'error': 'Nenhum arquivo enviado'}), 400
+def register_upload(original_name, file_path, sha256=None, probe=None):
+    """
+    Processa um arquivo recebido para qualidade de rádio e o registra nas decupagens.
     
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
+    Se um upload com o mesmo conteúdo (SHA-256) ainda tiver o áudio processado em
+    disco, ele é reaproveitado: o arquivo novo é descartado e nada é reprocessado.
     
-    # Verificar se o arquivo tem uma extensão permitida
-    allowed_extensions = {'.mp3', '.wav', '.flac', '.aac', '.ogg', '.m4a'}
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    Returns:
+        dict: Resposta JSON do upload
+    """
+    store = get_decupagem_store()
+    duration = (probe or {}).get('duration')
     
-    if file_ext not in allowed_extensions:
-        return jsonify({'error': 'Formato de arquivo não suportado'}), 400
-    
-    # Gerar um nome de arquivo único para evitar conflitos
-    secure_name = secure_filename(file.filename)
-    unique_filename = f"{uuid.uuid4().hex}_{secure_name}"
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-    
-    # Salvar o arquivo
-    file.save(file_path)
-    app.logger.info(f"Arquivo salvo em: {file_path}")
+    existing = store.find_upload_by_sha256(sha256) if sha256 else None
+    if existing is not None:
+        os.remove(file_path)
+        app.logger.info(f"Upload repetido, reaproveitando: {existing['processed_path']}")
+        session['current_file_path'] = existing['file_path']
+        session['file_path'] = existing['processed_path']
+        return {
+            'message': 'Arquivo já enviado anteriormente; áudio processado reaproveitado',
+            'file_path': existing['processed_path'],
+            'file_url': f"/uploads/{os.path.basename(existing['processed_path'])}",
+            'upload_id': existing['id'],
+            'sha256': sha256,
+            'audio': probe,
+            'deduplicated': True
+        }
     
     # Salvar o caminho original na sessão
     session['current_file_path'] = file_path
@@ -99,54 +152,212 @@ def upload_file():
         processed_path = process_audio_for_radio(file_path)
         app.logger.info(f"Áudio processado para padrões de rádio: {processed_path}")
         
+        # Registrar o upload para que ele sobreviva a reinícios enquanto estiver em uso
+        upload_id = store.add_upload(original_name, file_path, processed_path, sha256, duration)
+        
         # Atualizar o caminho para o arquivo processado
-        file_path = processed_path
         session['file_path'] = processed_path
         
-        # Criar URL relativa para o arquivo processado
-        relative_path = f"/uploads/{os.path.basename(processed_path)}"
-        
-        return jsonify({
+        return {
             'message': 'Arquivo enviado e processado com sucesso',
             'file_path': processed_path,
-            'file_url': relative_path
-        }), 200
+            'file_url': f"/uploads/{os.path.basename(processed_path)}",
+            'upload_id': upload_id,
+            'sha256': sha256,
+            'audio': probe
+        }
     except Exception as e:
         app.logger.error(f"Erro ao processar áudio: {e}")
         # Continuar com o arquivo original em caso de erro
         session['file_path'] = file_path
+        upload_id = store.add_upload(original_name, file_path, sha256=sha256, duration=duration)
         
-        return jsonify({
+        return {
             'message': 'Arquivo enviado com sucesso (sem processamento)',
             'file_path': file_path,
-            'file_url': f"/uploads/{unique_filename}"
-        }), 200
+            'file_url': f"/uploads/{os.path.basename(file_path)}",
+            'upload_id': upload_id,
+            'sha256': sha256,
+            'audio': probe
+        }
+
+def unique_upload_path(original_name):
+    """Caminho na pasta de uploads com um nome único, para evitar conflitos."""
+    unique_filename = f"{uuid.uuid4().hex}_{secure_filename(original_name)}"
+    return os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+
+def receive_multipart_upload():
+    """
+    Lê um upload multipart com o parser do Werkzeug, gravando o campo 'file'
+    direto no arquivo parcial da pasta de uploads e calculando o SHA-256 na
+    mesma passada (sem o arquivo temporário que o Werkzeug criaria).
+    
+    Returns:
+        tuple: (nome original, caminho final do arquivo, digest SHA-256)
+    """
+    received = {}
+    
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        if received:
+            raise UploadError('Envie um único arquivo por requisição')
+        check_upload_name(filename)
+        received['name'] = filename
+        received['path'] = unique_upload_path(filename)
+        received['writer'] = HashingFileWriter(f"{received['path']}.part", hashlib.sha256(), UPLOAD_MAX_BYTES)
+        return received['writer']
+    
+    try:
+        # silent=False: sem ele, o Werkzeug engoliria o UploadError (um ValueError) e devolveria um formulário vazio
+        _, _, files = parse_form_data(request.environ, stream_factory=stream_factory,
+                                      max_content_length=app.config['MAX_CONTENT_LENGTH'], silent=False)
+        if 'file' not in files:
+            raise UploadError('Nenhum arquivo enviado')
+    except BaseException as e:
+        if received:
+            received['writer'].close()
+            if os.path.exists(received['writer'].path):
+                os.remove(received['writer'].path)
+        if isinstance(e, ValueError) and not isinstance(e, UploadError):
+            raise UploadError('Formulário multipart inválido') from e
+        raise
+    received['writer'].close()
+    return received['name'], received['path'], received['writer'].digest
+
+@app.route('/api/upload', methods=['POST'])
+def upload_file():
+    """
+    Recebe um arquivo de áudio em uma única requisição.
+    
+    Aceita multipart (campo 'file') ou o corpo bruto do arquivo com o nome em
+    `?filename=`. Nos dois casos os bytes vão da conexão direto para o arquivo
+    parcial na pasta de uploads, com o SHA-256 calculado durante a cópia.
+    """
+    try:
+        if request.mimetype == 'multipart/form-data':
+            original_name, file_path, digest = receive_multipart_upload()
+        else:
+            original_name = request.args.get('filename', '')
+            check_upload_name(original_name)
+            file_path = unique_upload_path(original_name)
+            digest = hashlib.sha256()
+            try:
+                receive_stream(request.stream, f"{file_path}.part", digest, UPLOAD_MAX_BYTES)
+            except BaseException:
+                if os.path.exists(f"{file_path}.part"):
+                    os.remove(f"{file_path}.part")
+                raise
+        probe = finalize_upload(f"{file_path}.part", file_path)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    app.logger.info(f"Arquivo salvo em: {file_path}")
+    
+    return jsonify(register_upload(original_name, file_path, digest.hexdigest(), probe)), 200
+
+# Uploads retomáveis em blocos, para arquivos grandes (horas de áudio)
+@app.route('/api/uploads', methods=['POST'])
+def create_upload_session():
+    """Abre uma sessão de upload: {"filename": ..., "size": bytes}."""
+    data = request.get_json(silent=True) or {}
+    try:
+        upload_session = upload_sessions.create(data.get('filename', ''), data.get('size'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify(upload_session.to_dict()), 201
+
+@app.route('/api/uploads/<session_id>', methods=['GET'])
+def upload_session_status(session_id):
+    """Quanto da sessão já foi recebido, para o cliente retomar o envio."""
+    upload_session = upload_sessions.get(session_id)
+    if upload_session is None:
+        return jsonify({'error': 'Sessão de upload não encontrada'}), 404
+    return jsonify(upload_session.to_dict())
+
+@app.route('/api/uploads/<session_id>', methods=['PUT'])
+def upload_session_chunk(session_id):
+    """
+    Recebe um bloco da sessão no corpo da requisição, começando em `?offset=`.
+    
+    Com o último bloco, o arquivo é conferido, processado e registrado, e a
+    resposta é a mesma de /api/upload.
+    """
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'error': 'Informe o offset do bloco'}), 400
+    
+    try:
+        upload_session = upload_sessions.write_chunk(session_id, offset, request.stream)
+    except UploadError as e:
+        current = upload_sessions.get(session_id)
+        payload = {'error': str(e)}
+        if current is not None:
+            payload['offset'] = current.received
+        return jsonify(payload), e.status
+    
+    if not upload_session.complete:
+        return jsonify(upload_session.to_dict())
+    
+    part_path, original_name, sha256 = upload_sessions.finish(session_id)
+    file_path = unique_upload_path(original_name)
+    try:
+        probe = finalize_upload(part_path, file_path)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    app.logger.info(f"Arquivo salvo em: {file_path}")
+    
+    return jsonify(register_upload(original_name, file_path, sha256, probe)), 200
+
+@app.route('/api/uploads/<session_id>', methods=['DELETE'])
+def cancel_upload_session(session_id):
+    if not upload_sessions.cancel(session_id):
+        return jsonify({'error': 'Sessão de upload não encontrada'}), 404
+    return jsonify({'message': 'Upload cancelado'})
+
+def decoding_options(data):
+    """
+    Lê o perfil de decodificação e o modelo pedidos ('profile' e 'model').
+    
+    Returns:
+        tuple: (perfil, modelo, mensagem de erro ou None); valores ausentes ficam None
+        e são resolvidos pelo perfil padrão da configuração
+    """
+    profile = data.get('profile') or None
+    model = data.get('model') or None
+    if profile is not None and profile not in DECODING_PROFILES:
+        return None, None, f"Perfil inválido. Use um de: {', '.join(DECODING_PROFILES)}"
+    if model is not None and model not in VALID_MODELS:
+        return None, None, f"Modelo inválido. Use um de: {', '.join(VALID_MODELS)}"
+    return profile, model, None
+
+@app.route('/api/decoding-profiles', methods=['GET'])
+def decoding_profiles():
+    """Perfis de decodificação disponíveis e seus parâmetros."""
+    return jsonify({
+        name: {'model': settings['model'], 'beam_size': settings['beam_size'],
+               'temperature': list(settings['temperature'])}
+        for name, settings in DECODING_PROFILES.items()
+    }), 200
 
 @app.route('/api/transcribe', methods=['POST'])
 def transcribe():
-    data = request.json
+    data = request.json or {}
     file_path = data.get('file_path')
     
-    # Valores fixos para idioma e modelo
+    # Idioma fixo; perfil de decodificação e modelo podem ser escolhidos por requisição
     language = 'pt-BR'
-    model = 'small'
     enhance = True
+    profile, model, error = decoding_options(data)
+    if error:
+        return jsonify({'error': error}), 400
     
     if not file_path or not os.path.exists(file_path):
         return jsonify({'error': 'Arquivo não encontrado'}), 404
     
     try:
-        # Realizar a transcrição usando a função existente
-        result = transcribe_with_whisper(file_path, language, model)
-        
-        # Obter o texto completo
-        transcript_text = result["text"]
-        
-        # Aplicar aprimoramento ao texto completo se solicitado
-        if enhance and transcript_text and not transcript_text.startswith("Erro:"):
-            enhanced_text = improve_transcript(transcript_text)
-            # Atualizar o texto completo mantendo os segmentos com timestamps
-            result["text"] = enhanced_text
+        # Realizar a transcrição e aplicar o aprimoramento ao texto completo, ocupando uma vaga
+        # do controle de admissão (sem vaga, ServerBusyError vira 429)
+        with get_admission_controller('transcription').slot():
+            result = transcribe_file(file_path, language, model, enhance, profile=profile)
         
         # NÃO remover o arquivo neste ponto, já que precisamos dele para a montagem
         # try:
@@ -154,15 +365,250 @@ def transcribe():
         # except:
         #     pass
         
-        return jsonify(result), 200
+        # Guardar a decupagem para que ela possa ser reaberta sem transcrever de novo
+        transcript_id = get_decupagem_store().save_transcript(file_path, result, language)
+        
+        # Índice de palavras para que o cliente converta seleções em tempos sem percorrer a transcrição
+        index = WordIndex.from_segments(result.get('segments', [])).to_dict()
+        if data.get('format') == 'compact':
+            # Formato em colunas: várias vezes menor que um objeto por segmento e por palavra
+            result = CompactTranscript.from_result(result).to_wire()
+        return jsonify(dict(result, index=index, transcript_id=transcript_id)), 200
         
+    except ServerBusyError:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/transcribe/stream', methods=['POST'])
+def transcribe_stream():
+    """
+    Transcreve em streaming (NDJSON): cada linha é um evento com os segmentos
+    já aprimorados, com timestamps por palavra, assim que cada bloco é decodificado.
+    """
+    data = request.json or {}
+    file_path = data.get('file_path')
+    
+    # Idioma fixo; perfil de decodificação e modelo podem ser escolhidos por requisição
+    language = 'pt-BR'
+    enhance = True
+    profile, model, error = decoding_options(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if not file_path or not os.path.exists(file_path):
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    
+    def generate():
+        segments = []
+        try:
+            for event in stream_transcribe_file(file_path, language, model, enhance, profile):
+                if event['type'] == 'segments':
+                    segments.extend(event['segments'])
+                elif event['type'] == 'done':
+                    # Guardar a decupagem completa antes de avisar o cliente
+                    result = {'text': event['text'], 'segments': segments,
+                              'profile': event['profile'], 'model': event['model']}
+                    transcript_id = get_decupagem_store().save_transcript(file_path, result, language)
+                    event = dict(event, transcript_id=transcript_id)
+                yield json.dumps(event, ensure_ascii=False) + '\n'
+        except Exception as e:
+            print(f"Erro na transcrição em streaming: {type(e).__name__}: {e}")
+            yield json.dumps({'type': 'error', 'error': str(e)}, ensure_ascii=False) + '\n'
+    
+    # A vaga de transcrição é ocupada antes da resposta (sem vaga, 429) e liberada ao fim do streaming
+    controller = get_admission_controller('transcription')
+    controller.acquire()
+    
+    # Desativar o buffer de proxies para que cada evento chegue imediatamente
+    return Response(stream_with_context(controller.hold(generate())), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Enfileira uma transcrição e retorna imediatamente o ID da tarefa."""
+    data = request.json or {}
+    file_path = data.get('file_path')
+    
+    # Idioma fixo; perfil de decodificação e modelo podem ser escolhidos por requisição
+    language = 'pt-BR'
+    enhance = True
+    profile, model, error = decoding_options(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if not file_path or not os.path.exists(file_path):
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    
+    try:
+        job = get_job_manager().submit(file_path, language, model, enhance, profile)
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+    
+    response = job.to_dict()
+    response['status_url'] = f"/api/jobs/{job.id}"
+    return jsonify(response), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({'jobs': [job.to_dict() for job in get_job_manager().list()]}), 200
+
+# Endpoints pesados sem vaga no controle de admissão
+@app.errorhandler(ServerBusyError)
+def server_busy(error):
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+# Vagas ocupadas, filas, recusas e tempos de espera dos endpoints pesados e da fila de tarefas
+@app.route('/api/admission/stats', methods=['GET'])
+def admission_metrics():
+    jobs = get_job_manager().list()
+    return jsonify(dict(admission_stats(), jobs={
+        'queued': sum(1 for job in jobs if job.status == 'queued'),
+        'running': sum(1 for job in jobs if job.status == 'running'),
+    }))
+
+# Tempos de inicialização, importações sob demanda e FFmpeg em uso
+@app.route('/api/startup', methods=['GET'])
+def startup_report():
+    return jsonify(dict(import_report(), ffmpeg=resolve_ffmpeg().to_dict()))
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Status e progresso de uma tarefa; inclui o resultado quando concluída.
+    
+    Com `?since=N`, inclui também os segmentos já aprimorados a partir do índice N;
+    com `?format=compact`, o resultado vem no formato em colunas.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        # Tarefas já descartadas da memória ou de antes de um reinício: último status registrado
+        stored_job = get_decupagem_store().get_job(job_id)
+        if stored_job is None:
+            return jsonify({'error': 'Tarefa não encontrada'}), 404
+        return jsonify(dict(stored_job, job_id=stored_job.pop('id'))), 200
+    since = request.args.get('since', type=int)
+    compact = request.args.get('format') == 'compact'
+    return jsonify(job.to_dict(include_result=True, segments_since=since, compact=compact)), 200
+
+@app.route('/api/jobs/<job_id>/resolve', methods=['GET'])
+def resolve_job_range(job_id):
+    """
+    Converte uma seleção de texto em intervalo de áudio, ou um tempo em palavras, na transcrição da tarefa.
+    
+    Com `?char_start=&char_end=` (posições no texto exibido) retorna os tempos
+    das palavras selecionadas; com `?start=` (e opcionalmente `end=`, em
+    segundos) retorna as palavras faladas e suas posições no texto.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    index = job.word_index
+    if index is None:
+        return jsonify({'error': 'Transcrição ainda não concluída'}), 409
+    
+    char_start = request.args.get('char_start', type=int)
+    char_end = request.args.get('char_end', type=int)
+    start = request.args.get('start', type=float)
+    end = request.args.get('end', type=float)
+    if char_start is not None and char_end is not None:
+        resolved = index.resolve_chars(char_start, char_end)
+    elif start is not None:
+        resolved = index.resolve_times(start, end)
+    else:
+        return jsonify({'error': 'Informe char_start e char_end ou start (e end)'}), 400
+    
+    if resolved is None:
+        return jsonify({'error': 'Nenhuma palavra no intervalo'}), 404
+    return jsonify(resolved), 200
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/decupagens', methods=['GET'])
+def list_decupagens():
+    """Decupagens salvas, das mais recentes para as mais antigas (`?limit=` e `?offset=`)."""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    offset = request.args.get('offset', 0, type=int)
+    decupagens, total = get_decupagem_store().list_transcripts(limit, offset)
+    return jsonify({'decupagens': decupagens, 'total': total}), 200
+
+@app.route('/api/decupagens/<transcript_id>', methods=['GET'])
+def load_decupagem(transcript_id):
+    """
+    Reabre uma decupagem salva: transcrição completa, índice de palavras e áudio.
+    
+    Com `?format=compact`, o resultado vem no formato em colunas.
+    """
+    metadata, transcript = get_decupagem_store().get_transcript(transcript_id)
+    if metadata is None:
+        return jsonify({'error': 'Decupagem não encontrada'}), 404
+    
+    full_result = transcript.to_dict()
+    result = transcript.to_wire() if request.args.get('format') == 'compact' else full_result
+    index = WordIndex.from_segments(full_result['segments']).to_dict()
+    return jsonify(dict(result, index=index, transcript_id=transcript_id, metadata=metadata,
+                        file_path=metadata['audio_path'],
+                        file_url=f"/api/decupagens/{transcript_id}/audio")), 200
+
+@app.route('/api/decupagens/<transcript_id>/audio', methods=['GET'])
+def decupagem_audio(transcript_id):
+    """Áudio de uma decupagem salva, onde quer que ele esteja (upload ou arquivo da linha de comando)."""
+    metadata = get_decupagem_store().get_transcript_summary(transcript_id)
+    if metadata is None or not metadata['audio_available']:
+        return jsonify({'error': 'Áudio não encontrado'}), 404
+    audio_path = metadata['audio_path']
+    return send_from_directory(os.path.dirname(audio_path), os.path.basename(audio_path))
+
+@app.route('/api/decupagens/<transcript_id>', methods=['DELETE'])
+def delete_decupagem(transcript_id):
+    """Remove uma decupagem salva e, se não forem mais usados, os arquivos do upload."""
+    orphaned = get_decupagem_store().delete_transcript(transcript_id)
+    if orphaned is None:
+        return jsonify({'error': 'Decupagem não encontrada'}), 404
+    for path in orphaned:
+        # Remover também os PCM brutos gravados ao lado do áudio
+        for candidate in [path] + glob.glob(f"{glob.escape(path)}.*.pcm"):
+            try:
+                os.remove(candidate)
+            except OSError:
+                pass
+    return jsonify({'message': 'Decupagem removida'}), 200
+
+@app.route('/api/models/stats', methods=['GET'])
+def model_stats():
+    """Estatísticas do registro de modelos (carregamentos, acertos e faltas)."""
+    return jsonify(get_model_registry().stats()), 200
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Estatísticas do cache de transcrições."""
+    cache = get_transcript_cache()
+    if cache is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(dict(cache.stats(), enabled=True)), 200
+
+@app.route('/api/cache', methods=['DELETE'])
+def clear_cache():
+    cache = get_transcript_cache()
+    if cache is not None:
+        cache.clear()
+    return jsonify({'message': 'Cache de transcrições limpo'}), 200
+
+@app.route('/api/audio-store/stats', methods=['GET'])
+def audio_store_stats():
+    """Estatísticas do armazenamento de áudio decodificado."""
+    return jsonify(get_audio_store().stats()), 200
+
 @app.route('/api/export-assembly', methods=['POST'])
 def export_assembly():
-    from pydub import AudioSegment
-    
     app.logger.info("Export assembly route called")
     
     try:
@@ -222,39 +668,37 @@ def export_assembly():
         
         app.logger.info(f"Processando montagem com {len(clips)} clips do arquivo {file_path}")
         
-        # Carregar o áudio original
-        app.logger.info(f"Carregando áudio do arquivo: {file_path}")
-        original_audio = AudioSegment.from_file(file_path)
-        
-        # Criar um áudio vazio para montar os clipes
-        assembly = AudioSegment.silent(duration=0)
+        output_format = request.form.get('format', 'mp3')
+        if output_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Formato de exportação não suportado: {output_format}"}), 400
+        mimetype, _ = EXPORT_FORMATS[output_format]
         
-        # Adicionar cada clipe
-        for i, clip in enumerate(clips):
-            start_ms = int(float(clip['startTime']) * 1000)
-            end_ms = int(float(clip['endTime']) * 1000)
-            
-            app.logger.info(f"Processando clipe {i+1}: {start_ms}ms - {end_ms}ms")
+        # Decodificação e codificação ocupam uma vaga de exportação até o fim do download (sem vaga, 429)
+        controller = get_admission_controller('export')
+        controller.acquire()
+        try:
+            # Usar o PCM do upload já decodificado em vez de decodificar o arquivo novamente
+            app.logger.info(f"Obtendo áudio decodificado do arquivo: {file_path}")
+            pcm = get_audio_store().get(file_path, PROCESSED_SAMPLE_RATE, PROCESSED_CHANNELS)
             
-            # Recortar o trecho
-            clip_audio = original_audio[start_ms:end_ms]
+            # Calcular os intervalos de amostras de cada clipe
+            ranges = clip_frame_ranges(clips, PROCESSED_SAMPLE_RATE, len(pcm))
+            for i, (start, end) in enumerate(ranges):
+                app.logger.info(f"Clipe {i+1}: quadros {start} - {end}")
             
-            # Adicionar à montagem
-            assembly += clip_audio
-        
-        # Criar arquivo temporário para o resultado
-        temp_file = tempfile.NamedTemporaryFile(suffix='.mp3', delete=False)
-        temp_path = temp_file.name
-        temp_file.close()
-        
-        # Exportar a montagem para o arquivo temporário
-        app.logger.info(f"Exportando montagem para: {temp_path}")
-        assembly.export(temp_path, format="mp3")
+            stream = stream_assembly(pcm, ranges, PROCESSED_SAMPLE_RATE, PROCESSED_CHANNELS, output_format)
+        except BaseException:
+            controller.release()
+            raise
         
-        # Enviar o arquivo como resposta
+        # Enviar a montagem em streaming, sem montar o áudio em memória nem gravar arquivo temporário
         app.logger.info("Enviando arquivo de montagem para download")
-        return send_file(temp_path, as_attachment=True, download_name="montagem_audio.mp3", mimetype="audio/mpeg")
+        return Response(stream_with_context(controller.hold(stream)), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename=montagem_audio.{output_format}'
+        })
         
+    except ServerBusyError:
+        raise
     except Exception as e:
         app.logger.error(f"Erro ao exportar montagem: {str(e)}")
         return jsonify({"error": f"Erro ao exportar montagem: {str(e)}"}), 500
@@ -269,7 +713,11 @@ if __name__ == '__main__':
     
     # Configurar ambiente
     setup_whisper_environment()
+    startup()
+    _phase_start = time.perf_counter()
     check_dependencies()  # This already calls check_ffmpeg()
+    record_startup_phase("verificação de dependências", _phase_start)
+    print_import_report()
     
-    # Executar o servidor Flask
+    # Executar o servidor Flask de desenvolvimento (em produção, use wsgi.py com gunicorn ou waitress)
     app.run(debug=True, port=5000)
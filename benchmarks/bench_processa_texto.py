@@ -0,0 +1,102 @@
+"""
+Microbenchmark das etapas de regex do aprimoramento de transcrições.
+
+Compara o pré-processamento (conectores e porcentagens) e o pós-processamento
+(restauração das porcentagens e correção da pontuação) da implementação
+anterior, com um `re.sub` por regra, com o motor compilado de
+`src.processa_texto`. O spaCy não participa: só as etapas de texto são medidas.
+
+A saída das duas versões é comparada. A única diferença esperada é com dois
+conectores seguidos ("mas porque"): antes o resultado dependia da ordem da
+lista de conectores, agora o ponto vai sempre antes do primeiro deles. Por
+isso o texto sintético não coloca conectores lado a lado.
+
+Uso:
+    python benchmarks/bench_processa_texto.py [--words 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.processa_texto import CONNECTORS, _prepare_text, _finalize_text
+
+VOCABULARY = ["o", "mercado", "cresceu", "ontem", "e", "a", "taxa", "caiu", "para", "os",
+              "investidores", "que", "falaram", "sobre", "economia", "brasileira", "no", "trimestre",
+              "quando", "governo", "anunciou", "medidas", "de", "ajuste", "fiscal", "com", "inflação"]
+
+def legacy_prepare(text):
+    """Pré-processamento da implementação anterior."""
+    processed_text = text
+    for connector in CONNECTORS:
+        pattern = fr'\s+{connector}\s+'
+        processed_text = re.sub(pattern, f'. {connector} ', processed_text, flags=re.IGNORECASE)
+
+    percentage_markers = {}
+    percentage_pattern = r'(\d+(?:,\d+)?(?:\.\d+)?)\s*%'
+    for i, match in enumerate(re.finditer(percentage_pattern, processed_text)):
+        marker = f"__PERCENTAGE_{i}__"
+        percentage_markers[marker] = match.group(0)
+        processed_text = processed_text.replace(match.group(0), marker)
+    return processed_text, percentage_markers
+
+def legacy_finalize(improved_text, percentage_markers):
+    """Pós-processamento da implementação anterior."""
+    for marker, percentage in percentage_markers.items():
+        improved_text = improved_text.replace(marker, percentage)
+
+    improved_text = re.sub(r'\s+([.,;:!?])', r'\1', improved_text)
+    improved_text = re.sub(r'([.,;:!?])\1+', r'\1', improved_text)
+    improved_text = re.sub(r'%\s*\.', '%.', improved_text)
+    improved_text = re.sub(r'%\.\s*,', '%, ', improved_text)
+    return improved_text
+
+def make_text(words, seed=0):
+    """Gera uma transcrição sintética com conectores, porcentagens e pontuação solta."""
+    rng = random.Random(seed)
+    tokens = []
+    for _ in range(words):
+        roll = rng.random()
+        if roll < 0.04 and not (tokens and tokens[-1] in CONNECTORS):
+            tokens.append(rng.choice(CONNECTORS))
+        elif roll < 0.06:
+            tokens.append(f"{rng.randint(1, 99)},{rng.randint(0, 9)} %")
+        elif roll < 0.09:
+            tokens.append(rng.choice([".", ",", "..", " ,", "?"]))
+        else:
+            tokens.append(rng.choice(VOCABULARY))
+    return " ".join(tokens)
+
+def run_pipeline(prepare, finalize, text):
+    processed_text, markers = prepare(text)
+    return finalize(processed_text, markers)
+
+def best_time(function, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das regex de aprimoramento de transcrições")
+    parser.add_argument("--words", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'palavras':>10} {'anterior (s)':>14} {'compilado (s)':>14} {'ganho':>8}  saída igual")
+    for words in args.words:
+        text = make_text(words)
+        legacy = best_time(run_pipeline, legacy_prepare, legacy_finalize, text, repeat=args.repeat)
+        compiled = best_time(run_pipeline, _prepare_text, _finalize_text, text, repeat=args.repeat)
+        same = (run_pipeline(legacy_prepare, legacy_finalize, text)
+                == run_pipeline(_prepare_text, _finalize_text, text))
+        print(f"{words:>10} {legacy:>14.4f} {compiled:>14.4f} {legacy / compiled:>7.1f}x  {same}")
+
+if __name__ == "__main__":
+    main()
@@ -3,60 +3,121 @@ import sys
 import argparse
 import time
 
-from src.config import setup_whisper_environment, check_dependencies, MODELS_DIR
+from src.importacao import record_startup_phase, print_import_report
+
+_phase_start = time.perf_counter()
+from src.config import setup_whisper_environment, check_dependencies
 from src.utilidades_ffmpeg import check_ffmpeg
-from src.transcricao import transcribe_with_whisper, download_whisper_model
+from src.transcricao import (resolve_profile, get_backend, DECODING_PROFILES,
+                              VALID_MODELS, BACKENDS)
+from src.tarefas import transcribe_file
 from src.auxiliares import list_audio_files, save_transcript
-from src.processa_texto import improve_transcript
+from src.lote import run_batch, SKIP_MODES, SUMMARY_FILE
+from src.armazenamento_decupagens import get_decupagem_store
+_phase_start = record_startup_phase("módulos do projeto", _phase_start)
 
-def main():
-    # Configurar ambiente para modelos locais
-    setup_whisper_environment()
-    
-    # Chamar check_ffmpeg no início
-    check_ffmpeg()
+def run_batch_mode(args, language, model, profile, enhance):
+    """Modo em lote: transcreve várias entradas sem nenhuma pergunta ao usuário."""
+    try:
+        get_backend(args.backend).model_path(model)
+    except FileNotFoundError as e:
+        print(f"{e}\nBaixe o modelo antes de rodar o lote (por exemplo: --download-model --model {model}).")
+        sys.exit(1)
     
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    summary = run_batch(args.batch, args.output_dir, language, model, profile, args.backend, enhance,
+                        workers=args.workers, skip_mode=args.skip, formats=formats, recursive=args.recursive)
+    
+    print("\n=== Resumo do lote ===")
+    for entry in summary["files"]:
+        detail = f"{entry['seconds']:.1f} s" if entry["status"] == "done" else entry.get("error", "")
+        print(f"{entry['status']:>8}  {entry['file']}  {detail}")
+    print(f"\n{summary['done']} transcrito(s), {summary['skipped']} pulado(s), {summary['errors']} erro(s) "
+          f"em {summary['total_seconds']:.1f} segundos")
+    print(f"Resumo salvo em: {os.path.join(args.output_dir, SUMMARY_FILE)}")
+    sys.exit(1 if summary["errors"] else 0)
+
+def main():
     # Configurar o parser de argumentos
     parser = argparse.ArgumentParser(description='Transcrever áudio para texto.')
     parser.add_argument('--file', '-f', help='Caminho para o arquivo de áudio')
     parser.add_argument('--output', '-o', help='Arquivo para salvar a transcrição')
     parser.add_argument('--download-model', '-d', action='store_true', help='Baixar modelo Whisper especificado e sair')
     parser.add_argument('--force-download', '-fd', action='store_true', help='Forçar download do modelo mesmo se já existir')
+    parser.add_argument('--mirror', default=None,
+                        help='Pasta ou URL base com os arquivos <modelo>.pt, no lugar do servidor oficial')
+    parser.add_argument('--connections', type=int, default=None,
+                        help='Conexões paralelas no download do modelo (padrão: MODEL_DOWNLOAD_CONNECTIONS)')
+    parser.add_argument('--parallel', '-p', type=int, default=None, metavar='N',
+                       help='Transcrever em N processos paralelos, dividindo o áudio nas pausas')
+    parser.add_argument('--profile', '-P', choices=list(DECODING_PROFILES), default=None,
+                       help='Perfil de decodificação: fast (rascunho, bem mais rápido), balanced ou accurate')
+    parser.add_argument('--model', '-m', choices=VALID_MODELS, default=None,
+                       help='Modelo Whisper (substitui o modelo padrão do perfil)')
+    parser.add_argument('--backend', '-b', choices=list(BACKENDS), default=None,
+                       help='Backend de inferência: openai (padrão) ou faster-whisper (int8, CTranslate2)')
+    
+    # Modo em lote (não interativo)
+    parser.add_argument('--batch', nargs='+', metavar='ENTRADA',
+                       help='Transcrever em lote todos os áudios de pastas, arquivos ou padrões glob, sem perguntas')
+    parser.add_argument('--output-dir', default='decupagens_salvas',
+                       help='Pasta de saída do lote (JSON/TXT por arquivo e resumo)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Processos do lote; cada um carrega o modelo uma única vez')
+    parser.add_argument('--skip', choices=SKIP_MODES, default='hash',
+                       help='Pular arquivos já transcritos: pelo hash do áudio, pela existência do JSON ou nunca')
+    parser.add_argument('--formats', default='json,txt', help='Formatos de saída do lote (json, txt)')
+    parser.add_argument('--recursive', '-r', action='store_true', help='Buscar áudios também nas subpastas')
+    parser.add_argument('--import-report', action='store_true',
+                        help='Mostrar os tempos de inicialização e das importações pesadas')
     
     # Manter os argumentos abaixo para compatibilidade, mas eles serão ignorados
     parser.add_argument('--language', '-l', default='pt-BR', help=argparse.SUPPRESS)
     parser.add_argument('--enhance', '-e', action='store_true', default=True, help=argparse.SUPPRESS)
     parser.add_argument('--whisper', '-w', action='store_true', help=argparse.SUPPRESS)
-    parser.add_argument('--model', '-m', choices=['tiny', 'base', 'small', 'medium', 'large'], default='small',
-                       help=argparse.SUPPRESS)
     
     args = parser.parse_args()
     
-    # Valores fixos para idioma e modelo
+    # Idioma fixo; o modelo vem do perfil de decodificação ou de --model
     language = 'pt-BR'
-    model = 'small'
     enhance = True
+    profile, model, _ = resolve_profile(args.profile, args.model)
+    
+    # Configurar ambiente para modelos locais
+    setup_whisper_environment()
+    
+    # Verificar o FFmpeg depois de ler os argumentos (na linha de comando, baixando a versão portátil se preciso)
+    check_ffmpeg(allow_download=True)
     
     print("=== Transcrição de Áudio para Texto ===")
     
     # Se solicitado o download do modelo, baixar e sair
     if args.download_model:
-        if download_whisper_model(model, args.force_download):
+        if get_backend(args.backend).download(model, args.force_download, args.mirror, args.connections):
             print(f"Modelo '{model}' baixado com sucesso.")
         else:
             print(f"Falha ao baixar modelo '{model}'.")
         sys.exit(0)
     
-    if not check_dependencies():
+    phase_start = time.perf_counter()
+    if not check_dependencies(args.backend):
         sys.exit(1)
-    
-    # Verificar se o modelo small está disponível localmente quando iniciado sem argumentos
-    model_path = os.path.join(MODELS_DIR, "small.pt")
-    if not os.path.exists(model_path):
-        print("\nO modelo small.pt não foi encontrado na pasta local do projeto.")
+    record_startup_phase("verificação de dependências", phase_start)
+    if args.import_report:
+        print_import_report()
+    
+    if args.batch:
+        run_batch_mode(args, language, model, profile, enhance)
+    
+    # Verificar se o modelo escolhido está disponível localmente para o backend escolhido
+    backend = get_backend(args.backend)
+    try:
+        backend.model_path(model)
+    except FileNotFoundError as e:
+        print(f"\n{e}")
         download_choice = input("Deseja baixar o modelo agora? (s/n): ")
         if download_choice.lower() == 's':
-            if not download_whisper_model("small"):
+            if not backend.download(model, mirror=args.mirror, connections=args.connections):
                 print("Falha ao baixar o modelo. O programa será encerrado.")
                 sys.exit(1)
         else:
@@ -86,19 +147,22 @@ def main():
     print(f"Caminho absoluto do arquivo: {os.path.abspath(audio_file)}")
     print(f"Tamanho do arquivo: {os.path.getsize(audio_file)} bytes")
     
-    # Usar sempre o método Whisper com valores fixos
-    transcript = transcribe_with_whisper(audio_file, language, model)
-    
-    # Aplicar aprimoramento avançado
-    if transcript and not transcript.startswith("Erro:"):
-        transcript = improve_transcript(transcript)
+    # Transcrever com o perfil escolhido e aprimorar o texto segmento a segmento
+    print(f"Perfil de decodificação: {profile} (modelo {model})")
+    result = transcribe_file(audio_file, language, model, enhance, profile=profile,
+                             parallel_workers=args.parallel, backend=args.backend)
+    transcript = result["text"]
     
     # Finalizar cronômetro
     elapsed_time = time.time() - start_time
     
+    # Registrar a decupagem (segmentos e palavras) para reabri-la depois sem transcrever de novo
+    transcript_id = get_decupagem_store().save_transcript(audio_file, result, language)
+    
     print("\n=== Transcrição ===")
     print(transcript)
     print(f"\nTempo de processamento: {elapsed_time:.2f} segundos")
+    print(f"Decupagem registrada com o ID {transcript_id} (reabra pela interface web)")
     
     # Salvar a transcrição se solicitado
     if args.output:
@@ -0,0 +1,38 @@
+# Configuração do gunicorn para produção:  gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+from src.admissao import required_threads
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+
+# Um processo por padrão: sessões de upload, fila de tarefas e controle de admissão ficam na memória
+# do processo, e o Whisper já usa todos os núcleos (divididos entre as vagas de transcrição). Com mais
+# processos, cada um carrega sua própria cópia dos modelos e tem suas próprias vagas.
+workers = int(os.environ.get("WEB_WORKERS", "1"))
+
+# Threads para as vagas e filas de espera dos endpoints pesados, com folga para uploads e estáticos
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", str(required_threads())))
+
+# Transcrições síncronas de áudios longos podem levar vários minutos
+timeout = int(os.environ.get("WEB_TIMEOUT", "900"))
+graceful_timeout = 60
+keepalive = 5
+
+# Sem preload_app: a conexão SQLite e os modelos não devem ser compartilhados entre processos via fork
+# (o mestre só importa o app para a limpeza de on_starting e fecha o armazenamento em seguida)
+preload_app = False
+
+def on_starting(server):
+    """Limpeza da inicialização (veja app.startup), uma única vez no processo mestre, antes dos workers."""
+    from app import startup
+    from src.armazenamento_decupagens import close_decupagem_store
+
+    startup()
+    # A conexão SQLite aberta aqui não deve ser herdada pelos workers
+    close_decupagem_store()
+
+def post_worker_init(worker):
+    """Carrega os modelos em cada processo antes de ele aceitar requisições."""
+    from wsgi import preload_models
+    preload_models()
@@ -4,7 +4,242 @@
 
 // API endpoints
 const API_UPLOAD = '/api/upload';
+const API_UPLOAD_SESSIONS = '/api/uploads';
+const UPLOAD_MAX_RETRIES = 5;
+const BUSY_MAX_RETRIES = 3;
 const API_TRANSCRIBE = '/api/transcribe';
+const API_TRANSCRIBE_STREAM = '/api/transcribe/stream';
+const API_JOBS = '/api/jobs';
+const JOB_POLL_INTERVAL = 1000;
+
+// Perfil de decodificação escolhido na página (fast, balanced ou accurate)
+function getDecodingProfile() {
+    const select = document.getElementById('decoding-profile');
+    return select ? select.value : undefined;
+}
+
+// Requisição a um endpoint pesado: se o servidor responder 429 (sem vaga), esperar o
+// Retry-After indicado e tentar de novo algumas vezes
+async function fetchWhenAvailable(url, options) {
+    for (let attempt = 0; ; attempt++) {
+        const response = await fetch(url, options);
+        if (response.status !== 429 || attempt >= BUSY_MAX_RETRIES) {
+            return response;
+        }
+        const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 5;
+        showStatus(`Servidor ocupado; tentando novamente em ${retryAfter} s...`, 'info');
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    }
+}
+
+// Enviar o arquivo em blocos por uma sessão de upload retomável; se a conexão
+// cair, consultar quanto o servidor já recebeu e continuar dali
+async function uploadInChunks(file, onProgress) {
+    const sessionResponse = await fetch(API_UPLOAD_SESSIONS, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size })
+    });
+    const uploadSession = await sessionResponse.json();
+    if (!sessionResponse.ok) {
+        throw new Error(uploadSession.error || 'Falha ao iniciar o upload');
+    }
+    
+    const sessionUrl = `${API_UPLOAD_SESSIONS}/${uploadSession.upload_session}`;
+    let offset = 0;
+    let retries = 0;
+    
+    while (true) {
+        let response;
+        try {
+            response = await fetch(`${sessionUrl}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: file.slice(offset, offset + uploadSession.chunk_size)
+            });
+        } catch (error) {
+            // Falha de rede: esperar um pouco e perguntar ao servidor onde continuar
+            if (++retries > UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            try {
+                const statusResponse = await fetch(sessionUrl);
+                if (statusResponse.ok) {
+                    offset = (await statusResponse.json()).offset;
+                }
+            } catch (statusError) {
+                console.warn('Servidor indisponível, tentando novamente:', statusError);
+            }
+            continue;
+        }
+        
+        const result = await response.json();
+        if (response.status === 409 && typeof result.offset === 'number' && ++retries <= UPLOAD_MAX_RETRIES) {
+            offset = result.offset;
+            continue;
+        }
+        if (!response.ok) {
+            throw new Error(result.error || 'Falha no upload do arquivo');
+        }
+        if (result.upload_session === undefined) {
+            // Último bloco: o servidor devolve o resultado do upload completo
+            return result;
+        }
+        
+        offset = result.offset;
+        retries = 0;
+        if (onProgress) {
+            onProgress(offset / file.size);
+        }
+    }
+}
+
+// Coluna de tempos do formato compacto: diferenças em milissegundos ou a lista de segundos
+function decodeTimeColumn(column) {
+    if (Array.isArray(column)) {
+        return column;
+    }
+    const values = new Array(column.ms_delta.length);
+    let milliseconds = 0;
+    for (let i = 0; i < column.ms_delta.length; i++) {
+        milliseconds += column.ms_delta[i];
+        values[i] = milliseconds / 1000;
+    }
+    return values;
+}
+
+// Converter uma transcrição no formato compacto (colunas) para {text, segments, ...}
+function expandCompactTranscript(data) {
+    if (!data || data.format !== 'compact-1') {
+        return data;
+    }
+    
+    const { format, buffer, segments: segmentColumns, words: wordColumns, extras, ...meta } = data;
+    const segmentStarts = decodeTimeColumn(segmentColumns.start);
+    const segmentEnds = decodeTimeColumn(segmentColumns.end);
+    const wordStarts = decodeTimeColumn(wordColumns.start);
+    const wordEnds = decodeTimeColumn(wordColumns.end);
+    const segmentExtras = (extras && extras.segments) || {};
+    const wordExtras = (extras && extras.words) || {};
+    
+    // O buffer traz primeiro os textos guardados dos segmentos e depois os das palavras
+    let wordPosition = segmentColumns.text_length.reduce((total, length) => total + Math.max(length, 0), 0);
+    let segmentPosition = 0;
+    let wordIndex = 0;
+    const segments = [];
+    
+    for (let i = 0; i < segmentColumns.id.length; i++) {
+        const segment = {
+            id: segmentColumns.id[i],
+            start: segmentStarts[i],
+            end: segmentEnds[i],
+            text: ''
+        };
+        
+        const words = [];
+        for (let j = 0; j < Math.max(segmentColumns.word_count[i], 0); j++, wordIndex++) {
+            const length = wordColumns.text_length[wordIndex];
+            words.push(Object.assign({
+                word: buffer.substr(wordPosition, length),
+                start: wordStarts[wordIndex],
+                end: wordEnds[wordIndex]
+            }, wordExtras[wordIndex]));
+            wordPosition += length;
+        }
+        
+        const textLength = segmentColumns.text_length[i];
+        if (textLength >= 0) {
+            segment.text = buffer.substr(segmentPosition, textLength);
+            segmentPosition += textLength;
+        } else {
+            // Texto do segmento igual à junção das suas palavras
+            segment.text = words.map(word => word.word).join('').trim();
+        }
+        if (segmentColumns.word_count[i] >= 0) {
+            segment.words = words;
+        }
+        segments.push(Object.assign(segment, segmentExtras[i]));
+    }
+    
+    return Object.assign(meta, { segments: segments });
+}
+
+// Aguardar a conclusão de uma tarefa de transcrição consultando seu status.
+// onSegments recebe os segmentos já aprimorados à medida que ficam prontos.
+async function waitForJob(jobId, onProgress, onSegments) {
+    let segmentsReceived = 0;
+    
+    while (true) {
+        const response = await fetch(`${API_JOBS}/${jobId}?since=${segmentsReceived}&format=compact`);
+        const job = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(job.error || 'Falha ao consultar a transcrição');
+        }
+        
+        if (onProgress) {
+            onProgress(job.progress);
+        }
+        
+        if (job.segments && job.segments.length) {
+            segmentsReceived += job.segments.length;
+            if (onSegments) {
+                onSegments(job.segments);
+            }
+        }
+        
+        if (job.status === 'done') {
+            return expandCompactTranscript(job.result);
+        }
+        if (job.status === 'error') {
+            throw new Error(job.error || 'Falha na transcrição');
+        }
+        if (job.status === 'cancelled') {
+            throw new Error('Transcrição cancelada');
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+}
+
+// Transcrever pela fila de tarefas, consultando o progresso (navegadores sem streaming)
+async function transcribeWithJob(filePath, profile) {
+    const jobResponse = await fetchWhenAvailable(API_JOBS, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            file_path: filePath,
+            profile: profile
+        })
+    });
+    
+    if (!jobResponse.ok) {
+        const errorData = await jobResponse.json();
+        throw new Error(errorData.error || 'Falha na transcrição');
+    }
+    
+    // Acompanhar o progresso da transcrição no servidor
+    const job = await jobResponse.json();
+    showStatus('Convertendo fala em texto...', 'info');
+    
+    // Exibir os segmentos já pontuados enquanto o restante é transcrito
+    const partialSegments = [];
+    
+    return waitForJob(job.job_id, progress => {
+        // A transcrição ocupa a faixa de 45% a 95% da barra
+        showProgress(45 + Math.round(progress * 0.5));
+        if (progress >= 95) {
+            showStatus('Aplicando pontuação e formatação...', 'info');
+        }
+    }, segments => {
+        partialSegments.push(...segments);
+        document.getElementById('transcription-section').style.display = 'block';
+        displayTranscriptionWithTimestamps({ segments: partialSegments });
+    });
+}
 
 // Em api-service.js, adicionar uma função de teste
 async function testServerConnection() {
@@ -34,7 +269,7 @@ document.addEventListener('DOMContentLoaded', async function() {
 // Modificar a função processTranscription
 
 async function processTranscription(file) {
-    console.log("Enviando requisição para:", API_UPLOAD);
+    console.log("Enviando requisição para:", API_UPLOAD_SESSIONS);
     console.log("Dados enviados:", file.name, file.size, file.type);
     
     if (!file) {
@@ -56,22 +291,14 @@ async function processTranscription(file) {
     try {
         // 1. Preparando arquivo
         showStatus('Preparando arquivo para upload...', 'info');
-        const uploadData = new FormData();
-        uploadData.append('file', file);
         showProgress(10);
         
-        // 2. Enviando arquivo
+        // 2. Enviando arquivo em blocos (retomável se a conexão cair)
         showStatus('Enviando arquivo para o servidor...', 'info');
-        const uploadResponse = await fetch(API_UPLOAD, {
-            method: 'POST',
-            body: uploadData
+        const uploadResult = await uploadInChunks(file, fraction => {
+            // O envio ocupa a faixa de 10% a 25% da barra
+            showProgress(10 + Math.round(fraction * 15));
         });
-        
-        if (!uploadResponse.ok) {
-            throw new Error('Falha no upload do arquivo');
-        }
-        
-        const uploadResult = await uploadResponse.json();
         console.log("Resposta do servidor (upload):", uploadResult);
         showProgress(25); // Arquivo enviado
         showStatus('Upload concluído com sucesso!', 'info');
@@ -100,46 +327,24 @@ async function processTranscription(file) {
         showStatus('Iniciando análise de voz...', 'info');
         showProgress(45);
         
-        const transcribeResponse = await fetch(API_TRANSCRIBE, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                file_path: uploadResult.file_path
-            })
-        });
-        
-        // 5. Processos intermediários de transcrição
-        showStatus('Convertendo fala em texto...', 'info');
-        showProgress(55);
-        
-        setTimeout(() => {
-            showStatus('Identificando falantes...', 'info');
-            showProgress(65);
-        }, 800);
-        
-        setTimeout(() => {
-            showStatus('Aplicando pontuação e formatação...', 'info');
-            showProgress(75);
-        }, 1600);
+        const profile = getDecodingProfile();
+        let result;
         
-        if (!transcribeResponse.ok) {
-            const errorData = await transcribeResponse.json();
-            throw new Error(errorData.error || 'Falha na transcrição');
+        if (typeof ReadableStream !== 'undefined') {
+            // 5. Transcrição em streaming: o texto aparece enquanto o áudio é decodificado
+            showStatus('Convertendo fala em texto...', 'info');
+            document.getElementById('transcription-section').style.display = 'block';
+            
+            result = await streamTranscription(uploadResult.file_path, profile, progress => {
+                // A transcrição ocupa a faixa de 45% a 95% da barra
+                showProgress(45 + Math.round(progress * 0.5));
+            });
+        } else {
+            result = await transcribeWithJob(uploadResult.file_path, profile);
         }
         
-        // 6. Finalizando
-        showStatus('Gerando timestamps para palavras...', 'info');
-        showProgress(85);
-        
-        setTimeout(() => {
-            showStatus('Finalizando e preparando visualização...', 'info');
-            showProgress(95);
-        }, 700);
-        
-        // 7. Resultado completo
-        const result = await transcribeResponse.json();
+        // 6. Resultado completo
+        showProgress(100);
         
         // Exibir resultado
         loading.style.display = 'none';
@@ -709,7 +709,7 @@ function downloadAssemblyAudio() {
     console.log("Caminho do arquivo para processamento:", audioPath);
     
     // Enviar pedido de exportação para o servidor com timeout mais longo
-    fetch(window.location.origin + '/api/export-assembly', {
+    fetchWhenAvailable(window.location.origin + '/api/export-assembly', {
         method: 'POST',
         body: formData,
         timeout: 60000 // 60 segundos para processamentos mais longos
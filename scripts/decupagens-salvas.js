@@ -0,0 +1,115 @@
+/**
+ * Decupagens salvas: listar e reabrir transcrições anteriores sem transcrever de novo
+ */
+
+const API_DECUPAGENS = '/api/decupagens';
+
+// Carregar a lista de decupagens salvas na seção de seleção de arquivo
+async function loadSavedDecupagens() {
+    const container = document.getElementById('saved-decupagens');
+    const list = document.getElementById('saved-decupagens-list');
+    if (!container || !list) return;
+    
+    try {
+        const response = await fetch(API_DECUPAGENS);
+        if (!response.ok) {
+            throw new Error('Falha ao carregar as decupagens salvas');
+        }
+        const data = await response.json();
+        
+        list.innerHTML = '';
+        data.decupagens.forEach(decupagem => list.appendChild(createSavedDecupagemItem(decupagem)));
+        container.style.display = data.decupagens.length ? 'block' : 'none';
+    } catch (error) {
+        console.error('Erro ao carregar decupagens salvas:', error);
+        container.style.display = 'none';
+    }
+}
+
+// Criar o item da lista de uma decupagem salva
+function createSavedDecupagemItem(decupagem) {
+    const item = document.createElement('li');
+    item.className = 'saved-decupagem';
+    
+    const info = document.createElement('div');
+    info.className = 'saved-decupagem-info';
+    
+    const title = document.createElement('strong');
+    title.textContent = decupagem.title;
+    info.appendChild(title);
+    
+    const details = document.createElement('span');
+    details.className = 'saved-decupagem-details';
+    const createdAt = new Date(decupagem.created_at * 1000).toLocaleString('pt-BR');
+    details.textContent = ` ${createdAt} · ${formatTime(decupagem.duration || 0)} · ${decupagem.word_count} palavras`;
+    info.appendChild(details);
+    
+    const preview = document.createElement('p');
+    preview.className = 'saved-decupagem-preview';
+    preview.textContent = decupagem.preview || '';
+    info.appendChild(preview);
+    
+    const actions = document.createElement('div');
+    actions.className = 'saved-decupagem-actions';
+    
+    const openButton = document.createElement('button');
+    openButton.textContent = 'Abrir';
+    openButton.disabled = !decupagem.audio_available;
+    openButton.title = decupagem.audio_available ? '' : 'O arquivo de áudio não está mais disponível';
+    openButton.addEventListener('click', () => openSavedDecupagem(decupagem.id));
+    actions.appendChild(openButton);
+    
+    const deleteButton = document.createElement('button');
+    deleteButton.className = 'cancel-btn';
+    deleteButton.textContent = 'Excluir';
+    deleteButton.addEventListener('click', () => deleteSavedDecupagem(decupagem.id, decupagem.title));
+    actions.appendChild(deleteButton);
+    
+    item.appendChild(info);
+    item.appendChild(actions);
+    return item;
+}
+
+// Reabrir uma decupagem salva: transcrição, índice de palavras e áudio, sem rodar o Whisper
+async function openSavedDecupagem(transcriptId) {
+    try {
+        showStatus('Abrindo decupagem salva...', 'info');
+        const response = await fetch(`${API_DECUPAGENS}/${transcriptId}?format=compact`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || 'Falha ao abrir a decupagem');
+        }
+        
+        const result = expandCompactTranscript(data);
+        updateProcessedAudioPath(result.file_path, result.file_url);
+        
+        transcriptionData = result;
+        displayTranscriptionWithTimestamps(result);
+        initRangeSelection();
+        
+        document.getElementById('transcription-section').style.display = 'block';
+        document.getElementById('file-selection-section').style.display = 'none';
+        attachNewTranscriptionButtonListener();
+        showStatus('Decupagem reaberta com sucesso!', 'success');
+    } catch (error) {
+        console.error('Erro ao abrir decupagem:', error);
+        showStatus(`Erro: ${error.message}`, 'error');
+    }
+}
+
+// Excluir uma decupagem salva (e o áudio enviado, se não for usado por outra)
+async function deleteSavedDecupagem(transcriptId, title) {
+    if (!confirm(`Excluir a decupagem "${title}"?`)) return;
+    
+    try {
+        const response = await fetch(`${API_DECUPAGENS}/${transcriptId}`, { method: 'DELETE' });
+        if (!response.ok) {
+            const data = await response.json();
+            throw new Error(data.error || 'Falha ao excluir a decupagem');
+        }
+        loadSavedDecupagens();
+    } catch (error) {
+        console.error('Erro ao excluir decupagem:', error);
+        showStatus(`Erro: ${error.message}`, 'error');
+    }
+}
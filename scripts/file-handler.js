@@ -5,6 +5,7 @@
 // Variáveis para armazenar informações sobre o arquivo
 let originalAudioFile = null;
 let processedAudioFilePath = null;
+let processedAudioUrl = null;
 
 // Configurar evento de drag-and-drop para upload de arquivos
 function initFileUpload() {
@@ -99,6 +100,7 @@ function clearFile() {
     // Limpar dados de transcrição
     transcriptionData = null;
     wordTimestamps = [];
+    transcriptIndex = null;
     
     // Limpar seleção ativa e marcações
     if (typeof clearRangeSelection === 'function') {
@@ -141,9 +143,11 @@ function getCurrentAudioFilePath() {
     return `/uploads/${fileName}`;
 }
 
-// Atualizar com o caminho do arquivo processado quando receber a resposta da API
-function updateProcessedAudioPath(path) {
+// Atualizar com o caminho do arquivo processado quando receber a resposta da API.
+// `url` é usado quando o áudio não está na pasta uploads (decupagens salvas).
+function updateProcessedAudioPath(path, url) {
     processedAudioFilePath = path;
+    processedAudioUrl = url || null;
     console.log(`Caminho do arquivo processado atualizado: ${processedAudioFilePath}`);
     
     // Configurar o player imediatamente após atualizar o caminho
@@ -168,7 +172,7 @@ function setupAudioPlayerWithProcessedFile() {
     
     // Construir URL adequada para o navegador acessar o arquivo
     const fileName = processedAudioFilePath.split(/[/\\]/).pop();
-    const audioUrl = `/uploads/${fileName}`;
+    const audioUrl = processedAudioUrl || `/uploads/${fileName}`;
     console.log("URL final do áudio:", audioUrl);
     
     // Definir a fonte do áudio para a URL construída
@@ -84,6 +84,9 @@ function initializeApp() {
         initAssembly();
     }
     
+    // Listar as decupagens salvas
+    loadSavedDecupagens();
+    
     console.log("Aplicação inicializada com sucesso!");
 }
 
@@ -212,6 +215,9 @@ function resetApplication() {
     document.getElementById('progress-container').style.display = 'none';
     document.getElementById('loading').style.display = 'none';
     
+    // Atualizar a lista de decupagens salvas (inclui a que acabou de ser feita)
+    loadSavedDecupagens();
+    
     // Limpar trechos da montagem e esconder a seção
     if (typeof clearAllClips === 'function') {
         // Limpar array de trechos sem confirmação
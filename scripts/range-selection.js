@@ -183,12 +183,9 @@ function getSelectedRangeText() {
 
 // Obter o índice de uma palavra no array wordTimestamps
 function getWordIndex(wordElement) {
-    for (let i = 0; i < wordTimestamps.length; i++) {
-        if (wordTimestamps[i].element === wordElement) {
-            return i;
-        }
-    }
-    return -1;
+    // A posição é gravada no elemento ao renderizar a transcrição
+    const index = parseInt(wordElement.getAttribute('data-index'), 10);
+    return Number.isNaN(index) ? -1 : index;
 }
 
 // Destacar todas as palavras entre início e fim
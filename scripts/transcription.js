@@ -6,6 +6,60 @@
 let transcriptionData = null;
 let wordTimestamps = [];
 
+// Índice de palavras enviado pelo servidor (posição no texto ⇄ palavra ⇄ tempo em arrays paralelos)
+let transcriptIndex = null;
+
+// Busca binária: quantidade de itens do array ordenado que são <= value
+function bisectRight(array, value) {
+    let low = 0;
+    let high = array.length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (array[middle] <= value) {
+            low = middle + 1;
+        } else {
+            high = middle;
+        }
+    }
+    return low;
+}
+
+// Converter um trecho do texto exibido ([charStart, charEnd)) nos tempos das palavras que ele toca, em O(log n)
+function resolveCharRange(charStart, charEnd) {
+    if (!transcriptIndex || !transcriptIndex.char_starts.length || charEnd <= charStart) return null;
+    
+    // Primeira palavra que termina depois do início e última que começa antes do fim
+    const first = bisectRight(transcriptIndex.char_ends, charStart);
+    const last = bisectRight(transcriptIndex.char_starts, charEnd - 1) - 1;
+    if (first > last) return null;
+    
+    return {
+        firstWord: first,
+        lastWord: last,
+        startTime: transcriptIndex.starts_ms[first] / 1000,
+        endTime: transcriptIndex.ends_ms[last] / 1000
+    };
+}
+
+// Posição no texto da transcrição correspondente a um ponto da seleção do navegador
+function getTranscriptOffset(container, offset) {
+    const prefix = document.createRange();
+    prefix.selectNodeContents(transcript);
+    prefix.setEnd(container, offset);
+    return prefix.toString().length;
+}
+
+// Índice (em wordTimestamps) da palavra que contém um ponto da seleção, ou -1
+function getWordIndexAt(container, offset) {
+    let node = container;
+    if (node.nodeType === 1 && node.childNodes[offset]) {
+        node = node.childNodes[offset];
+    }
+    const element = node.nodeType === 1 ? node : node.parentNode;
+    const wordElement = element && element.closest ? element.closest('.transcript-word') : null;
+    return wordElement ? getWordIndex(wordElement) : -1;
+}
+
 // Mapear texto selecionado para intervalo de tempo no áudio
 function mapSelectionToAudio(selectedText) {
     if (!audioPlayer.duration || !transcript.textContent) return false;
@@ -19,40 +73,21 @@ function mapSelectionToAudio(selectedText) {
     let startTime = null;
     let endTime = null;
     
-    // Encontrar os elementos dentro da seleção com timestamps
-    const selectedNodes = getNodesInSelection(range);
-    const timestampedElements = selectedNodes.filter(node => 
-        node.nodeType === 1 && 
-        (node.hasAttribute('data-start') || (node.parentNode && node.parentNode.hasAttribute && node.parentNode.hasAttribute('data-start')))
-    );
-    
-    if (timestampedElements.length > 0) {
-        // Encontrar o elemento mais próximo do início da seleção
-        const firstElement = timestampedElements[0];
-        startTime = parseFloat(firstElement.getAttribute('data-start') || 
-                             (firstElement.parentNode && firstElement.parentNode.getAttribute('data-start')));
-        
-        // Encontrar o elemento mais próximo do fim da seleção
-        const lastElement = timestampedElements[timestampedElements.length - 1];
-        endTime = parseFloat(lastElement.getAttribute('data-end') || 
-                           (lastElement.parentNode && lastElement.parentNode.getAttribute('data-end')));
+    // As palavras nas pontas da seleção já sabem o próprio índice: sem percorrer a transcrição
+    const startIndex = getWordIndexAt(range.startContainer, range.startOffset);
+    const endIndex = getWordIndexAt(range.endContainer, range.endOffset);
+    if (startIndex !== -1 && endIndex !== -1 && startIndex <= endIndex) {
+        startTime = wordTimestamps[startIndex].start;
+        endTime = wordTimestamps[endIndex].end;
     }
     
-    // Se não encontramos elementos com timestamps, tentar buscar na lista wordTimestamps
+    // Pontas fora de uma palavra (espaços, segmentos sem timestamps por palavra): usar o índice do servidor
     if (startTime === null || endTime === null) {
-        const normalizedSelectedText = selectedText.toLowerCase().trim();
-        
-        // Buscar na lista de palavras armazenadas com timestamps
-        for (let i = 0; i < wordTimestamps.length; i++) {
-            const wordData = wordTimestamps[i];
-            if (normalizedSelectedText.includes(wordData.word.toLowerCase())) {
-                if (startTime === null || wordData.start < startTime) {
-                    startTime = wordData.start;
-                }
-                if (endTime === null || wordData.end > endTime) {
-                    endTime = wordData.end;
-                }
-            }
+        const charStart = getTranscriptOffset(range.startContainer, range.startOffset);
+        const resolved = resolveCharRange(charStart, charStart + range.toString().length);
+        if (resolved) {
+            startTime = resolved.startTime;
+            endTime = resolved.endTime;
         }
     }
     
@@ -96,25 +131,6 @@ function mapSelectionToAudio(selectedText) {
     return true;
 }
 
-// Obter todos os nós dentro de uma seleção
-function getNodesInSelection(range) {
-    const nodes = [];
-    const walker = document.createTreeWalker(
-        range.commonAncestorContainer,
-        NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT,
-        { acceptNode: node => NodeFilter.FILTER_ACCEPT }
-    );
-    
-    let node;
-    while (node = walker.nextNode()) {
-        if (range.intersectsNode(node)) {
-            nodes.push(node);
-        }
-    }
-    
-    return nodes;
-}
-
 // Lidar com a seleção de texto
 function handleTextSelection() {
     const selection = window.getSelection();
@@ -162,6 +178,7 @@ function hideSelectionControls() {
 function displayTranscriptionWithTimestamps(data) {
     // Limpar dados anteriores
     wordTimestamps = [];
+    transcriptIndex = data && data.index ? data.index : null;
     transcript.innerHTML = '';
     
     if (!data || !data.segments || !data.segments.length) {
@@ -170,7 +187,12 @@ function displayTranscriptionWithTimestamps(data) {
     }
     
     // Processar os segmentos e palavras com seus timestamps
-    data.segments.forEach(segment => {
+    appendTranscriptSegments(data.segments);
+}
+
+// Acrescentar segmentos ao final da transcrição exibida (usado também durante o streaming)
+function appendTranscriptSegments(segments) {
+    segments.forEach(segment => {
         const segmentElement = document.createElement('span');
         segmentElement.className = 'transcript-segment';
         segmentElement.setAttribute('data-start', segment.start);
@@ -200,7 +222,8 @@ function displayTranscriptionWithTimestamps(data) {
                         }
                     });
                     
-                    // Armazenar timestamps para busca rápida
+                    // Armazenar timestamps para busca rápida; o elemento guarda a própria posição
+                    wordElement.setAttribute('data-index', wordTimestamps.length);
                     wordTimestamps.push({
                         word: word.word,
                         start: word.start,
@@ -222,3 +245,72 @@ function displayTranscriptionWithTimestamps(data) {
         transcript.appendChild(segmentElement);
     });
 }
+
+// Transcrever em streaming: os segmentos são exibidos à medida que o servidor os decodifica.
+// Retorna a transcrição completa ({text, segments, profile}) quando o servidor termina.
+async function streamTranscription(filePath, profile, onProgress) {
+    const response = await fetchWhenAvailable(API_TRANSCRIBE_STREAM, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            file_path: filePath,
+            profile: profile
+        })
+    });
+    
+    if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.error || 'Falha na transcrição');
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const segments = [];
+    let buffer = '';
+    let text = null;
+    let usedProfile = null;
+    let index = null;
+    
+    wordTimestamps = [];
+    transcriptIndex = null;
+    transcript.innerHTML = '';
+    
+    // Cada linha da resposta é um evento JSON
+    const handleEvent = event => {
+        if (event.type === 'segments') {
+            segments.push(...event.segments);
+            appendTranscriptSegments(event.segments);
+            if (onProgress) {
+                onProgress(event.progress);
+            }
+        } else if (event.type === 'done') {
+            text = event.text;
+            usedProfile = event.profile;
+            index = event.index;
+        } else if (event.type === 'error') {
+            throw new Error(event.error || 'Falha na transcrição');
+        }
+    };
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+    }
+    if (buffer.trim()) {
+        handleEvent(JSON.parse(buffer));
+    }
+    
+    if (text === null) {
+        throw new Error('Transcrição interrompida');
+    }
+    return { text: text, segments: segments, profile: usedProfile, index: index };
+}
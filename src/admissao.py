@@ -0,0 +1,213 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from src.config import (ADMISSION_TRANSCRIBE_CONCURRENCY, ADMISSION_EXPORT_CONCURRENCY, ADMISSION_QUEUE_SIZE,
+                        ADMISSION_MAX_WAIT_SECONDS)
+
+# Execuções recentes usadas nas médias de espera e de duração (e na estimativa do Retry-After)
+RECENT_SAMPLES = 50
+
+# Duração presumida de uma execução antes de haver medições, em segundos
+DEFAULT_RUN_SECONDS = 10.0
+
+# Intervalo (segundos) em que uma espera cancelável confere o seu evento de cancelamento
+CANCEL_POLL_SECONDS = 0.25
+
+class ServerBusyError(Exception):
+    """Sem vaga para a requisição; `retry_after` é a espera sugerida ao cliente, em segundos."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AdmissionCancelled(Exception):
+    """A espera por uma vaga foi interrompida pelo evento de cancelamento."""
+
+class AdmissionController:
+    """
+    Controle de admissão de um tipo de requisição pesada (transcrição, exportação).
+
+    No máximo `max_concurrent` execuções rodam ao mesmo tempo; as demais
+    aguardam em uma fila de até `max_waiting` requisições, por no máximo
+    `max_wait_seconds`. Com a fila cheia ou a espera esgotada, a requisição é
+    recusada na hora com ServerBusyError (HTTP 429 com Retry-After), em vez de
+    disputar CPU e memória com as que já estão rodando. Assim a vazão fica
+    estável sob carga em vez de desabar com o sistema trocando páginas.
+    """
+
+    def __init__(self, name, max_concurrent, max_waiting, max_wait_seconds):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.max_wait_seconds = max_wait_seconds
+        self.active = 0
+        self.waiting = 0
+        self.background_waiting = 0
+        self._condition = threading.Condition()
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._peak_waiting = 0
+        self._wait_times = deque(maxlen=RECENT_SAMPLES)
+        self._run_times = deque(maxlen=RECENT_SAMPLES)
+
+    def _retry_after(self):
+        """Segundos até uma vaga provavelmente abrir: a fila dividida pelas vagas, vezes a duração média."""
+        average_run = sum(self._run_times) / len(self._run_times) if self._run_times else DEFAULT_RUN_SECONDS
+        return max(1, round(average_run * (self.waiting + 1) / self.max_concurrent))
+
+    def acquire(self, queue=True, cancel_event=None):
+        """
+        Ocupa uma vaga, esperando na fila se necessário.
+
+        Com `queue=False` (tarefas da fila assíncrona, que já têm seu próprio
+        limite), espera sem limite de fila nem de tempo. Se `cancel_event`
+        (`threading.Event`) for informado, a espera é conferida a cada
+        CANCEL_POLL_SECONDS (ou ao chamar `interrupt`) e, quando o evento for
+        marcado, desiste sem ocupar a vaga levantando AdmissionCancelled.
+
+        Returns:
+            float: Segundos de espera até a vaga
+        """
+        start = time.monotonic()
+        with self._condition:
+            if self.active >= self.max_concurrent:
+                if queue and self.waiting >= self.max_waiting:
+                    self._rejected += 1
+                    raise ServerBusyError(f"Servidor ocupado ({self.name}). Tente novamente em instantes.",
+                                          self._retry_after())
+                # Quem espera sem fila (tarefas assíncronas) não ocupa lugar na fila das requisições
+                if queue:
+                    self.waiting += 1
+                    self._peak_waiting = max(self._peak_waiting, self.waiting)
+                else:
+                    self.background_waiting += 1
+                deadline = start + self.max_wait_seconds if queue else None
+                try:
+                    while self.active >= self.max_concurrent:
+                        if cancel_event is not None and cancel_event.is_set():
+                            # Repassar a um outro em espera um aviso de vaga livre que tenha vindo para este
+                            self._condition.notify()
+                            raise AdmissionCancelled()
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            self._timed_out += 1
+                            raise ServerBusyError(f"Servidor ocupado ({self.name}): tempo de espera esgotado.",
+                                                  self._retry_after())
+                        if cancel_event is not None:
+                            remaining = CANCEL_POLL_SECONDS if remaining is None else min(remaining,
+                                                                                          CANCEL_POLL_SECONDS)
+                        self._condition.wait(remaining)
+                finally:
+                    if queue:
+                        self.waiting -= 1
+                    else:
+                        self.background_waiting -= 1
+            self.active += 1
+            self._admitted += 1
+            waited = time.monotonic() - start
+            self._wait_times.append(waited)
+            return waited
+
+    def release(self, run_seconds=None):
+        """Libera uma vaga; `run_seconds` entra na média usada para o Retry-After."""
+        with self._condition:
+            self.active -= 1
+            if run_seconds is not None:
+                self._run_times.append(run_seconds)
+            self._condition.notify()
+
+    def interrupt(self):
+        """Acorda todas as esperas para que as canceladas desistam na hora."""
+        with self._condition:
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, queue=True, cancel_event=None):
+        """Executa o bloco `with` ocupando uma vaga (veja `acquire`)."""
+        self.acquire(queue, cancel_event)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def hold(self, iterable):
+        """
+        Repassa uma resposta em streaming mantendo a vaga já obtida com `acquire`
+        até ela terminar ou a conexão ser fechada.
+        """
+        return _HeldSlot(self, iterable)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_waiting": self.max_waiting,
+                "max_wait_seconds": self.max_wait_seconds,
+                "active": self.active,
+                "waiting": self.waiting,
+                "background_waiting": self.background_waiting,
+                "peak_waiting": self._peak_waiting,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "avg_wait_seconds": round(sum(self._wait_times) / len(self._wait_times), 3)
+                                    if self._wait_times else 0.0,
+                "max_recent_wait_seconds": round(max(self._wait_times), 3) if self._wait_times else 0.0,
+                "avg_run_seconds": round(sum(self._run_times) / len(self._run_times), 3)
+                                   if self._run_times else None,
+            }
+
+class _HeldSlot:
+    """Iterável que libera a vaga do controle de admissão ao se esgotar ou ao ser fechado."""
+
+    def __init__(self, controller, iterable):
+        self._controller = controller
+        self._iterator = iter(iterable)
+        self._start = time.monotonic()
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        # Chamado também pelo servidor quando o cliente desconecta antes do fim
+        if self._released:
+            return
+        self._released = True
+        try:
+            close = getattr(self._iterator, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._controller.release(time.monotonic() - self._start)
+
+# Controles por endpoint, únicos por processo
+_controllers = {
+    "transcription": AdmissionController("transcription", ADMISSION_TRANSCRIBE_CONCURRENCY,
+                                         ADMISSION_QUEUE_SIZE, ADMISSION_MAX_WAIT_SECONDS),
+    "export": AdmissionController("export", ADMISSION_EXPORT_CONCURRENCY,
+                                  ADMISSION_QUEUE_SIZE, ADMISSION_MAX_WAIT_SECONDS),
+}
+
+def get_admission_controller(name):
+    """Retorna o controle de admissão do endpoint `name` ('transcription' ou 'export')."""
+    return _controllers[name]
+
+def admission_stats():
+    """Métricas de todos os controles: vagas ocupadas, fila, recusas e tempos de espera."""
+    return {name: controller.stats() for name, controller in _controllers.items()}
+
+def required_threads(extra=8):
+    """Threads de servidor para atender as vagas e as filas de todos os controles, com folga para o resto."""
+    return sum(controller.max_concurrent + controller.max_waiting for controller in _controllers.values()) + extra
@@ -0,0 +1,198 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from src.config import AUDIO_STORE_MEMORY_MB, AUDIO_PCM_SIDECAR, WHISPER_SAMPLE_RATE
+from src.utilidades_ffmpeg import decode_audio, resample_pcm
+
+# Formato do áudio processado (rádio/montagem); a entrada do Whisper usa WHISPER_SAMPLE_RATE da configuração
+PROCESSED_SAMPLE_RATE = 44100
+PROCESSED_CHANNELS = 2
+
+def sidecar_path(audio_path, sample_rate, channels):
+    """Caminho do arquivo PCM bruto (int16) guardado ao lado do áudio."""
+    return f"{os.path.abspath(audio_path)}.{sample_rate}x{channels}.pcm"
+
+def write_sidecar(audio_path, sample_rate, channels, pcm):
+    """Grava o PCM bruto ao lado do áudio de forma atômica."""
+    path = sidecar_path(audio_path, sample_rate, channels)
+    temp_path = f"{path}.tmp"
+    np.ascontiguousarray(pcm, dtype=np.int16).tofile(temp_path)
+    os.replace(temp_path, path)
+    return path
+
+def open_sidecar(audio_path, sample_rate, channels):
+    """
+    Mapeia em memória o PCM bruto do áudio, se existir e estiver atualizado.
+
+    Returns:
+        numpy.memmap: Array int16 (quadros, canais) somente leitura, ou None
+    """
+    path = sidecar_path(audio_path, sample_rate, channels)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(audio_path):
+            return None
+        if os.path.getsize(path) == 0:
+            return np.zeros((0, channels), dtype=np.int16)
+        return np.memmap(path, dtype=np.int16, mode="r").reshape(-1, channels)
+    except (OSError, ValueError):
+        return None
+
+class AudioStore:
+    """
+    Armazena o áudio de cada upload já decodificado em PCM 16 bits.
+
+    Cada arquivo é decodificado uma única vez por formato (taxa de amostragem e
+    canais) e o mesmo buffer é usado pela transcrição, pela detecção de silêncio
+    e pela montagem. O processamento do upload pode registrar diretamente o PCM
+    que acabou de gerar, evitando qualquer decodificação posterior. As entradas
+    são invalidadas se o arquivo mudar no disco.
+
+    Os buffers em memória respeitam um orçamento em MB, descartando os menos
+    usados (LRU). Quando há um PCM bruto gravado ao lado do áudio (sidecar), ele
+    é mapeado em memória: fatiar clipes vira uma visão sem cópia e as páginas
+    ficam a cargo do sistema operacional, sem contar no orçamento.
+    """
+
+    def __init__(self, memory_budget_mb=1024, use_sidecars=True):
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.use_sidecars = use_sidecars
+        self._uploads = OrderedDict()
+        self._lock = threading.Lock()
+        # Só existem enquanto alguma thread decodifica aquele formato: o dicionário não cresce sem limite
+        self._decode_locks = weakref.WeakValueDictionary()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _key(audio_path):
+        return os.path.abspath(audio_path)
+
+    @staticmethod
+    def _resident_bytes(pcm):
+        # Arrays mapeados de sidecars não ocupam o orçamento de memória
+        return 0 if isinstance(pcm, np.memmap) else pcm.nbytes
+
+    def put(self, audio_path, sample_rate, channels, pcm):
+        """Registra o PCM (int16, formato (quadros, canais)) de um arquivo já decodificado."""
+        key = self._key(audio_path)
+        mtime = os.path.getmtime(key)
+        with self._lock:
+            buffers = self._uploads.get(key)
+            if buffers is None or buffers["mtime"] != mtime:
+                buffers = {"mtime": mtime, "pcm": {}}
+                self._uploads[key] = buffers
+            buffers["pcm"][(sample_rate, channels)] = pcm
+            self._uploads.move_to_end(key)
+            self._evict(keep=key)
+
+    def _lookup(self, key, sample_rate, channels):
+        with self._lock:
+            buffers = self._uploads.get(key)
+            if buffers is None:
+                return None, {}
+            if buffers["mtime"] != os.path.getmtime(key):
+                # O arquivo mudou desde a decodificação
+                del self._uploads[key]
+                return None, {}
+            self._uploads.move_to_end(key)
+            return buffers["pcm"].get((sample_rate, channels)), dict(buffers["pcm"])
+
+    def get(self, audio_path, sample_rate=PROCESSED_SAMPLE_RATE, channels=PROCESSED_CHANNELS):
+        """Retorna o PCM int16 do arquivo no formato pedido, decodificando só na primeira vez."""
+        key = self._key(audio_path)
+        pcm, _ = self._lookup(key, sample_rate, channels)
+        if pcm is not None:
+            with self._lock:
+                self._hits += 1
+            return pcm
+
+        with self._lock:
+            decode_lock = self._decode_locks.get((key, sample_rate, channels))
+            if decode_lock is None:
+                decode_lock = threading.Lock()
+                self._decode_locks[(key, sample_rate, channels)] = decode_lock
+
+        with decode_lock:
+            pcm, available = self._lookup(key, sample_rate, channels)
+            if pcm is not None:
+                return pcm
+
+            with self._lock:
+                self._misses += 1
+
+            pcm = open_sidecar(key, sample_rate, channels) if self.use_sidecars else None
+            if pcm is None:
+                if available:
+                    # Converter a partir de um buffer já em memória em vez de decodificar o arquivo de novo
+                    (source_rate, source_channels), source = max(available.items(), key=lambda item: item[0])
+                    pcm = resample_pcm(source, source_rate, source_channels, sample_rate, channels)
+                else:
+                    print(f"Decodificando áudio ({sample_rate} Hz, {channels} canal(is)): {audio_path}")
+                    pcm = decode_audio(key, sample_rate, channels)
+
+                if self.use_sidecars:
+                    # Gravar o PCM bruto para que as próximas cargas sejam só um mapeamento em memória
+                    write_sidecar(key, sample_rate, channels, pcm)
+                    pcm = open_sidecar(key, sample_rate, channels)
+
+            self.put(key, sample_rate, channels, pcm)
+            return pcm
+
+    def get_whisper_audio(self, audio_path):
+        """Retorna o áudio no formato aceito pelo Whisper: float32 mono em 16 kHz."""
+        pcm = self.get(audio_path, WHISPER_SAMPLE_RATE, 1)
+        # Mesma conversão feita por whisper.load_audio
+        return pcm[:, 0].astype(np.float32) / 32768.0
+
+    def release(self, audio_path):
+        """Libera os buffers de um upload."""
+        with self._lock:
+            self._uploads.pop(self._key(audio_path), None)
+
+    def clear(self):
+        with self._lock:
+            self._uploads.clear()
+
+    def _memory_used(self):
+        return sum(
+            self._resident_bytes(pcm)
+            for buffers in self._uploads.values()
+            for pcm in buffers["pcm"].values()
+        )
+
+    def _evict(self, keep=None):
+        """Descarta os uploads usados há mais tempo até respeitar o orçamento de memória."""
+        if not self.memory_budget_bytes:
+            return
+        while len(self._uploads) > 1 and self._memory_used() > self.memory_budget_bytes:
+            oldest_key = next(iter(self._uploads))
+            if oldest_key == keep:
+                break
+            del self._uploads[oldest_key]
+            self._evictions += 1
+
+    def stats(self):
+        """Retorna estatísticas do armazenamento (uploads, memória usada, acertos e faltas)."""
+        with self._lock:
+            return {
+                "uploads": len(self._uploads),
+                "buffers": sum(len(buffers["pcm"]) for buffers in self._uploads.values()),
+                "memory_used_mb": round(self._memory_used() / (1024 * 1024), 1),
+                "memory_budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 1),
+                "sidecars": self.use_sidecars,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+# Armazenamento único por processo
+_store = AudioStore(AUDIO_STORE_MEMORY_MB, AUDIO_PCM_SIDECAR)
+
+def get_audio_store():
+    """Retorna o armazenamento de áudio decodificado do processo."""
+    return _store
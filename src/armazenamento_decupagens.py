@@ -0,0 +1,330 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+from src.config import DECUPAGEM_DB_PATH, UPLOAD_RETENTION_DAYS
+from src.transcricao_compacta import CompactTranscript
+
+# Tarefas que estavam em andamento quando o servidor parou
+INTERRUPTED_STATUSES = ("queued", "running")
+
+# Tamanho do trecho do texto mostrado na listagem
+PREVIEW_CHARS = 200
+
+# Colunas das transcrições sem o conteúdo (payload), para listagens e consultas de metadados
+SUMMARY_COLUMNS = ("id, upload_id, audio_path, title, language, profile, model, preview, duration,"
+                   " segment_count, word_count, created_at")
+
+class DecupagemStore:
+    """
+    Armazenamento local (SQLite) das decupagens: uploads, transcrições e tarefas.
+
+    Cada upload guarda o arquivo enviado e o áudio processado; cada transcrição
+    guarda o resultado completo (segmentos e palavras, no formato em colunas e
+    comprimido) ligado ao upload de origem, para que uma decupagem antiga seja
+    reaberta sem rodar o Whisper de novo. As tarefas da fila também são
+    registradas, de modo que o status continua consultável depois de um
+    reinício do servidor.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " id TEXT PRIMARY KEY,"
+            " original_name TEXT NOT NULL,"
+            " file_path TEXT NOT NULL,"
+            " processed_path TEXT,"
+            " size INTEGER,"
+            " sha256 TEXT,"
+            " duration REAL,"
+            " created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            " id TEXT PRIMARY KEY,"
+            " upload_id TEXT REFERENCES uploads (id),"
+            " audio_path TEXT NOT NULL,"
+            " title TEXT NOT NULL,"
+            " language TEXT,"
+            " profile TEXT,"
+            " model TEXT,"
+            " preview TEXT,"
+            " duration REAL,"
+            " segment_count INTEGER,"
+            " word_count INTEGER,"
+            " payload BLOB NOT NULL,"
+            " created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " audio_path TEXT NOT NULL,"
+            " profile TEXT,"
+            " model TEXT,"
+            " status TEXT NOT NULL,"
+            " error TEXT,"
+            " transcript_id TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL);"
+            "CREATE INDEX IF NOT EXISTS idx_transcripts_created_at ON transcripts (created_at);"
+            "CREATE INDEX IF NOT EXISTS idx_uploads_processed_path ON uploads (processed_path);"
+        )
+        # Bancos criados antes do hash de conteúdo dos uploads
+        upload_columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(uploads)")}
+        for column, column_type in (("sha256", "TEXT"), ("duration", "REAL")):
+            if column not in upload_columns:
+                self._conn.execute(f"ALTER TABLE uploads ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_sha256 ON uploads (sha256)")
+        self._conn.commit()
+
+    def recover_interrupted_jobs(self):
+        """
+        Marca como 'interrupted' as tarefas que estavam na fila ou em andamento
+        quando o servidor parou; elas não vão mais terminar.
+
+        Chamada uma única vez na inicialização do servidor (veja app.startup),
+        nunca ao abrir o armazenamento: outros processos que o abrem (workers
+        do gunicorn, o lote) marcariam tarefas ainda vivas.
+
+        Returns:
+            int: Quantidade de tarefas marcadas
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET status = 'interrupted', finished_at = ? "
+                f"WHERE status IN ({', '.join('?' for _ in INTERRUPTED_STATUSES)})",
+                (time.time(), *INTERRUPTED_STATUSES)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Uploads
+
+    def add_upload(self, original_name, file_path, processed_path=None, sha256=None, duration=None):
+        """
+        Registra um upload (arquivo enviado e, se houver, o áudio processado) e retorna seu ID.
+
+        `sha256` é o hash do conteúdo enviado, usado para reaproveitar uploads
+        repetidos (veja `find_upload_by_sha256`), e `duration` a duração em segundos.
+        """
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO uploads (id, original_name, file_path, processed_path, size, sha256, duration,"
+                " created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (upload_id, original_name, os.path.abspath(file_path),
+                 os.path.abspath(processed_path) if processed_path else None,
+                 os.path.getsize(file_path) if os.path.exists(file_path) else None, sha256, duration,
+                 time.time())
+            )
+            self._conn.commit()
+        return upload_id
+
+    def find_upload_by_sha256(self, sha256):
+        """
+        Upload mais recente com o mesmo conteúdo e áudio processado ainda em disco, ou None.
+
+        O upload encontrado tem a data renovada, para não ser esquecido pela
+        limpeza enquanto estiver sendo reaproveitado.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM uploads WHERE sha256 = ? AND processed_path IS NOT NULL ORDER BY created_at DESC",
+                (sha256,)
+            ).fetchall()
+            for row in rows:
+                if os.path.exists(row["file_path"]) and os.path.exists(row["processed_path"]):
+                    self._conn.execute("UPDATE uploads SET created_at = ? WHERE id = ?", (time.time(), row["id"]))
+                    self._conn.commit()
+                    return dict(row)
+        return None
+
+    def find_upload(self, audio_path):
+        """Upload cujo arquivo original ou processado é `audio_path`, ou None."""
+        path = os.path.abspath(audio_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM uploads WHERE processed_path = ? OR file_path = ? ORDER BY created_at DESC LIMIT 1",
+                (path, path)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def referenced_paths(self):
+        """Caminhos absolutos de todos os arquivos de upload ainda registrados."""
+        with self._lock:
+            rows = self._conn.execute("SELECT file_path, processed_path FROM uploads").fetchall()
+        return {path for row in rows for path in row if path}
+
+    def prune_uploads(self, retention_days=UPLOAD_RETENTION_DAYS):
+        """
+        Esquece os uploads sem nenhuma transcrição enviados há mais de `retention_days` dias.
+
+        Returns:
+            int: Quantidade de uploads esquecidos (os arquivos são removidos por
+            quem limpa a pasta de uploads)
+        """
+        cutoff = time.time() - retention_days * 24 * 3600
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM uploads WHERE created_at < ?"
+                " AND id NOT IN (SELECT upload_id FROM transcripts WHERE upload_id IS NOT NULL)",
+                (cutoff,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    # Transcrições
+
+    def save_transcript(self, audio_path, result, language=None, profile=None, model=None, title=None):
+        """
+        Guarda uma transcrição estruturada (`{"text", "segments", ...}`) e retorna seu ID.
+
+        A transcrição é ligada ao upload de `audio_path`, se ele estiver registrado;
+        o título padrão é o nome original do upload ou o nome do arquivo.
+        """
+        upload = self.find_upload(audio_path)
+        transcript = CompactTranscript.from_result(result)
+        payload = zlib.compress(json.dumps(transcript.to_wire(), ensure_ascii=False).encode("utf-8"))
+        duration = max(transcript.segment_ends) if len(transcript) else 0.0
+        transcript_id = uuid.uuid4().hex
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO transcripts (id, upload_id, audio_path, title, language, profile, model, preview,"
+                " duration, segment_count, word_count, payload, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (transcript_id, upload["id"] if upload else None, os.path.abspath(audio_path),
+                 title or (upload["original_name"] if upload else os.path.basename(audio_path)),
+                 language, profile or result.get("profile"), model or result.get("model"),
+                 transcript.text[:PREVIEW_CHARS], duration, len(transcript), transcript.word_count,
+                 payload, time.time())
+            )
+            self._conn.commit()
+        return transcript_id
+
+    @staticmethod
+    def _summary(row):
+        summary = {key: row[key] for key in row.keys() if key != "payload"}
+        summary["audio_available"] = os.path.exists(row["audio_path"])
+        return summary
+
+    def list_transcripts(self, limit=50, offset=0):
+        """Transcrições guardadas, das mais recentes para as mais antigas, sem o conteúdo completo."""
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM transcripts ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [self._summary(row) for row in rows], total
+
+    def get_transcript_summary(self, transcript_id):
+        """
+        Metadados de uma transcrição guardada, sem ler nem descompactar o conteúdo
+        (para rotas chamadas muitas vezes, como as requisições Range do áudio).
+
+        Returns:
+            dict: Metadados, ou None se ela não existir
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM transcripts WHERE id = ?", (transcript_id,)
+            ).fetchone()
+        return self._summary(row) if row is not None else None
+
+    def get_transcript(self, transcript_id):
+        """
+        Metadados e conteúdo de uma transcrição guardada.
+
+        Returns:
+            tuple: (metadados, CompactTranscript) ou (None, None) se ela não existir
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM transcripts WHERE id = ?", (transcript_id,)).fetchone()
+        if row is None:
+            return None, None
+        wire = json.loads(zlib.decompress(row["payload"]).decode("utf-8"))
+        return self._summary(row), CompactTranscript.from_wire(wire)
+
+    def delete_transcript(self, transcript_id):
+        """
+        Remove uma transcrição. Se o upload de origem não tiver mais nenhuma
+        transcrição, ele também é esquecido.
+
+        Returns:
+            list: Caminhos dos arquivos do upload que deixaram de ser usados
+            (None se a transcrição não existir)
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT upload_id FROM transcripts WHERE id = ?", (transcript_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("DELETE FROM transcripts WHERE id = ?", (transcript_id,))
+
+            orphaned = []
+            upload_id = row["upload_id"]
+            if upload_id is not None:
+                remaining = self._conn.execute(
+                    "SELECT COUNT(*) FROM transcripts WHERE upload_id = ?", (upload_id,)
+                ).fetchone()[0]
+                if not remaining:
+                    upload = self._conn.execute(
+                        "SELECT file_path, processed_path FROM uploads WHERE id = ?", (upload_id,)
+                    ).fetchone()
+                    self._conn.execute("DELETE FROM uploads WHERE id = ?", (upload_id,))
+                    orphaned = [path for path in upload if path] if upload else []
+            self._conn.commit()
+        return orphaned
+
+    # Tarefas
+
+    def save_job(self, job):
+        """Registra ou atualiza o status de uma tarefa da fila (`TranscriptionJob`)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, audio_path, profile, model, status, error, transcript_id,"
+                " created_at, started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, os.path.abspath(job.file_path), job.profile, job.model_size, job.status, job.error,
+                 job.transcript_id, job.created_at, job.started_at, job.finished_at)
+            )
+            self._conn.commit()
+
+    def get_job(self, job_id):
+        """Último status registrado de uma tarefa, ou None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+# Armazenamento único por processo
+_store = None
+_store_lock = threading.Lock()
+
+def get_decupagem_store():
+    """Retorna o armazenamento de decupagens do processo, criando-o no primeiro uso."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DecupagemStore(DECUPAGEM_DB_PATH)
+        return _store
+
+def close_decupagem_store():
+    """Fecha o armazenamento do processo (antes de um fork, para a conexão SQLite não ir junto)."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
@@ -1,5 +1,17 @@
+import hashlib
 import os
 
+# Extensões de áudio aceitas pela transcrição
+SUPPORTED_AUDIO_FORMATS = ['.wav', '.aiff', '.aif', '.flac', '.mp3']
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Hash SHA-256 do conteúdo do arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 def save_transcript(transcript, output_file):
     """Salva a transcrição em um arquivo de texto na pasta decupagens_salvas/."""
     try:
@@ -32,12 +44,11 @@ def list_audio_files():
         return None
     
     # Listar apenas arquivos com extensões suportadas
-    supported_formats = ['.wav', '.aiff', '.aif', '.flac', '.mp3']
     audio_files = []
     
     for file in os.listdir(audio_dir):
         _, ext = os.path.splitext(file)
-        if ext.lower() in supported_formats:
+        if ext.lower() in SUPPORTED_AUDIO_FORMATS:
             audio_files.append(file)
     
     if not audio_files:
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from src.config import TRANSCRIPT_CACHE_ENABLED, TRANSCRIPT_CACHE_PATH, TRANSCRIPT_CACHE_MAX_MB
+from src.transcricao_compacta import CompactTranscript
+
+class TranscriptCache:
+    """
+    Cache persistente de transcrições endereçado pelo conteúdo do áudio.
+
+    A chave combina o hash do PCM decodificado com os parâmetros de decodificação
+    (modelo, idioma, beam size, temperaturas...), então o mesmo áudio enviado
+    novamente com outro nome reaproveita a transcrição. As entradas ficam em um
+    banco SQLite, no formato em colunas (`CompactTranscript`) e comprimidas, e
+    as menos acessadas são descartadas quando o tamanho total passa do limite.
+    """
+
+    def __init__(self, path, max_size_mb=512):
+        self.path = path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            " key TEXT PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_last_access ON transcripts (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(pcm, params):
+        """Gera a chave a partir do PCM decodificado (array NumPy) e dos parâmetros de decodificação."""
+        digest = hashlib.sha256()
+        # Usar o buffer do array diretamente, sem copiar o áudio
+        digest.update(memoryview(pcm).cast("B"))
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Retorna a transcrição armazenada para `key` ou None."""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE transcripts SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key)
+            )
+            self._conn.commit()
+            self._hits += 1
+
+        data = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        # Entradas gravadas antes do formato em colunas continuam válidas
+        return CompactTranscript.from_wire(data).to_dict() if CompactTranscript.is_wire(data) else data
+
+    def put(self, key, result):
+        """Armazena a transcrição e descarta as entradas mais antigas se o limite for ultrapassado."""
+        wire = CompactTranscript.from_result(result).to_wire()
+        payload = zlib.compress(json.dumps(wire, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts (key, payload, size, created_at, last_access, hits)"
+                " VALUES (?, ?, ?, ?, ?, 0)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Remove as entradas acessadas há mais tempo até respeitar o tamanho máximo."""
+        total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM transcripts ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total_size <= self.max_size_bytes:
+                break
+            self._conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+            total_size -= size
+            self._evictions += 1
+
+    def clear(self):
+        """Remove todas as transcrições do cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM transcripts")
+            self._conn.commit()
+
+    def stats(self):
+        """Retorna estatísticas do cache (entradas, tamanho, acertos e faltas)."""
+        with self._lock:
+            entries, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+            ).fetchone()
+            requests_count = self._hits + self._misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "size_mb": round(total_size / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / requests_count) if requests_count else 0.0,
+                "evictions": self._evictions,
+            }
+
+# Cache único por processo
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_transcript_cache():
+    """Retorna o cache de transcrições do processo ou None se estiver desativado."""
+    global _cache
+    if not TRANSCRIPT_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranscriptCache(TRANSCRIPT_CACHE_PATH, TRANSCRIPT_CACHE_MAX_MB)
+        return _cache
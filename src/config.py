@@ -1,10 +1,100 @@
+import importlib.metadata
+import importlib.util
 import os
+import re
 import sys
 import subprocess
 
 # Configuração para modelos Whisper locais
 MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
 
+# Taxa de amostragem da entrada do Whisper (áudio mono float32)
+WHISPER_SAMPLE_RATE = 16000
+
+# Registro de modelos: quantos modelos manter carregados e orçamento de memória (0 = sem limite)
+WHISPER_MAX_LOADED_MODELS = int(os.environ.get("WHISPER_MAX_LOADED_MODELS", "2"))
+WHISPER_MODEL_MEMORY_BUDGET_MB = int(os.environ.get("WHISPER_MODEL_MEMORY_BUDGET_MB", "0"))
+
+# Backend de inferência do Whisper: 'openai' (PyTorch, padrão) ou 'faster-whisper' (CTranslate2)
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "openai")
+# Pesos convertidos para CTranslate2 (um diretório por modelo) e quantização usada na CPU
+CT2_MODELS_DIR = os.environ.get("CT2_MODELS_DIR", os.path.join(MODELS_DIR, "ct2"))
+CT2_COMPUTE_TYPE = os.environ.get("CT2_COMPUTE_TYPE", "int8")
+
+# Download dos modelos Whisper: espelho (pasta ou URL base com os arquivos <modelo>.pt) para nós
+# sem acesso à internet e conexões paralelas por download (1 = uma única conexão)
+WHISPER_MODEL_MIRROR = os.environ.get("WHISPER_MODEL_MIRROR")
+MODEL_DOWNLOAD_CONNECTIONS = int(os.environ.get("MODEL_DOWNLOAD_CONNECTIONS", "4"))
+
+# Perfil de decodificação padrão do Whisper: 'fast', 'balanced' ou 'accurate'
+WHISPER_DECODING_PROFILE = os.environ.get("WHISPER_DECODING_PROFILE", "balanced")
+
+# Detecção de voz antes do Whisper: remove pausas de pelo menos VAD_MIN_SILENCE_MS (abaixo de
+# VAD_SILENCE_THRESH_DB dBFS), mantendo VAD_PADDING_MS de margem, se isso poupar ao menos VAD_MIN_SAVING do áudio.
+# Desligada por padrão (VAD_ENABLED=1 liga): muda o áudio decodificado e, portanto, a transcrição
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "0") == "1"
+VAD_MIN_SILENCE_MS = int(os.environ.get("VAD_MIN_SILENCE_MS", "2000"))
+VAD_PADDING_MS = int(os.environ.get("VAD_PADDING_MS", "300"))
+VAD_SILENCE_THRESH_DB = float(os.environ.get("VAD_SILENCE_THRESH_DB", "-40"))
+VAD_MIN_SAVING = float(os.environ.get("VAD_MIN_SAVING", "0.05"))
+
+# Fila de transcrições assíncronas: workers simultâneos, tarefas aguardando e tarefas finalizadas mantidas
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "32"))
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", "100"))
+
+# Controle de admissão dos endpoints pesados: transcrições e exportações simultâneas, requisições
+# aguardando vaga em cada endpoint e espera máxima (segundos) antes de responder 429
+ADMISSION_TRANSCRIBE_CONCURRENCY = int(os.environ.get("ADMISSION_TRANSCRIBE_CONCURRENCY", str(JOB_WORKERS)))
+ADMISSION_EXPORT_CONCURRENCY = int(os.environ.get("ADMISSION_EXPORT_CONCURRENCY", "2"))
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "8"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get("ADMISSION_MAX_WAIT_SECONDS", "30"))
+
+# Produção (wsgi.py): modelos carregados antes de aceitar requisições, separados por vírgula
+# (vazio = modelo do perfil padrão, 'none' = nenhum)
+WHISPER_PRELOAD_MODELS = os.environ.get("WHISPER_PRELOAD_MODELS", "")
+
+# Transcrição paralela em blocos: número de processos (0 ou 1 = desativada)
+PARALLEL_TRANSCRIPTION_WORKERS = int(os.environ.get("PARALLEL_TRANSCRIPTION_WORKERS", "0"))
+
+# Cache de transcrições endereçado pelo conteúdo do áudio
+TRANSCRIPT_CACHE_ENABLED = os.environ.get("TRANSCRIPT_CACHE_ENABLED", "1") != "0"
+TRANSCRIPT_CACHE_PATH = os.environ.get("TRANSCRIPT_CACHE_PATH", os.path.join("cache", "transcricoes.sqlite3"))
+TRANSCRIPT_CACHE_MAX_MB = int(os.environ.get("TRANSCRIPT_CACHE_MAX_MB", "512"))
+
+# Decupagens salvas (uploads, transcrições e tarefas) em SQLite; uploads sem transcrição
+# são esquecidos e removidos depois de alguns dias
+DECUPAGEM_DB_PATH = os.environ.get("DECUPAGEM_DB_PATH", os.path.join("decupagens_salvas", "decupagens.sqlite3"))
+UPLOAD_RETENTION_DAYS = float(os.environ.get("UPLOAD_RETENTION_DAYS", "7"))
+
+# Uploads: tamanho máximo do arquivo (MB), duração máxima do áudio (minutos, 0 = sem limite),
+# tamanho sugerido dos blocos nas sessões de upload retomáveis (MB) e tempo (horas) até uma
+# sessão abandonada ser descartada
+UPLOAD_MAX_MB = int(os.environ.get("UPLOAD_MAX_MB", "4096"))
+UPLOAD_MAX_DURATION_MINUTES = float(os.environ.get("UPLOAD_MAX_DURATION_MINUTES", "0"))
+UPLOAD_CHUNK_MB = int(os.environ.get("UPLOAD_CHUNK_MB", "8"))
+UPLOAD_SESSION_TTL_HOURS = float(os.environ.get("UPLOAD_SESSION_TTL_HOURS", "24"))
+
+# Áudio decodificado dos uploads: orçamento de memória (MB, 0 = sem limite) e PCM bruto
+# mapeado em memória gravado ao lado de cada arquivo (sidecar)
+AUDIO_STORE_MEMORY_MB = int(os.environ.get("AUDIO_STORE_MEMORY_MB", "1024"))
+AUDIO_PCM_SIDECAR = os.environ.get("AUDIO_PCM_SIDECAR", "1") != "0"
+
+# FFmpeg: executável indicado explicitamente (tem prioridade sobre o PATH) e pasta configurada,
+# consultada por último (padrão: a versão portátil em src/ffmpeg_portable/bin)
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY")
+FFMPEG_DIR = os.environ.get("FFMPEG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       "ffmpeg_portable", "bin"))
+# Tempo máximo (segundos) para cada consulta ao FFmpeg na descoberta (versão, filtros, codificadores)
+FFMPEG_PROBE_TIMEOUT = float(os.environ.get("FFMPEG_PROBE_TIMEOUT", "5"))
+
+# Processamento de rádio dos uploads: 'ffmpeg' (grafo de filtros único, em streaming) ou 'pydub'
+AUDIO_PROCESSING_MODE = os.environ.get("AUDIO_PROCESSING_MODE", "ffmpeg")
+
+# Aprimoramento de texto em lote com spaCy (nlp.pipe)
+SPACY_BATCH_SIZE = int(os.environ.get("SPACY_BATCH_SIZE", "64"))
+SPACY_N_PROCESS = int(os.environ.get("SPACY_N_PROCESS", "1"))
+
 def setup_whisper_environment():
     """Configura o ambiente para usar modelos Whisper locais no projeto."""
     # Criar diretório models se não existir
@@ -16,8 +106,28 @@ def setup_whisper_environment():
     os.environ["WHISPER_MODEL_DIR"] = MODELS_DIR
     return MODELS_DIR
 
-def check_dependencies():
-    """Verifica se as bibliotecas necessárias estão instaladas."""
+# Versão mínima do openai-whisper com todos os nomes de modelo usados pelo projeto
+WHISPER_MIN_VERSION = "20230124"
+
+# Bibliotecas verificadas na inicialização: (módulo, distribuição no pip, instrução de instalação)
+REQUIRED_LIBRARIES = [
+    ("speech_recognition", "SpeechRecognition", "SpeechRecognition (pip install SpeechRecognition)"),
+    ("pydub", "pydub", "pydub (pip install pydub)"),
+    ("numpy", "numpy", "numpy (pip install numpy)"),
+]
+
+def _version_tuple(version):
+    return tuple(int(part) for part in re.findall(r"\d+", version))
+
+def check_dependencies(backend=None):
+    """
+    Verifica se as bibliotecas necessárias estão instaladas.
+    
+    Nenhuma biblioteca pesada é importada (nem modelo carregado): a presença é
+    conferida com `importlib.util.find_spec` e a versão pelos metadados do
+    pacote instalado, o que mantém a inicialização abaixo de um segundo.
+    `backend` é o backend do Whisper a verificar (padrão: WHISPER_BACKEND).
+    """
     from src.utilidades_ffmpeg import check_ffmpeg
     
     # Configurar ambiente para modelos locais
@@ -26,34 +136,23 @@ def check_dependencies():
     # Verificar e configurar FFmpeg imediatamente no início
     check_ffmpeg()
     
-    missing_libs = []
+    missing_libs = [
+        instructions for module, _, instructions in REQUIRED_LIBRARIES
+        if importlib.util.find_spec(module) is None
+    ]
     
-    try:
-        import speech_recognition
-    except ImportError:
-        missing_libs.append("SpeechRecognition (pip install SpeechRecognition)")
-    
-    try:
-        import pydub
-    except ImportError:
-        missing_libs.append("pydub (pip install pydub)")
-        
-    try:
-        import numpy
-    except ImportError:
-        missing_libs.append("numpy (pip install numpy)")
-    
-    # Verificar se o whisper está disponível
-    try:
-        import whisper
+    # Verificar o backend do Whisper configurado
+    if (backend or WHISPER_BACKEND) == "faster-whisper":
+        if importlib.util.find_spec("faster_whisper") is None:
+            missing_libs.append("faster-whisper (pip install faster-whisper)")
+    else:
         try:
-            # Verificar se temos a versão mais recente que suporta diferentes tamanhos de modelos
-            whisper.load_model("tiny")
-        except Exception as e:
-            if "is not one of the supported model names" in str(e):
+            whisper_version = importlib.metadata.version("openai-whisper")
+            # Versões antigas não reconhecem todos os tamanhos de modelo
+            if _version_tuple(whisper_version) < _version_tuple(WHISPER_MIN_VERSION):
                 missing_libs.append("openai-whisper atualizado (pip install -U --force-reinstall openai-whisper)")
-    except ImportError:
-        missing_libs.append("openai-whisper (pip install -U openai-whisper)")
+        except importlib.metadata.PackageNotFoundError:
+            missing_libs.append("openai-whisper (pip install -U openai-whisper)")
     
     if missing_libs:
         print("As seguintes bibliotecas não estão instaladas:")
@@ -0,0 +1,102 @@
+import numpy as np
+
+from src.config import (VAD_MIN_SILENCE_MS, VAD_PADDING_MS, VAD_SILENCE_THRESH_DB, VAD_MIN_SAVING,
+                        WHISPER_SAMPLE_RATE)
+from src.processa_audio import detect_speech_ranges, merge_speech_ranges
+
+class SpeechTimeline:
+    """
+    Mapeia a linha do tempo do áudio sem os silêncios de volta para a original.
+
+    `spans` são os trechos mantidos, em amostras do áudio original; no áudio
+    recortado eles aparecem um depois do outro, na mesma ordem.
+    """
+
+    def __init__(self, spans, sample_rate=WHISPER_SAMPLE_RATE):
+        self.spans = spans
+        lengths = np.array([end - start for start, end in spans], dtype=np.float64) / sample_rate
+        self.original_starts = np.array([start for start, _ in spans], dtype=np.float64) / sample_rate
+        self.gated_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+        self.gated_ends = self.gated_starts + lengths
+
+    @property
+    def gated_seconds(self):
+        return float(self.gated_ends[-1]) if len(self.gated_ends) else 0.0
+
+    def to_original(self, seconds, is_end=False):
+        """
+        Converte um instante do áudio recortado para o áudio original.
+
+        Um instante exatamente na junção de dois trechos é o fim do trecho
+        anterior quando `is_end` é verdadeiro e o início do seguinte caso contrário.
+        """
+        side = "left" if is_end else "right"
+        index = int(np.searchsorted(self.gated_starts, seconds, side=side)) - 1
+        index = min(max(index, 0), len(self.gated_starts) - 1)
+        return float(self.original_starts[index] + (seconds - self.gated_starts[index]))
+
+    def remap_segments(self, segments):
+        """Devolve cópias dos segmentos (e palavras) com os timestamps na linha do tempo original."""
+        remapped = []
+        for segment in segments:
+            segment_data = dict(segment)
+            segment_data["start"] = self.to_original(segment["start"])
+            segment_data["end"] = self.to_original(segment["end"], is_end=True)
+            if "words" in segment:
+                segment_data["words"] = [
+                    dict(word, start=self.to_original(word["start"]),
+                         end=self.to_original(word["end"], is_end=True))
+                    for word in segment["words"]
+                ]
+            remapped.append(segment_data)
+        return remapped
+
+    def remap_result(self, result):
+        """Transcrição estruturada com os timestamps na linha do tempo original."""
+        return dict(result, segments=self.remap_segments(result["segments"]))
+
+def plan_speech_gating(audio, min_silence_ms=VAD_MIN_SILENCE_MS, padding_ms=VAD_PADDING_MS,
+                       silence_thresh=VAD_SILENCE_THRESH_DB):
+    """
+    Encontra os trechos com voz a manter antes de enviar o áudio ao Whisper.
+
+    Usa a mesma detecção de silêncio do resto do pipeline: só pausas de pelo
+    menos `min_silence_ms` são removidas, e cada trecho com voz mantém
+    `padding_ms` de margem de cada lado.
+
+    Args:
+        audio: Array float32 mono em 16 kHz
+
+    Returns:
+        list: Pares (amostra inicial, amostra final) dos trechos mantidos
+    """
+    pcm16 = np.clip(audio * 32768.0, -32768, 32767).astype(np.int16)
+    speech_ranges = detect_speech_ranges(pcm16, WHISPER_SAMPLE_RATE, min_silence_len=min_silence_ms,
+                                         silence_thresh=silence_thresh, keep_silence=padding_ms)
+    # Fundir trechos cujas margens se sobrepõem
+    speech_ranges = merge_speech_ranges(speech_ranges, max_gap_ms=0)
+
+    return [
+        (start_ms * WHISPER_SAMPLE_RATE // 1000, min(len(audio), end_ms * WHISPER_SAMPLE_RATE // 1000))
+        for start_ms, end_ms in speech_ranges
+    ]
+
+def gate_silence(audio, min_saving=VAD_MIN_SAVING, **kwargs):
+    """
+    Remove os silêncios longos do áudio antes da decodificação.
+
+    Returns:
+        tuple: (áudio recortado, SpeechTimeline) ou (áudio original, None) se
+        a economia for menor que `min_saving` (fração do áudio) ou não houver voz
+    """
+    spans = plan_speech_gating(audio, **kwargs)
+    kept_samples = sum(end - start for start, end in spans)
+    if not spans or kept_samples > len(audio) * (1.0 - min_saving):
+        return audio, None
+
+    timeline = SpeechTimeline(spans)
+    gated = np.concatenate([audio[start:end] for start, end in spans])
+    print(f"Detecção de voz: {len(spans)} trecho(s) com voz, "
+          f"{(len(audio) - kept_samples) / WHISPER_SAMPLE_RATE:.1f} s de silêncio removidos "
+          f"({100.0 * (len(audio) - kept_samples) / len(audio):.0f}% do áudio)")
+    return gated, timeline
@@ -0,0 +1,217 @@
+import glob
+import os
+import re
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from src.auxiliares import file_sha256
+from src.config import WHISPER_MODEL_MIRROR
+from src.importacao import timed_import
+
+# URLs oficiais dos modelos Whisper; o penúltimo trecho de cada URL é o SHA-256 do arquivo
+WHISPER_MODEL_URLS = {
+    "tiny": "https://openaipublic.azureedge.net/main/whisper/models/65147644a518d12f04e32d6f3b26facc3f8dd46e5390956a9424a650c0ce22b9/tiny.pt",
+    "base": "https://openaipublic.azureedge.net/main/whisper/models/ed3a0b6b1c0edf879ad9b11b1af5a0e6ab5db9205f891f668f8b0e6c6326e34e/base.pt",
+    "small": "https://openaipublic.azureedge.net/main/whisper/models/9ecf779972d90ba49c06d968637d720dd632c55bbf19d441fb42bf17a411e794/small.pt",
+    "medium": "https://openaipublic.azureedge.net/main/whisper/models/345ae4da62f9b3d59415adc60127b97c714f32e89e936602e85993674d08dcb1/medium.pt",
+    "large": "https://openaipublic.azureedge.net/main/whisper/models/e4b87e7e0bf463eb8e6956e646f1e277e901512310def2c24bf0e11bd3c28e9a/large.pt"
+}
+
+# Tamanho dos blocos lidos da rede
+DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Abaixo deste tamanho, dividir o download em várias conexões não compensa
+MIN_PARALLEL_SIZE = 32 * 1024 * 1024
+
+# Tempo máximo (segundos) para conectar e entre dois blocos recebidos
+REQUEST_TIMEOUT = 30
+
+class ModelDownloadError(RuntimeError):
+    """Falha ao baixar um modelo: download incompleto, arquivo ausente no espelho ou SHA-256 divergente."""
+
+class _RangeIgnored(Exception):
+    """O servidor anunciou suporte a Range mas respondeu com o arquivo inteiro."""
+
+def expected_sha256(url):
+    """SHA-256 embutido na URL oficial do modelo (.../<sha256>/<modelo>.pt), ou None."""
+    parts = urlparse(url).path.split("/")
+    if len(parts) >= 2 and re.fullmatch(r"[0-9a-f]{64}", parts[-2]):
+        return parts[-2]
+    return None
+
+def model_source(model_size, mirror=None):
+    """
+    Origem do download de um modelo: o arquivo <modelo>.pt no espelho (pasta
+    local ou URL base), se houver um configurado, ou a URL oficial.
+    """
+    mirror = mirror or WHISPER_MODEL_MIRROR
+    if not mirror:
+        return WHISPER_MODEL_URLS[model_size]
+    filename = f"{model_size}.pt"
+    if _is_http(mirror):
+        return f"{mirror.rstrip('/')}/{filename}"
+    return os.path.join(mirror, filename)
+
+def _is_http(source):
+    return re.match(r"https?://", source, re.IGNORECASE) is not None
+
+class _Progress:
+    """Barra de progresso no terminal, compartilhada pelas conexões de um mesmo download."""
+
+    def __init__(self, total, done=0):
+        self.total = total
+        self.done = done
+        self._lock = threading.Lock()
+
+    def advance(self, count):
+        with self._lock:
+            self.done += count
+            if self.total > 0:
+                filled = int(50 * self.done / self.total)
+                percent = int(100 * self.done / self.total)
+                sys.stdout.write(f"\r[{'=' * filled}{' ' * (50 - filled)}] {percent}% ")
+                sys.stdout.flush()
+
+    def finish(self):
+        if self.total > 0:
+            sys.stdout.write("\n")
+
+def fetch_file(source, dest_path, sha256=None, connections=1):
+    """
+    Baixa `source` (URL http/https ou caminho local) para `dest_path` com segurança.
+
+    Os dados vão primeiro para `dest_path + ".part"`, que é retomado com o
+    cabeçalho Range se um download anterior foi interrompido. Com
+    `connections` maior que 1 e um servidor que aceita Range, o arquivo é
+    dividido em faixas baixadas em paralelo, cada uma em seu próprio arquivo
+    parcial (também retomável). O arquivo só substitui `dest_path`, com um
+    `os.replace` atômico, depois de conferido o SHA-256; um arquivo divergente
+    é apagado (junto com as faixas parciais) e levanta ModelDownloadError,
+    sem tocar em `dest_path`.
+    """
+    part_path = f"{dest_path}.part"
+    if _is_http(source):
+        _fetch_http(source, part_path, connections)
+    else:
+        if not os.path.isfile(source):
+            raise ModelDownloadError(f"Arquivo não encontrado no espelho: {source}")
+        shutil.copyfile(source, part_path)
+
+    if sha256:
+        digest = file_sha256(part_path)
+        if digest != sha256:
+            discard_partial(dest_path)
+            raise ModelDownloadError(f"SHA-256 não confere para {source}: esperado {sha256}, obtido {digest}")
+    os.replace(part_path, dest_path)
+    # Faixas de uma junção interrompida, depois concluída em conexão única, não servem mais
+    discard_partial(dest_path)
+
+def discard_partial(dest_path):
+    """Apaga os arquivos parciais de um download de `dest_path`, para recomeçá-lo do zero."""
+    part_path = f"{dest_path}.part"
+    for path in [part_path] + glob.glob(f"{glob.escape(part_path)}.*-*"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _fetch_http(url, part_path, connections):
+    requests = timed_import("requests")
+    head = requests.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+    head.raise_for_status()
+    total = int(head.headers.get("content-length", 0))
+    accepts_ranges = head.headers.get("accept-ranges", "").lower() == "bytes"
+    if total > 0:
+        print(f"Tamanho total do download: {total / (1024 * 1024):.1f} MB")
+
+    # Um .part de um download em conexão única é sempre continuado da mesma forma
+    if connections > 1 and accepts_ranges and total >= MIN_PARALLEL_SIZE and not os.path.exists(part_path):
+        try:
+            _fetch_ranges(requests, url, part_path, total, connections)
+            return
+        except _RangeIgnored:
+            print("O servidor não respeitou o cabeçalho Range; baixando em uma única conexão.")
+            for path in glob.glob(f"{glob.escape(part_path)}.*-*"):
+                os.remove(path)
+    _fetch_stream(requests, url, part_path, total)
+
+def _fetch_stream(requests, url, part_path, total):
+    """Baixa em uma única conexão, continuando do fim de `part_path` se ele já existir."""
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if total > 0 and offset == total:
+        return
+    if total > 0 and offset > total:
+        offset = 0
+
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with requests.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        # Faixa vazia: o .part já estava completo (o SHA-256 confirma)
+        if offset and response.status_code == 416:
+            return
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            print("O servidor não aceita retomar o download; recomeçando do início.")
+            offset = 0
+        elif offset:
+            print(f"Retomando download a partir de {offset / (1024 * 1024):.1f} MB")
+
+        progress = _Progress(total, offset)
+        with open(part_path, "ab" if offset else "wb") as file:
+            for data in response.iter_content(DOWNLOAD_BLOCK_SIZE):
+                file.write(data)
+                progress.advance(len(data))
+        progress.finish()
+
+    if total > 0 and os.path.getsize(part_path) != total:
+        raise ModelDownloadError("Download incompleto; execute novamente para continuar de onde parou.")
+
+def _fetch_ranges(requests, url, part_path, total, connections):
+    """Baixa faixas do arquivo em paralelo, uma conexão por faixa, e as junta em `part_path`."""
+    range_size = -(-total // connections)
+    ranges = [(start, min(start + range_size, total) - 1) for start in range(0, total, range_size)]
+    range_paths = [f"{part_path}.{start}-{end}" for start, end in ranges]
+
+    # Faixas de uma tentativa anterior com outro número de conexões não servem mais
+    for path in glob.glob(f"{glob.escape(part_path)}.*-*"):
+        if path not in range_paths:
+            os.remove(path)
+
+    existing = sum(os.path.getsize(path) for path in range_paths if os.path.exists(path))
+    if existing:
+        print(f"Retomando download a partir de {existing / (1024 * 1024):.1f} MB")
+    progress = _Progress(total, existing)
+
+    def fetch_range(start, end, range_path):
+        offset = os.path.getsize(range_path) if os.path.exists(range_path) else 0
+        if start + offset > end:
+            return
+        headers = {"Range": f"bytes={start + offset}-{end}"}
+        with requests.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            # Sair antes de ler o corpo: um 200 traria o arquivo inteiro em cada conexão
+            if response.status_code != 206:
+                raise _RangeIgnored()
+            with open(range_path, "ab") as file:
+                for data in response.iter_content(DOWNLOAD_BLOCK_SIZE):
+                    file.write(data)
+                    progress.advance(len(data))
+
+    print(f"Baixando em {len(ranges)} conexões paralelas...")
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        futures = [pool.submit(fetch_range, start, end, path) for (start, end), path in zip(ranges, range_paths)]
+        for future in futures:
+            future.result()
+    progress.finish()
+
+    for (start, end), path in zip(ranges, range_paths):
+        if os.path.getsize(path) != end - start + 1:
+            raise ModelDownloadError("Download incompleto; execute novamente para continuar de onde parou.")
+
+    # Se a junção for interrompida, o .part parcial é continuado em conexão única
+    with open(part_path, "wb") as output:
+        for path in range_paths:
+            with open(path, "rb") as file:
+                shutil.copyfileobj(file, output, DOWNLOAD_BLOCK_SIZE)
+    for path in range_paths:
+        os.remove(path)
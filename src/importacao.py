@@ -0,0 +1,59 @@
+import importlib
+import sys
+import threading
+import time
+
+# Tempo gasto na importação de cada biblioteca pesada carregada sob demanda
+_import_times = {}
+_import_lock = threading.Lock()
+
+# Fases da inicialização do processo (nome, segundos), na ordem em que ocorreram
+_startup_phases = []
+
+def timed_import(module_name):
+    """
+    Importa uma biblioteca pesada (whisper, torch, spaCy, pydub...) só quando ela é usada.
+
+    A primeira importação de cada módulo é cronometrada para o relatório de
+    inicialização; depois disso o módulo vem direto de `sys.modules`.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    with _import_lock:
+        _import_times.setdefault(module_name, time.perf_counter() - start)
+    return module
+
+def record_startup_phase(name, start):
+    """
+    Registra uma fase da inicialização iniciada em `start` (de `time.perf_counter`).
+
+    Returns:
+        float: O instante atual, para ser o início da próxima fase
+    """
+    now = time.perf_counter()
+    _startup_phases.append((name, now - start))
+    return now
+
+def import_report():
+    """Tempos de inicialização por fase e das bibliotecas carregadas sob demanda até agora."""
+    with _import_lock:
+        lazy_imports = dict(_import_times)
+    return {
+        "startup_seconds": round(sum(seconds for _, seconds in _startup_phases), 3),
+        "startup_phases": [{"phase": name, "seconds": round(seconds, 3)} for name, seconds in _startup_phases],
+        "lazy_imports": {name: round(seconds, 3)
+                         for name, seconds in sorted(lazy_imports.items(), key=lambda item: -item[1])},
+    }
+
+def print_import_report():
+    """Mostra no terminal o relatório de tempos de inicialização."""
+    report = import_report()
+    print(f"Inicialização em {report['startup_seconds']:.3f} s:")
+    for phase in report["startup_phases"]:
+        print(f"  {phase['phase']:<28} {phase['seconds']:.3f} s")
+    for name, seconds in report["lazy_imports"].items():
+        print(f"  (sob demanda) {name:<14} {seconds:.3f} s")
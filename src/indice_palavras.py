@@ -0,0 +1,127 @@
+import numpy as np
+
+class WordIndex:
+    """
+    Índice da transcrição por palavra: posição no texto ⇄ palavra ⇄ tempo no áudio.
+
+    As palavras ficam em arrays paralelos (caractere inicial e final no texto,
+    início e fim no áudio, segmento de origem) e as consultas são buscas
+    binárias, em O(log n) mesmo com dezenas de milhares de palavras.
+
+    O texto indexado é o mesmo exibido na interface: cada palavra seguida de
+    um espaço e, nos segmentos sem timestamps por palavra, o texto do segmento
+    seguido de um espaço (o segmento inteiro conta como uma palavra). Assim as
+    posições coincidem com `transcript.textContent` no navegador.
+    """
+
+    def __init__(self, words, char_starts, char_ends, starts, ends, segment_ids):
+        self.words = words
+        self.char_starts = np.asarray(char_starts, dtype=np.int64)
+        self.char_ends = np.asarray(char_ends, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.segment_ids = np.asarray(segment_ids, dtype=np.int32)
+        # Os timestamps do Whisper podem recuar alguns milissegundos entre palavras;
+        # as buscas usam os máximos acumulados, que são sempre ordenados
+        self._search_starts = np.maximum.accumulate(self.starts) if len(self.starts) else self.starts
+        self._search_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Constrói o índice a partir dos segmentos de uma transcrição estruturada."""
+        words, char_starts, char_ends, starts, ends, segment_ids = [], [], [], [], [], []
+        offset = 0
+        for segment_id, segment in enumerate(segments):
+            entries = [word for word in segment.get("words") or [] if word.get("word")]
+            if not entries:
+                entries = [{"word": segment.get("text", ""), "start": segment["start"], "end": segment["end"]}]
+            for entry in entries:
+                words.append(entry["word"])
+                char_starts.append(offset)
+                char_ends.append(offset + len(entry["word"]))
+                starts.append(entry["start"])
+                ends.append(entry["end"])
+                segment_ids.append(segment_id)
+                offset += len(entry["word"]) + 1
+        return cls(words, char_starts, char_ends, starts, ends, segment_ids)
+
+    def __len__(self):
+        return len(self.words)
+
+    @property
+    def text_length(self):
+        return int(self.char_ends[-1]) + 1 if len(self.words) else 0
+
+    def word_at_char(self, offset):
+        """Índice da palavra na posição `offset` do texto (o espaço seguinte conta como da palavra)."""
+        if not len(self.words):
+            return None
+        index = int(np.searchsorted(self.char_starts, offset, side="right")) - 1
+        return min(max(index, 0), len(self.words) - 1)
+
+    def word_at_time(self, seconds):
+        """Índice da palavra falada no instante `seconds` (nas pausas, a última palavra iniciada)."""
+        if not len(self.words):
+            return None
+        index = int(np.searchsorted(self._search_starts, seconds, side="right")) - 1
+        return min(max(index, 0), len(self.words) - 1)
+
+    def _describe(self, first, last):
+        return {
+            "first_word": first,
+            "last_word": last,
+            "char_start": int(self.char_starts[first]),
+            "char_end": int(self.char_ends[last]),
+            "start": float(self.starts[first]),
+            "end": float(self._search_ends[last]),
+            "text": " ".join(self.words[first:last + 1]),
+        }
+
+    def resolve_chars(self, char_start, char_end):
+        """
+        Converte um trecho selecionado no texto (posições [char_start, char_end))
+        no intervalo de áudio das palavras que ele toca.
+
+        Returns:
+            dict: Palavras, posições no texto e tempos (início e fim), ou None
+            se o trecho não contiver nenhuma palavra
+        """
+        if not len(self.words) or char_end <= char_start:
+            return None
+        # Primeira palavra que termina depois do início e última que começa antes do fim
+        first = int(np.searchsorted(self.char_ends, char_start, side="right"))
+        last = int(np.searchsorted(self.char_starts, char_end, side="left")) - 1
+        if first > last:
+            return None
+        return self._describe(first, last)
+
+    def resolve_times(self, start, end=None):
+        """
+        Converte um intervalo do áudio (ou um instante, sem `end`) nas palavras
+        faladas nele e na posição correspondente no texto.
+
+        Returns:
+            dict: Mesmo formato de `resolve_chars`, ou None se o intervalo não
+            contiver nenhuma palavra
+        """
+        if not len(self.words):
+            return None
+        if end is None or end <= start:
+            index = self.word_at_time(start)
+            return self._describe(index, index)
+        first = int(np.searchsorted(self._search_ends, start, side="right"))
+        last = int(np.searchsorted(self._search_starts, end, side="left")) - 1
+        if first > last:
+            return None
+        return self._describe(first, last)
+
+    def to_dict(self):
+        """Representação compacta (arrays paralelos, tempos em milissegundos) para a API."""
+        return {
+            "text_length": self.text_length,
+            "char_starts": self.char_starts.tolist(),
+            "char_ends": self.char_ends.tolist(),
+            "starts_ms": np.rint(self.starts * 1000).astype(np.int64).tolist(),
+            "ends_ms": np.rint(self.ends * 1000).astype(np.int64).tolist(),
+            "segments": self.segment_ids.tolist(),
+        }
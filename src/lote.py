@@ -0,0 +1,206 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.armazenamento_decupagens import get_decupagem_store
+from src.auxiliares import SUPPORTED_AUDIO_FORMATS, file_sha256
+from src.transcricao import resolve_profile, get_backend
+
+# Nome do resumo gravado na pasta de saída
+SUMMARY_FILE = "resumo_lote.json"
+
+# Critérios para pular arquivos já transcritos
+SKIP_MODES = ["hash", "exists", "none"]
+
+def collect_audio_files(inputs, recursive=False):
+    """
+    Reúne os arquivos de áudio suportados a partir de arquivos, pastas ou padrões glob.
+
+    Returns:
+        list: Caminhos absolutos, sem repetições e em ordem alfabética
+    """
+    files = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            pattern = os.path.join(entry, "**", "*") if recursive else os.path.join(entry, "*")
+            candidates = glob.glob(pattern, recursive=recursive)
+        elif os.path.isfile(entry):
+            candidates = [entry]
+        else:
+            candidates = glob.glob(entry, recursive=True)
+
+        for path in candidates:
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in SUPPORTED_AUDIO_FORMATS:
+                files.add(os.path.abspath(path))
+    return sorted(files)
+
+def output_base(audio_path, root, output_dir):
+    """Caminho de saída (sem extensão) que espelha a posição do arquivo em relação a `root`."""
+    relative = os.path.relpath(audio_path, root) if root else os.path.basename(audio_path)
+    return os.path.join(output_dir, os.path.splitext(relative)[0])
+
+def already_done(audio_path, json_path, skip_mode):
+    """
+    Verifica se o arquivo já foi transcrito.
+
+    No modo 'hash' a transcrição existente só vale se foi feita a partir do
+    mesmo conteúdo; no modo 'exists' basta o JSON existir.
+
+    Returns:
+        tuple: (já transcrito, hash do arquivo ou None)
+    """
+    if skip_mode == "none":
+        return False, None
+    if not os.path.exists(json_path):
+        return False, None
+    if skip_mode == "exists":
+        return True, None
+
+    source_hash = file_sha256(audio_path)
+    try:
+        with open(json_path, encoding="utf-8") as file:
+            return json.load(file).get("source_sha256") == source_hash, source_hash
+    except (OSError, ValueError):
+        return False, source_hash
+
+def _init_batch_worker(model_size, threads_per_worker, backend_name):
+    """Inicializa um processo do lote: carrega o modelo uma vez e não grava PCM ao lado das entradas."""
+    from src.armazenamento_audio import get_audio_store
+    from src.transcricao_paralela import warm_up_model
+
+    get_audio_store().use_sidecars = False
+    warm_up_model(model_size, threads_per_worker, backend_name)
+
+def _transcribe_batch_file(audio_path, language, model_size, enhance, profile, backend_name):
+    """Transcreve um arquivo do lote (em um processo do pool ou no processo principal)."""
+    from src.armazenamento_audio import get_audio_store
+    from src.tarefas import transcribe_file
+
+    start_time = time.time()
+    try:
+        result = transcribe_file(audio_path, language, model_size, enhance, profile=profile,
+                                 parallel_workers=0, backend=backend_name)
+    finally:
+        # Não acumular o áudio decodificado de centenas de arquivos
+        get_audio_store().release(audio_path)
+    return result, time.time() - start_time
+
+def write_outputs(base_path, audio_path, source_hash, result, seconds, formats):
+    """Grava a transcrição em JSON (com metadados) e/ou TXT e retorna os caminhos gravados."""
+    output_dir = os.path.dirname(base_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+
+    written = {}
+    if "json" in formats:
+        json_path = f"{base_path}.json"
+        data = dict(result, source=audio_path, source_sha256=source_hash or file_sha256(audio_path),
+                    processing_seconds=round(seconds, 2))
+        temp_path = f"{json_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, json_path)
+        written["json"] = json_path
+    if "txt" in formats:
+        txt_path = f"{base_path}.txt"
+        with open(txt_path, "w", encoding="utf-8") as file:
+            file.write(result["text"])
+        written["txt"] = txt_path
+    return written
+
+def run_batch(inputs, output_dir, language="pt-BR", model_size=None, profile=None, backend=None,
+              enhance=True, workers=1, skip_mode="hash", formats=("json", "txt"), recursive=False):
+    """
+    Transcreve todos os arquivos de áudio de `inputs` sem interação.
+
+    Com `workers` maior que 1, cada processo do pool carrega o modelo uma única
+    vez e transcreve vários arquivos; com 1, tudo roda no processo atual com o
+    modelo do registro. Arquivos já transcritos são pulados conforme
+    `skip_mode`. Cada transcrição também é registrada nas decupagens salvas.
+    Ao final, um resumo com os tempos de cada arquivo é gravado em
+    `output_dir/resumo_lote.json`.
+
+    Returns:
+        dict: Resumo do lote
+    """
+    profile, model_size, _ = resolve_profile(profile, model_size)
+    backend_name = get_backend(backend).name
+    files = collect_audio_files(inputs, recursive)
+    root = os.path.commonpath([os.path.dirname(path) for path in files]) if files else None
+
+    print(f"Lote: {len(files)} arquivo(s), perfil {profile} (modelo {model_size}, backend {backend_name}), "
+          f"{workers} processo(s)")
+
+    start_time = time.time()
+    entries = {}
+    pending = []
+    for audio_path in files:
+        base_path = output_base(audio_path, root, output_dir)
+        done, source_hash = already_done(audio_path, f"{base_path}.json", skip_mode)
+        if done:
+            print(f"Pulando (já transcrito): {audio_path}")
+            entries[audio_path] = {"file": audio_path, "status": "skipped"}
+        else:
+            pending.append((audio_path, base_path, source_hash))
+
+    store = get_decupagem_store()
+
+    def finish(audio_path, base_path, source_hash, result, seconds):
+        written = write_outputs(base_path, audio_path, source_hash, result, seconds, formats)
+        written["transcript_id"] = store.save_transcript(audio_path, result, language, profile, model_size)
+        entries[audio_path] = dict({"file": audio_path, "status": "done", "seconds": round(seconds, 2)},
+                                   **written)
+        print(f"[{len(entries)}/{len(files)}] {audio_path} ({seconds:.1f} s)")
+
+    def fail(audio_path, error):
+        entries[audio_path] = {"file": audio_path, "status": "error", "error": f"{type(error).__name__}: {error}"}
+        print(f"[{len(entries)}/{len(files)}] Erro em {audio_path}: {type(error).__name__}: {error}")
+
+    if workers > 1 and len(pending) > 1:
+        cpu_count = os.cpu_count() or 1
+        workers = min(workers, len(pending))
+        threads_per_worker = max(1, cpu_count // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                 initargs=(model_size, threads_per_worker, backend_name)) as pool:
+            futures = {
+                pool.submit(_transcribe_batch_file, audio_path, language, model_size, enhance, profile,
+                            backend_name): (audio_path, base_path, source_hash)
+                for audio_path, base_path, source_hash in pending
+            }
+            for future in as_completed(futures):
+                audio_path, base_path, source_hash = futures[future]
+                try:
+                    result, seconds = future.result()
+                    finish(audio_path, base_path, source_hash, result, seconds)
+                except Exception as e:
+                    fail(audio_path, e)
+    else:
+        from src.armazenamento_audio import get_audio_store
+        get_audio_store().use_sidecars = False
+        for audio_path, base_path, source_hash in pending:
+            try:
+                result, seconds = _transcribe_batch_file(audio_path, language, model_size, enhance, profile,
+                                                         backend_name)
+                finish(audio_path, base_path, source_hash, result, seconds)
+            except Exception as e:
+                fail(audio_path, e)
+
+    results = [entries[audio_path] for audio_path in files]
+    summary = {
+        "profile": profile,
+        "model": model_size,
+        "backend": backend_name,
+        "workers": workers,
+        "total_seconds": round(time.time() - start_time, 2),
+        "done": sum(1 for entry in results if entry["status"] == "done"),
+        "skipped": sum(1 for entry in results if entry["status"] == "skipped"),
+        "errors": sum(1 for entry in results if entry["status"] == "error"),
+        "files": results,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w", encoding="utf-8") as file:
+        json.dump(summary, file, ensure_ascii=False, indent=2)
+    return summary
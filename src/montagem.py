@@ -0,0 +1,70 @@
+import struct
+
+from src.utilidades_ffmpeg import encode_pcm_stream
+
+# Formatos de exportação da montagem: tipo MIME e codec do FFmpeg (None = PCM sem recodificar)
+EXPORT_FORMATS = {
+    "mp3": ("audio/mpeg", "libmp3lame"),
+    "wav": ("audio/wav", None),
+}
+
+def clip_frame_ranges(clips, sample_rate, total_frames):
+    """
+    Converte os clipes da montagem em intervalos de quadros do PCM.
+
+    Os tempos são arredondados para milissegundos e convertidos em quadros da
+    mesma forma que o fatiamento do pydub usado antes, para que a montagem
+    tenha exatamente as mesmas amostras.
+
+    Returns:
+        list: Pares (quadro inicial, quadro final) já limitados ao tamanho do áudio
+    """
+    frames_per_ms = sample_rate / 1000.0
+    ranges = []
+    for clip in clips:
+        start_ms = int(float(clip['startTime']) * 1000)
+        end_ms = int(float(clip['endTime']) * 1000)
+
+        start = min(max(0, int(start_ms * frames_per_ms)), total_frames)
+        end = min(max(0, int(end_ms * frames_per_ms)), total_frames)
+        if end > start:
+            ranges.append((start, end))
+    return ranges
+
+def iter_clip_buffers(pcm, ranges):
+    """Devolve cada clipe como uma visão do PCM original, sem copiar as amostras."""
+    for start, end in ranges:
+        yield memoryview(pcm[start:end]).cast("B")
+
+def wav_header(data_size, sample_rate, channels, sample_width=2):
+    """Cabeçalho WAV (PCM) para `data_size` bytes de amostras."""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b"data", data_size
+    )
+
+def stream_assembly(pcm, ranges, sample_rate, channels, output_format="mp3"):
+    """
+    Gera o arquivo da montagem em streaming a partir do PCM decodificado.
+
+    Os clipes nunca são concatenados em memória: cada fatia do PCM original é
+    enviada diretamente ao codificador (MP3) ou à resposta (WAV, sem
+    recodificação), então o custo é linear no número de clipes.
+
+    Yields:
+        bytes: Pedaços do arquivo de saída
+    """
+    _, codec = EXPORT_FORMATS[output_format]
+
+    if codec is None:
+        data_size = sum(end - start for start, end in ranges) * channels * 2
+        yield wav_header(data_size, sample_rate, channels)
+        for buffer in iter_clip_buffers(pcm, ranges):
+            yield bytes(buffer)
+        return
+
+    yield from encode_pcm_stream(iter_clip_buffers(pcm, ranges), sample_rate, channels,
+                                 output_format=output_format, codec=codec)
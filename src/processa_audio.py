@@ -1,23 +1,52 @@
 import os
 import tempfile
-import shutil
 import subprocess
-from pydub import AudioSegment
-from pydub.effects import normalize, compress_dynamic_range
+import numpy as np
 
-from src.utilidades_ffmpeg import check_ffmpeg
+from src.config import AUDIO_PROCESSING_MODE
+from src.importacao import timed_import
+from src.utilidades_ffmpeg import resolve_ffmpeg, ffmpeg_executable
+from src.processa_sinal import (
+    INT16_MAX_AMPLITUDE,
+    compress_dynamic_range_array,
+    detect_nonsilent_ranges,
+)
+from src.armazenamento_audio import get_audio_store, sidecar_path, open_sidecar
+
+# Equalização para voz, compressão suave e limitador em -6dB aplicados no fim do processamento
+RADIO_FINAL_FILTERS = 'equalizer=f=300:width_type=o:width=1:g=1.5,compand=0|0:1|1:-6/-6:-6/-6:0:0:0.1,alimiter=limit=-6dB:level=true'
+
+# Cadeia completa em um único grafo: 44100 Hz estéreo, passa-alta de 80 Hz (1 polo, como o pydub),
+# compressão (-24 dB, 2.5:1, attack 10 ms, release 100 ms) e os filtros finais
+RADIO_FILTER_GRAPH = (
+    'aresample=44100,aformat=channel_layouts=stereo,'
+    'highpass=f=80:poles=1,'
+    'acompressor=threshold=-24dB:ratio=2.5:attack=10:release=100,'
+    + RADIO_FINAL_FILTERS
+)
+
+# Filtros do FFmpeg usados pelo grafo completo; sem algum deles o processamento vai direto para o pydub
+RADIO_GRAPH_FILTERS = ('aresample', 'aformat', 'highpass', 'acompressor', 'equalizer', 'compand', 'alimiter')
+
+def _load_pydub():
+    """Importa o pydub apontando-o para o FFmpeg resolvido."""
+    pydub = timed_import("pydub")
+    info = resolve_ffmpeg()
+    if info.available:
+        pydub.AudioSegment.converter = info.ffmpeg
+        if info.ffprobe:
+            pydub.AudioSegment.ffprobe = info.ffprobe
+    return pydub
 
 def convert_mp3_to_wav(mp3_path):
     """Converte um arquivo MP3 para WAV usando pydub."""
     try:
         # Verificar se o FFmpeg está disponível
-        if not shutil.which('ffmpeg'):
-            if not check_ffmpeg():
-                print("FFmpeg é necessário para converter arquivos MP3.")
-                return None
+        if not resolve_ffmpeg().available:
+            print("FFmpeg é necessário para converter arquivos MP3.")
+            return None
         
-        import pydub
-        from pydub import AudioSegment
+        AudioSegment = _load_pydub().AudioSegment
         
         sound = AudioSegment.from_mp3(mp3_path)
         
@@ -32,7 +61,7 @@ def convert_mp3_to_wav(mp3_path):
         print(f"Erro ao converter MP3 para WAV: {e}")
         return None
 
-def process_audio_for_radio(audio_path):
+def process_audio_for_radio(audio_path, mode=None):
     """
     Processa o áudio para padrões de transmissão de rádio:
     - Converte para estéreo
@@ -41,80 +70,43 @@ def process_audio_for_radio(audio_path):
     - Normaliza com limite de -6dB
     - Aplica equalização básica para voz
 
+    Args:
+        audio_path: Caminho do arquivo enviado
+        mode: 'ffmpeg' para processar tudo em um único grafo de filtros do FFmpeg,
+            em streaming e com memória constante, ou 'pydub' para o processamento
+            em Python. Se não for informado, usa AUDIO_PROCESSING_MODE da configuração.
+
     Returns:
         str: Caminho para o arquivo processado
     """
+    mode = mode or AUDIO_PROCESSING_MODE
+    
     try:
         # Verificar se o FFmpeg está disponível
-        if not shutil.which('ffmpeg'):
-            if not check_ffmpeg():
-                print("FFmpeg é necessário para processar o áudio.")
-                return audio_path
+        ffmpeg = resolve_ffmpeg()
+        if not ffmpeg.available:
+            print("FFmpeg é necessário para processar o áudio.")
+            return audio_path
         
         print(f"Processando áudio para padrões de rádio: {audio_path}")
         
-        # Carregar o áudio
-        audio = AudioSegment.from_file(audio_path)
-        
-        # Converter para estéreo se for mono
-        if audio.channels == 1:
-            audio = audio.set_channels(2)
-            print("Áudio convertido para estéreo")
-        
-        # Ajustar taxa de amostragem para 44100 Hz
-        if audio.frame_rate != 44100:
-            audio = audio.set_frame_rate(44100)
-            print(f"Taxa de amostragem ajustada para 44100 Hz")
-        
-        # Filtros básicos primeiro
-        # Remover frequências baixas (abaixo de 80Hz) que podem causar ruído
-        audio = audio.high_pass_filter(80)
-        print("Filtro passa-alta aplicado")
-        
-        # Aplicar compressão dinâmica mais suave
-        # Reduzindo a ratio e ajustando threshold
-        audio = compress_dynamic_range(audio, 
-                                      threshold=-24,  # Threshold mais baixo
-                                      ratio=2.5,      # Ratio mais moderada
-                                      attack=10.0,    # Attack mais lento
-                                      release=100.0)  # Release mais lento
-        print("Compressão dinâmica aplicada")
-        
-        # Criar arquivo temporário para o áudio pré-processado
-        fd, temp_audio = tempfile.mkstemp(suffix='.wav')
-        os.close(fd)
-        audio.export(temp_audio, format="wav")
-        
-        # Aplicar todos os processamentos finais com FFmpeg em uma única chamada:
-        # 1. Equalização leve para voz
-        # 2. Compressão suave
-        # 3. Limitador rigoroso em -6dB
         file_ext = os.path.splitext(audio_path)[1]
         filename = f"processed_{os.path.basename(audio_path)}"
         processed_path = os.path.join("uploads", filename)
+        codec = 'libmp3lame' if file_ext.lower() == '.mp3' else 'pcm_s16le'
         
-        ffmpeg_cmd = [
-            'ffmpeg', '-y',
-            '-i', temp_audio,
-            '-af', 'equalizer=f=300:width_type=o:width=1:g=1.5,compand=0|0:1|1:-6/-6:-6/-6:0:0:0.1,alimiter=limit=-6dB:level=true',
-            '-acodec', 'libmp3lame' if file_ext.lower() == '.mp3' else 'pcm_s16le',
-            processed_path
-        ]
+        missing_filters = ffmpeg.missing_filters(RADIO_GRAPH_FILTERS) if mode == 'ffmpeg' else []
+        if missing_filters:
+            print(f"Aviso: FFmpeg sem os filtros {', '.join(missing_filters)}, usando processamento com pydub")
+        elif mode == 'ffmpeg':
+            try:
+                _process_with_filter_graph(audio_path, processed_path, codec)
+                print(f"Áudio processado salvo em: {processed_path}")
+                return processed_path
+            except subprocess.CalledProcessError as e:
+                print(f"Aviso: Grafo de filtros do FFmpeg falhou, usando processamento com pydub: {e}")
         
-        try:
-            subprocess.run(ffmpeg_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            print("Processamento final aplicado via FFmpeg (equalização e limitador)")
-        except subprocess.CalledProcessError as e:
-            print(f"Aviso: Não foi possível aplicar o processamento final: {e}")
-            # Em caso de falha, aplicar apenas normalização básica e exportar
-            audio = normalize(audio, headroom=6.0)  # -6dB headroom
-            audio.export(processed_path, format="mp3" if file_ext.lower() == '.mp3' else "wav")
-        
-        # Limpar arquivo temporário
-        try:
-            os.remove(temp_audio)
-        except Exception as e:
-            print(f"Aviso: Não foi possível remover arquivo temporário: {e}")
+        _process_with_pydub(audio_path, processed_path, codec)
         
         print(f"Áudio processado salvo em: {processed_path}")
         return processed_path
@@ -123,31 +115,154 @@ def process_audio_for_radio(audio_path):
         # Retornar o caminho original em caso de erro
         return audio_path
 
+def _run_radio_ffmpeg(input_args, filter_graph, processed_path, codec, input_data=None):
+    """
+    Executa o FFmpeg gravando o arquivo processado e, na mesma passada, o PCM resultante.
+
+    O PCM de saída (44100 Hz, estéreo, 16 bits) é registrado no armazenamento de
+    áudio para que transcrição e montagem não precisem decodificar o arquivo. Com
+    sidecars ativados ele vai direto para um arquivo bruto mapeado em memória;
+    caso contrário, vai para um arquivo temporário, lido de uma vez para um
+    único array (e só se couber no orçamento de memória do armazenamento), em
+    vez de acumular o stdout inteiro do FFmpeg.
+    """
+    store = get_audio_store()
+    final_path = sidecar_path(processed_path, 44100, 2)
+    if store.use_sidecars:
+        pcm_output = final_path + ".tmp"
+    else:
+        fd, pcm_output = tempfile.mkstemp(suffix=".pcm")
+        os.close(fd)
+    
+    ffmpeg_cmd = [
+        ffmpeg_executable(), '-y',
+        *input_args,
+        '-filter_complex', f'[0:a]{filter_graph},asplit=2[file][pcm]',
+        '-map', '[file]', '-acodec', codec, processed_path,
+        '-map', '[pcm]', '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ar', '44100', '-ac', '2', pcm_output
+    ]
+    try:
+        subprocess.run(ffmpeg_cmd, input=input_data, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        
+        if store.use_sidecars:
+            os.replace(pcm_output, final_path)
+            # O sidecar só é considerado válido se não for mais antigo que o arquivo processado
+            os.utime(final_path)
+            pcm = open_sidecar(processed_path, 44100, 2)
+        elif store.memory_budget_bytes and os.path.getsize(pcm_output) > store.memory_budget_bytes:
+            # Maior que o orçamento inteiro: seria descartado em seguida, então fica para decodificar sob demanda
+            return
+        else:
+            pcm = np.fromfile(pcm_output, dtype=np.int16).reshape(-1, 2)
+    finally:
+        if os.path.exists(pcm_output):
+            os.remove(pcm_output)
+    store.put(processed_path, 44100, 2, pcm)
+
+def _process_with_filter_graph(audio_path, processed_path, codec):
+    """Aplica toda a cadeia de rádio em uma única passada do FFmpeg, lendo o arquivo em streaming."""
+    _run_radio_ffmpeg(['-nostdin', '-i', audio_path], RADIO_FILTER_GRAPH, processed_path, codec)
+    print("Processamento aplicado via FFmpeg em uma única passada (resample, passa-alta, compressão, equalização e limitador)")
+
+def _process_with_pydub(audio_path, processed_path, codec):
+    """Processa o áudio com pydub e aplica os filtros finais com o FFmpeg."""
+    pydub = _load_pydub()
+    normalize = timed_import("pydub.effects").normalize
+    
+    # Carregar o áudio
+    audio = pydub.AudioSegment.from_file(audio_path)
+    
+    # Converter para estéreo se for mono
+    if audio.channels == 1:
+        audio = audio.set_channels(2)
+        print("Áudio convertido para estéreo")
+    
+    # Ajustar taxa de amostragem para 44100 Hz
+    if audio.frame_rate != 44100:
+        audio = audio.set_frame_rate(44100)
+        print(f"Taxa de amostragem ajustada para 44100 Hz")
+    
+    # Usar amostras de 16 bits, formato do PCM enviado ao FFmpeg
+    if audio.sample_width != 2:
+        audio = audio.set_sample_width(2)
+    
+    # Filtros básicos primeiro
+    # Remover frequências baixas (abaixo de 80Hz) que podem causar ruído
+    audio = audio.high_pass_filter(80)
+    print("Filtro passa-alta aplicado")
+    
+    # Aplicar compressão dinâmica mais suave
+    # Reduzindo a ratio e ajustando threshold
+    samples = np.frombuffer(audio.raw_data, dtype=np.int16).reshape(-1, audio.channels)
+    samples = compress_dynamic_range_array(samples, audio.frame_rate,
+                                           threshold=-24,  # Threshold mais baixo
+                                           ratio=2.5,      # Ratio mais moderada
+                                           attack=10.0,    # Attack mais lento
+                                           release=100.0)  # Release mais lento
+    audio = audio._spawn(samples.tobytes())
+    print("Compressão dinâmica aplicada")
+    
+    # Aplicar todos os processamentos finais com FFmpeg em uma única chamada:
+    # 1. Equalização leve para voz
+    # 2. Compressão suave
+    # 3. Limitador rigoroso em -6dB
+    # O PCM pré-processado vai direto para o stdin do FFmpeg, sem WAV temporário
+    try:
+        input_args = ['-f', 's16le', '-ar', str(audio.frame_rate), '-ac', str(audio.channels), '-i', 'pipe:0']
+        _run_radio_ffmpeg(input_args, RADIO_FINAL_FILTERS, processed_path, codec, input_data=audio.raw_data)
+        print("Processamento final aplicado via FFmpeg (equalização e limitador)")
+    except subprocess.CalledProcessError as e:
+        print(f"Aviso: Não foi possível aplicar o processamento final: {e}")
+        # Em caso de falha, aplicar apenas normalização básica e exportar
+        audio = normalize(audio, headroom=6.0)  # -6dB headroom
+        audio.export(processed_path, format="mp3" if codec == 'libmp3lame' else "wav")
+
 def detect_silence(audio_segment, min_silence_len=500, silence_thresh=-40, keep_silence=100):
     """Detecta silêncios em um segmento de áudio para ajudar na identificação de frases."""
-    from pydub.silence import detect_nonsilent
-    
+    samples = np.array(audio_segment.get_array_of_samples()).reshape(-1, audio_segment.channels)
+    return detect_speech_ranges(samples, audio_segment.frame_rate,
+                                min_silence_len=min_silence_len,
+                                silence_thresh=silence_thresh,
+                                keep_silence=keep_silence,
+                                max_amplitude=audio_segment.max_possible_amplitude)
+
+def detect_speech_ranges(samples, sample_rate, min_silence_len=500, silence_thresh=-40, keep_silence=100,
+                         max_amplitude=INT16_MAX_AMPLITUDE):
+    """
+    Detecta os trechos com fala diretamente sobre um array de amostras.
+
+    Args:
+        samples: Array int16 com formato (quadros, canais) ou mono 1-D
+        sample_rate: Taxa de amostragem do array
+
+    Returns:
+        list: Pares (início, fim) em milissegundos, com margem de `keep_silence` ms
+    """
     # Detectar partes não silenciosas
-    non_silent_ranges = detect_nonsilent(audio_segment, 
-                                        min_silence_len=min_silence_len,
-                                        silence_thresh=silence_thresh)
+    non_silent_ranges = detect_nonsilent_ranges(samples, sample_rate,
+                                                min_silence_len=min_silence_len,
+                                                silence_thresh=silence_thresh,
+                                                max_amplitude=max_amplitude)
     
     # Converter para timestamps em milissegundos
     if not non_silent_ranges:
         return []
     
     # Adicionar margem de silêncio em torno das partes não silenciosas
+    total_ms = int(round(1000 * len(samples) / sample_rate))
     ranges = []
     for start, end in non_silent_ranges:
         start = max(0, start - keep_silence)
-        end = min(len(audio_segment), end + keep_silence)
+        end = min(total_ms, end + keep_silence)
         ranges.append((start, end))
     
     return ranges
 
 def segment_audio(audio_file_path):
     """Segmenta o áudio em frases baseado em pausas."""
-    from pydub import AudioSegment
+    AudioSegment = _load_pydub().AudioSegment
     
     print("Analisando o áudio para detectar pausas entre frases...")
     
@@ -162,23 +277,60 @@ def segment_audio(audio_file_path):
         return [audio]
     
     # Fundir segmentos próximos para evitar fragmentação excessiva
+    merged_ranges = merge_speech_ranges(non_silent_ranges)
+    
+    # Extrair os segmentos de áudio
+    segments = []
+    for start, end in merged_ranges:
+        segment = audio[start:end]
+        segments.append(segment)
+    
+    return segments
+
+def merge_speech_ranges(non_silent_ranges, max_gap_ms=1000):
+    """Funde trechos não silenciosos separados por pausas menores que `max_gap_ms`."""
+    if not non_silent_ranges:
+        return []
+    
     merged_ranges = []
     current_start, current_end = non_silent_ranges[0]
     
     for start, end in non_silent_ranges[1:]:
         # Se o intervalo entre segmentos for pequeno, fundir
-        if start - current_end < 1000:  # menos de 1 segundo
+        if start - current_end < max_gap_ms:
             current_end = end
         else:
             merged_ranges.append((current_start, current_end))
             current_start, current_end = start, end
     
     merged_ranges.append((current_start, current_end))
+    return merged_ranges
+
+def plan_chunks(speech_ranges, total_ms, target_chunk_ms=60000):
+    """
+    Divide a linha do tempo em blocos de aproximadamente `target_chunk_ms`.
+
+    Os cortes são feitos no meio das pausas entre trechos de fala, de modo que
+    nenhuma palavra seja partida e os blocos cubram todo o áudio sem lacunas.
+
+    Returns:
+        list: Pares (início, fim) em milissegundos
+    """
+    if not speech_ranges:
+        return [(0, total_ms)]
     
-    # Extrair os segmentos de áudio
-    segments = []
-    for start, end in merged_ranges:
-        segment = audio[start:end]
-        segments.append(segment)
+    # Pontos de corte possíveis: o meio de cada pausa entre trechos de fala
+    cut_points = [
+        (previous_end + next_start) // 2
+        for (_, previous_end), (next_start, _) in zip(speech_ranges, speech_ranges[1:])
+    ]
     
-    return segments
+    chunks = []
+    chunk_start = 0
+    for cut in cut_points:
+        if cut - chunk_start >= target_chunk_ms:
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+    chunks.append((chunk_start, total_ms))
+    
+    return chunks
@@ -0,0 +1,203 @@
+import numpy as np
+
+# Amplitude máxima de amostras de 16 bits (mesmo valor de AudioSegment.max_possible_amplitude)
+INT16_MAX_AMPLITUDE = 32768
+
+def _as_frames(samples):
+    """Garante o formato (quadros, canais) para arrays mono ou multicanal."""
+    samples = np.asarray(samples)
+    if samples.ndim == 1:
+        samples = samples.reshape(-1, 1)
+    return samples
+
+def _energy_cumsum(samples):
+    """Soma acumulada da energia (soma dos quadrados de todos os canais) por quadro."""
+    # int64 é exato mesmo para horas de áudio em 16 bits (32768² x canais x quadros < 2^63)
+    energy = np.einsum("ij,ij->i", samples.astype(np.int64), samples.astype(np.int64))
+    cumsum = np.empty(len(energy) + 1, dtype=np.int64)
+    cumsum[0] = 0
+    np.cumsum(energy, out=cumsum[1:])
+    return cumsum
+
+def _rms_from_cumsum(cumsum, frames, channels, starts, ends):
+    """RMS das janelas [início, fim) a partir da soma acumulada de `_energy_cumsum`."""
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    counts = (ends - starts) * channels
+    sums = cumsum[np.minimum(ends, frames)] - cumsum[np.minimum(starts, frames)]
+
+    rms = np.zeros(len(starts), dtype=np.float64)
+    valid = counts > 0
+    rms[valid] = np.floor(np.sqrt(sums[valid] / counts[valid]))
+    return rms
+
+def window_rms(samples, starts, ends):
+    """
+    Calcula o RMS de várias janelas [início, fim) de quadros de uma só vez.
+
+    Como no pydub, quadros além do fim do áudio contam como silêncio e o
+    resultado é truncado para inteiro (como `audioop.rms`).
+    """
+    samples = _as_frames(samples)
+    frames, channels = samples.shape
+    return _rms_from_cumsum(_energy_cumsum(samples), frames, channels, starts, ends)
+
+def detect_silent_ranges(samples, sample_rate, min_silence_len=1000, silence_thresh=-16,
+                         seek_step=1, max_amplitude=INT16_MAX_AMPLITUDE):
+    """
+    Equivalente vetorizado de `pydub.silence.detect_silence`.
+
+    Avalia todas as janelas de `min_silence_len` ms de uma vez com uma soma
+    acumulada da energia, em vez de fatiar o áudio milissegundo a milissegundo.
+
+    Args:
+        samples: Array de amostras inteiras, formato (quadros, canais) ou mono 1-D
+
+    Returns:
+        list: Pares [início, fim] em milissegundos dos trechos silenciosos
+    """
+    samples = _as_frames(samples)
+    frames = samples.shape[0]
+    seg_len = int(round(1000 * frames / sample_rate))
+
+    if seg_len < min_silence_len:
+        return []
+
+    thresh = (10 ** (silence_thresh / 20.0)) * max_amplitude
+
+    last_slice_start = seg_len - min_silence_len
+    slice_starts = np.arange(0, last_slice_start + 1, seek_step, dtype=np.int64)
+    if last_slice_start % seek_step:
+        slice_starts = np.append(slice_starts, last_slice_start)
+
+    # Mesma conversão de milissegundos para quadros usada pelo pydub
+    frames_per_ms = sample_rate / 1000.0
+    start_frames = (slice_starts * frames_per_ms).astype(np.int64)
+    end_frames = ((slice_starts + min_silence_len) * frames_per_ms).astype(np.int64)
+
+    silent = window_rms(samples, start_frames, end_frames) <= thresh
+    silence_starts = slice_starts[silent]
+    if len(silence_starts) == 0:
+        return []
+
+    # Agrupar inícios consecutivos em trechos: um novo trecho começa quando há
+    # descontinuidade e a distância supera o tamanho da janela
+    gaps = np.diff(silence_starts)
+    breaks = np.nonzero((gaps != seek_step) & (gaps > min_silence_len))[0]
+
+    range_starts = np.concatenate(([silence_starts[0]], silence_starts[breaks + 1]))
+    range_ends = np.concatenate((silence_starts[breaks], [silence_starts[-1]])) + min_silence_len
+
+    return [[int(start), int(end)] for start, end in zip(range_starts, range_ends)]
+
+def detect_nonsilent_ranges(samples, sample_rate, min_silence_len=1000, silence_thresh=-16,
+                            seek_step=1, max_amplitude=INT16_MAX_AMPLITUDE):
+    """Equivalente vetorizado de `pydub.silence.detect_nonsilent`."""
+    samples = _as_frames(samples)
+    silent_ranges = detect_silent_ranges(samples, sample_rate, min_silence_len, silence_thresh,
+                                         seek_step, max_amplitude)
+    len_seg = int(round(1000 * samples.shape[0] / sample_rate))
+
+    # Se não há silêncio, o áudio todo é não silencioso
+    if not silent_ranges:
+        return [[0, len_seg]]
+
+    # O áudio todo é silencioso
+    if silent_ranges[0][0] == 0 and silent_ranges[0][1] == len_seg:
+        return []
+
+    prev_end_i = 0
+    nonsilent_ranges = []
+    for start_i, end_i in silent_ranges:
+        nonsilent_ranges.append([prev_end_i, start_i])
+        prev_end_i = end_i
+
+    if end_i != len_seg:
+        nonsilent_ranges.append([prev_end_i, len_seg])
+
+    if nonsilent_ranges[0] == [0, 0]:
+        nonsilent_ranges.pop(0)
+
+    return nonsilent_ranges
+
+def compress_dynamic_range_array(samples, sample_rate, threshold=-20.0, ratio=4.0, attack=5.0,
+                                 release=50.0, max_amplitude=INT16_MAX_AMPLITUDE, block_ms=0.25,
+                                 refine_db=0.1):
+    """
+    Compressor dinâmico sobre arrays, aproximando
+    `pydub.effects.compress_dynamic_range`.
+
+    O RMS da janela de attack é calculado para todos os pontos de controle com
+    uma soma acumulada. O seguidor de envelope (attack/release) roda em blocos
+    de `block_ms` em vez de a cada amostra, e o ganho é interpolado entre os
+    blocos antes de ser aplicado. Blocos em que o sinal cruza o limiar ou a
+    atenuação máxima varia mais de `refine_db` são avaliados amostra a
+    amostra, para não suavizar os transientes de attack.
+
+    Com os valores padrão, a saída difere da do pydub em no máximo 1% do
+    fundo de escala (328 em amostras de 16 bits); o teste de paridade em
+    tests/test_processa_sinal.py confere esse limite.
+
+    Returns:
+        numpy.ndarray: Amostras comprimidas, mesmo formato e tipo da entrada
+    """
+    original_shape = np.shape(samples)
+    samples = _as_frames(samples)
+    frames = samples.shape[0]
+    if frames == 0:
+        return samples.reshape(original_shape)
+
+    thresh_rms = max_amplitude * (10 ** (threshold / 20.0))
+    look_frames = int(sample_rate * attack / 1000.0)
+    attack_frames = sample_rate * attack / 1000.0
+    release_frames = sample_rate * release / 1000.0
+    hop = max(1, int(sample_rate * block_ms / 1000.0))
+    cumsum = _energy_cumsum(samples)
+
+    def envelope_inputs(positions):
+        # RMS da janela [i - attack, i) e atenuação máxima (dB) permitida em cada ponto de controle
+        rms = _rms_from_cumsum(cumsum, frames, samples.shape[1], np.maximum(positions - look_frames, 0), positions)
+        with np.errstate(divide="ignore"):
+            db_over = np.where(rms > 0, 20 * np.log10(np.maximum(rms, 1e-12) / thresh_rms), 0.0)
+        return rms > thresh_rms, (1 - (1.0 / ratio)) * np.maximum(db_over, 0.0)
+
+    positions = np.arange(0, frames, hop, dtype=np.int64)
+    above, max_attenuation = envelope_inputs(positions)
+
+    # Onde o envelope muda depressa (o sinal cruza o limiar, a atenuação máxima salta ou a janela de
+    # attack ainda está incompleta no início), o bloco inteiro é avaliado amostra a amostra
+    fast = ((above[1:] != above[:-1]) | (np.abs(np.diff(max_attenuation)) > refine_db)
+            | (positions[:-1] < look_frames))
+    refined = positions[:-1][fast]
+    if hop > 1 and len(refined):
+        extra = (refined[:, None] + np.arange(1, hop, dtype=np.int64)).ravel()
+        positions = np.union1d(positions, extra[extra < frames])
+        above, max_attenuation = envelope_inputs(positions)
+
+    # Seguidor de envelope: recorrente, então roda em Python mas só uma vez por ponto de controle,
+    # avançando o número de amostras desde o ponto anterior
+    steps = np.diff(positions, prepend=positions[0] - 1).tolist()
+    above = above.tolist()
+    max_att = max_attenuation.tolist()
+    attenuation_db = np.empty(len(positions), dtype=np.float64)
+    attenuation = 0.0
+    for i in range(len(positions)):
+        if above[i] and attenuation <= max_att[i]:
+            attenuation = min(attenuation + steps[i] * max_att[i] / attack_frames, max_att[i])
+        else:
+            attenuation = max(attenuation - steps[i] * max_att[i] / release_frames, 0.0)
+        attenuation_db[i] = attenuation
+    gains = 10 ** (-attenuation_db / 20.0)
+
+    # Aplicar o ganho em pedaços para não alocar arrays float do tamanho do áudio inteiro
+    info = np.iinfo(samples.dtype)
+    output = np.empty_like(samples)
+    chunk = hop * 10000
+    for start in range(0, frames, chunk):
+        end = min(frames, start + chunk)
+        gain = np.interp(np.arange(start, end), positions, gains)
+        block = samples[start:end].astype(np.float64) * gain[:, None]
+        # Truncar e limitar como audioop.mul
+        output[start:end] = np.clip(block, info.min, info.max).astype(samples.dtype)
+
+    return output.reshape(original_shape)
@@ -1,101 +1,267 @@
 import re
 import subprocess
 import sys
+import threading
 
-def improve_transcript(text):
-    """Melhora a qualidade da transcrição com pontuação e formatação usando spaCy."""
-    if not text:
-        return text
-    
-    print("\nAprimorando transcrição com spaCy...")
-    return improve_transcript_advanced(text)
+from src.config import SPACY_BATCH_SIZE, SPACY_N_PROCESS
+from src.importacao import timed_import
 
-def improve_transcript_advanced(text):
-    """Usa processamento de linguagem natural para aprimorar a transcrição."""
-    try:
-        import spacy
+SPACY_MODEL = "pt_core_news_md"
+
+# Componentes do modelo que não participam da segmentação de sentenças
+SPACY_EXCLUDED_COMPONENTS = ["morphologizer", "attribute_ruler", "lemmatizer", "ner"]
+
+# Conectores comuns que geralmente separam frases, todos em uma única alternância
+# (expressões mais longas primeiro, para "e também" ter prioridade)
+CONNECTORS = ["porque", "portanto", "então", "assim", "contudo", "todavia",
+              "entretanto", "porém", "mas", "e também", "além disso"]
+_CONNECTOR_RE = re.compile(
+    r'\s+(' + '|'.join(re.escape(c) for c in sorted(CONNECTORS, key=len, reverse=True)) + r')\s+',
+    re.IGNORECASE
+)
+
+_PERCENTAGE_RE = re.compile(r'(\d+(?:,\d+)?(?:\.\d+)?)\s*%')
+_MARKER_RE = re.compile(r'__PERCENTAGE_(\d+)__')
+_DOTS_RE = re.compile(r'\.+')
+_QUESTION_RE = re.compile(r'quem|qual|quando|onde|como|por que')
+
+# Caracteres que não fazem parte da "chave" de uma palavra (pontuação e espaços)
+_NON_WORD_RE = re.compile(r'\W+')
+
+# Sequência de pontuação com os espaços que a precedem e o '%' opcional antes dela
+_PUNCTUATION_RUN_RE = re.compile(r'(%?)\s*([.,;:!?](?:\s*[.,;:!?])*)')
+
+# Pipeline spaCy carregado uma única vez por processo
+_nlp = None
+_nlp_lock = threading.Lock()
+
+def get_nlp():
+    """
+    Retorna o pipeline spaCy do processo, carregando-o apenas na primeira chamada.
+    
+    Só são carregados os componentes usados na segmentação de sentenças
+    (tok2vec e parser, mais o sentencizer); NER, lematizador e morfologia ficam
+    de fora.
+    """
+    global _nlp
+    with _nlp_lock:
+        if _nlp is not None:
+            return _nlp
+        
+        spacy = timed_import("spacy")
         print("Carregando modelo de linguagem spaCy...")
         
         # Verificar se o modelo está instalado
         try:
-            nlp = spacy.load("pt_core_news_md")
+            nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDED_COMPONENTS)
         except OSError:
             print("Modelo spaCy para português (médio) não encontrado. Instalando...")
-            subprocess.run([sys.executable, "-m", "spacy", "download", "pt_core_news_md"], check=True)
-            nlp = spacy.load("pt_core_news_md")
-        
-        # Pré-processamento com regras básicas antes de usar o spaCy
-        # Isso ajuda a fornecer algumas dicas ao segmentador do spaCy
-        processed_text = text
-        
-        # Adicionar pontos temporários para ajudar na segmentação
-        # Conectores comuns que geralmente separam frases
-        connectors = ["porque", "portanto", "então", "assim", "contudo", "todavia", 
-                      "entretanto", "porém", "mas", "e também", "além disso"]
-        
-        for connector in connectors:
-            pattern = fr'\s+{connector}\s+'
-            processed_text = re.sub(pattern, f'. {connector} ', processed_text, flags=re.IGNORECASE)
-        
-        # Manipular porcentagens para preservar sua integridade
-        # Substituir temporariamente percentagens por marcadores especiais
-        percentage_markers = {}
-        percentage_pattern = r'(\d+(?:,\d+)?(?:\.\d+)?)\s*%'
-        percentages = re.finditer(percentage_pattern, processed_text)
-        
-        for i, match in enumerate(percentages):
-            marker = f"__PERCENTAGE_{i}__"
-            percentage_markers[marker] = match.group(0)
-            processed_text = processed_text.replace(match.group(0), marker)
+            subprocess.run([sys.executable, "-m", "spacy", "download", SPACY_MODEL], check=True)
+            nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDED_COMPONENTS)
         
         # Configurações personalizadas para segmentação de sentenças
         nlp.add_pipe("sentencizer")
         
-        # Processar o texto pré-processado
-        doc = nlp(processed_text)
+        _nlp = nlp
+        return _nlp
+
+def improve_transcripts(texts, batch_size=None, n_process=None):
+    """
+    Aprimora vários textos de uma vez (transcrições inteiras ou textos de segmentos).
+    
+    Os textos passam juntos pelo pipeline com `nlp.pipe`, em lotes de
+    `batch_size` e opcionalmente em `n_process` processos.
+    
+    Returns:
+        list: Textos aprimorados, na mesma ordem da entrada
+    """
+    texts = list(texts)
+    try:
+        nlp = get_nlp()
+    except ImportError:
+        print("Biblioteca spaCy não encontrada. Instale com: pip install spacy")
+        print("Retornando textos sem aprimoramento.")
+        return texts
+    
+    # Textos vazios são devolvidos como estão
+    pending = [i for i, text in enumerate(texts) if text]
+    prepared = [_prepare_text(texts[i]) for i in pending]
+    
+    docs = nlp.pipe(
+        (processed_text for processed_text, _ in prepared),
+        batch_size=batch_size or SPACY_BATCH_SIZE,
+        n_process=n_process or SPACY_N_PROCESS,
+    )
+    
+    improved = list(texts)
+    for i, doc, (_, percentage_markers) in zip(pending, docs, prepared):
+        improved[i] = _render_doc(doc, percentage_markers)
+    return improved
+
+def _word_key(text):
+    """Forma normalizada de uma palavra: só letras e números, em minúsculas."""
+    return _NON_WORD_RE.sub('', text).lower()
+
+def map_words(words, enhanced_text):
+    """
+    Aplica a pontuação e a capitalização do texto aprimorado às palavras do segmento.
+    
+    As palavras do Whisper e os tokens do texto aprimorado são alinhados pela
+    forma normalizada (sem pontuação, em minúsculas); cada palavra mantém seus
+    timestamps e recebe a grafia do texto aprimorado. Se o alinhamento falhar,
+    as palavras são devolvidas sem alteração.
+    
+    Returns:
+        list: Novas palavras (as originais não são modificadas)
+    """
+    tokens = enhanced_text.split()
+    mapped = []
+    position = 0
+    
+    for word in words:
+        key = _word_key(word["word"])
+        if not key:
+            # Palavra só de pontuação: mantida como veio do Whisper
+            mapped.append(dict(word))
+            continue
         
-        # Reconstruir o texto com pontuação adequada
-        sentences = []
-        for sent in doc.sents:
-            # Limpar pontuação temporária que adicionamos
-            sentence = sent.text.strip()
-            sentence = re.sub(r'\.+', '.', sentence)
-            
-            # Capitalizar primeira letra
-            if sentence:
-                sentence = sentence[0].upper() + sentence[1:]
-            
-            # Verificar se termina com pontuação
-            if sentence and sentence[-1] not in ['.', '!', '?']:
-                # Verificar se é uma pergunta
-                if any(qw in sentence.lower() for qw in ["quem", "qual", "quando", "onde", "como", "por que"]):
-                    sentence += '?'
-                else:
-                    sentence += '.'
-            
-            sentences.append(sentence)
+        pieces = []
+        matched = ''
+        while position < len(tokens) and len(matched) < len(key):
+            token = tokens[position]
+            position += 1
+            token_key = _word_key(token)
+            if not token_key and not pieces:
+                # Pontuação solta antes da palavra pertence à palavra anterior
+                if mapped:
+                    mapped[-1]["word"] += token
+                continue
+            pieces.append(token)
+            matched += token_key
         
-        # Juntar as sentenças
-        improved_text = ' '.join(sentences)
+        if matched != key:
+            return [dict(w) for w in words]
         
-        # Restaurar os marcadores de percentagem
-        for marker, percentage in percentage_markers.items():
-            improved_text = improved_text.replace(marker, percentage)
+        # Pontuação solta logo depois da palavra
+        while position < len(tokens) and not _word_key(tokens[position]):
+            pieces[-1] += tokens[position]
+            position += 1
         
-        # Pós-processamento
-        # Corrigir espaços antes de pontuação
-        improved_text = re.sub(r'\s+([.,;:!?])', r'\1', improved_text)
+        original = word["word"]
+        leading = original[:len(original) - len(original.lstrip())]
+        mapped.append(dict(word, word=leading + ' '.join(pieces)))
+    
+    # Sobrou texto que não corresponde a nenhuma palavra
+    if any(_word_key(token) for token in tokens[position:]):
+        return [dict(w) for w in words]
+    
+    return mapped
+
+class SegmentEnhancer:
+    """
+    Aprimora os segmentos de uma transcrição à medida que eles são decodificados.
+    
+    Cada segmento passa pelo spaCy uma única vez, quando chega; o texto e as
+    palavras (com seus timestamps) são atualizados e o texto completo é a
+    junção dos segmentos já aprimorados, sem reprocessar a transcrição inteira.
+    """
+    
+    def __init__(self):
+        self.segments = []
+    
+    def feed(self, segments):
+        """
+        Aprimora um lote de segmentos novos, na ordem do áudio.
+        
+        Returns:
+            list: Cópias aprimoradas dos segmentos recebidos
+        """
+        segments = list(segments)
+        texts = improve_transcripts(segment["text"] for segment in segments)
         
-        # Remover pontuação duplicada
-        improved_text = re.sub(r'([.,;:!?])\1+', r'\1', improved_text)
+        enhanced = []
+        for segment, text in zip(segments, texts):
+            segment_data = dict(segment, text=text)
+            if segment.get("words"):
+                segment_data["words"] = map_words(segment["words"], text)
+            enhanced.append(segment_data)
+        
+        self.segments.extend(enhanced)
+        return enhanced
+    
+    @property
+    def text(self):
+        """Texto completo formado pelos segmentos aprimorados até agora."""
+        return ' '.join(segment["text"] for segment in self.segments if segment["text"])
+
+def _prepare_text(text):
+    """Pré-processa o texto antes do spaCy e protege as porcentagens com marcadores."""
+    # Pré-processamento com regras básicas antes de usar o spaCy
+    # Isso ajuda a fornecer algumas dicas ao segmentador do spaCy
+    # Adicionar pontos temporários antes dos conectores, todos em uma única passada
+    processed_text = _CONNECTOR_RE.sub(lambda match: f'. {match.group(1).lower()} ', text)
+    
+    # Manipular porcentagens para preservar sua integridade
+    # Substituir temporariamente percentagens por marcadores especiais, cada ocorrência no seu lugar
+    percentage_markers = []
+    
+    def mask_percentage(match):
+        percentage_markers.append(match.group(0))
+        return f"__PERCENTAGE_{len(percentage_markers) - 1}__"
+    
+    processed_text = _PERCENTAGE_RE.sub(mask_percentage, processed_text)
+    
+    return processed_text, percentage_markers
+
+def _render_doc(doc, percentage_markers):
+    """Reconstrói o texto a partir das sentenças do spaCy e aplica o pós-processamento."""
+    # Reconstruir o texto com pontuação adequada
+    sentences = []
+    for sent in doc.sents:
+        # Limpar pontuação temporária que adicionamos
+        sentence = _DOTS_RE.sub('.', sent.text.strip())
         
-        # Corrigir problemas com percentuais
-        improved_text = re.sub(r'%\s*\.', '%.', improved_text)
-        improved_text = re.sub(r'%\.\s*,', '%, ', improved_text)
+        # Capitalizar primeira letra
+        if sentence:
+            sentence = sentence[0].upper() + sentence[1:]
         
-        return improved_text
+        # Verificar se termina com pontuação
+        if sentence and sentence[-1] not in ['.', '!', '?']:
+            # Verificar se é uma pergunta
+            if _QUESTION_RE.search(sentence.lower()):
+                sentence += '?'
+            else:
+                sentence += '.'
         
-    except ImportError:
-        print("Biblioteca spaCy não encontrada. Instale com: pip install spacy")
-        print("Retornando texto sem aprimoramento.")
-        return text
+        sentences.append(sentence)
+    
+    # Juntar as sentenças
+    return _finalize_text(' '.join(sentences), percentage_markers)
+
+def _fix_punctuation_run(match):
+    """Normaliza uma sequência de pontuação (e o '%' que a precede, se houver)."""
+    # Remover espaços dentro da sequência e antes dela
+    run = ''.join(match.group(2).split())
+    
+    # Remover pontuação duplicada
+    collapsed = [run[0]]
+    for char in run[1:]:
+        if char != collapsed[-1]:
+            collapsed.append(char)
+    run = ''.join(collapsed)
+    
+    # Corrigir problemas com percentuais
+    if match.group(1):
+        if run.startswith('.,'):
+            return '%, ' + run[2:]
+        return '%' + run
+    return run
+
+def _finalize_text(improved_text, percentage_markers):
+    """Restaura as porcentagens e corrige a pontuação em uma única varredura de cada tipo."""
+    # Restaurar os marcadores de percentagem
+    if percentage_markers:
+        improved_text = _MARKER_RE.sub(lambda match: percentage_markers[int(match.group(1))], improved_text)
+    
+    # Pós-processamento: espaços antes de pontuação, pontuação duplicada e percentuais
+    return _PUNCTUATION_RUN_RE.sub(_fix_punctuation_run, improved_text)
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+import uuid
+
+from src.config import UPLOAD_MAX_MB, UPLOAD_MAX_DURATION_MINUTES, UPLOAD_CHUNK_MB, UPLOAD_SESSION_TTL_HOURS
+from src.utilidades_ffmpeg import resolve_ffmpeg
+
+# Extensões aceitas no upload
+ALLOWED_UPLOAD_EXTENSIONS = {'.mp3', '.wav', '.flac', '.aac', '.ogg', '.m4a'}
+
+UPLOAD_MAX_BYTES = UPLOAD_MAX_MB * 1024 * 1024
+UPLOAD_CHUNK_BYTES = UPLOAD_CHUNK_MB * 1024 * 1024
+
+# Tamanho dos blocos lidos do corpo da requisição
+READ_BLOCK_SIZE = 1024 * 1024
+
+# Tempo máximo (segundos) para o ffprobe ler o cabeçalho de um arquivo
+PROBE_TIMEOUT = 30
+
+class UploadError(ValueError):
+    """Upload recusado; `status` é o código HTTP correspondente."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def check_upload_name(filename):
+    """Confere a extensão do arquivo enviado e a retorna em minúsculas."""
+    if not filename:
+        raise UploadError('Nenhum arquivo selecionado')
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext not in ALLOWED_UPLOAD_EXTENSIONS:
+        raise UploadError('Formato de arquivo não suportado')
+    return file_ext
+
+def _too_large():
+    return UploadError(f'Arquivo maior que o limite de {UPLOAD_MAX_MB} MB', 413)
+
+class HashingFileWriter:
+    """
+    Arquivo aberto para escrita que atualiza `digest` e confere o limite de
+    tamanho a cada bloco gravado.
+
+    Serve de destino tanto para a cópia do corpo bruto (`receive_stream`)
+    quanto para o parser de multipart do Werkzeug (como `stream_factory`),
+    que só precisa de `write`, `seek` e `close`.
+    """
+
+    def __init__(self, path, digest, limit, append=False):
+        self.path = path
+        self.digest = digest
+        self.limit = limit
+        self.received = 0
+        self._file = open(path, "ab" if append else "wb")
+
+    def write(self, data):
+        self.received += len(data)
+        if self.received > self.limit:
+            raise _too_large()
+        self.digest.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # seek, read, close etc. vão direto para o arquivo
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+def receive_stream(stream, path, digest, limit, append=False):
+    """
+    Copia o corpo de uma requisição para `path` em blocos, atualizando `digest`.
+
+    O arquivo nunca fica inteiro na memória e o hash sai na mesma passada,
+    sem reler o arquivo depois.
+
+    Returns:
+        int: Bytes recebidos (levanta UploadError 413 se passar de `limit`)
+    """
+    with HashingFileWriter(path, digest, limit, append) as writer:
+        while True:
+            block = stream.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            writer.write(block)
+        return writer.received
+
+def probe_audio(path):
+    """
+    Formato, codec, duração, taxa de amostragem e canais do áudio.
+
+    Usa o ffprobe se ele estiver disponível; senão, lê o cabeçalho que o
+    próprio FFmpeg imprime (o pacote imageio-ffmpeg não traz o ffprobe).
+
+    Returns:
+        dict: Informações do primeiro fluxo de áudio ({} se o arquivo não
+        tiver áudio reconhecível), ou None se não houver FFmpeg
+    """
+    info = resolve_ffmpeg()
+    if info.ffprobe:
+        return _probe_with_ffprobe(info.ffprobe, path)
+    if info.available:
+        return _probe_with_ffmpeg(info.ffmpeg, path)
+    return None
+
+def _probe_with_ffprobe(ffprobe, path):
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams',
+             '-select_streams', 'a:0', path],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=PROBE_TIMEOUT
+        )
+        data = json.loads(result.stdout or b"{}")
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return {}
+    streams = data.get("streams") or []
+    if result.returncode != 0 or not streams:
+        return {}
+
+    stream, container = streams[0], data.get("format", {})
+    duration = stream.get("duration") or container.get("duration")
+    return {
+        "format": container.get("format_name"),
+        "codec": stream.get("codec_name"),
+        "duration": float(duration) if duration else None,
+        "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        "channels": stream.get("channels"),
+    }
+
+def _probe_with_ffmpeg(ffmpeg, path):
+    try:
+        result = subprocess.run([ffmpeg, '-hide_banner', '-nostdin', '-i', path],
+                                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                timeout=PROBE_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return {}
+    header = result.stderr.decode(errors="replace")
+
+    # Ex.: "Input #0, wav, from ...", "Duration: 01:02:03.45" e "Audio: pcm_s16le, 16000 Hz, mono"
+    audio = re.search(r"Audio: (\w+)[^,]*, (\d+) Hz, ([^,\n]+)", header)
+    if not audio:
+        return {}
+    container = re.search(r"Input #0, ([^ ]+), from", header)
+    duration = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", header)
+    layout = audio.group(3).strip()
+    return {
+        "format": container.group(1).rstrip(",") if container else None,
+        "codec": audio.group(1),
+        "duration": (int(duration.group(1)) * 3600 + int(duration.group(2)) * 60 + float(duration.group(3))
+                     if duration else None),
+        "sample_rate": int(audio.group(2)),
+        "channels": {"mono": 1, "stereo": 2}.get(layout, int(layout.split()[0]) if layout[:1].isdigit() else None),
+    }
+
+def finalize_upload(part_path, final_path):
+    """
+    Confere o arquivo recebido (áudio reconhecível, duração dentro do limite) e
+    o move para `final_path`. Um arquivo recusado é apagado.
+
+    Returns:
+        dict: Resultado de `probe_audio` (None se não houver FFmpeg para conferir)
+    """
+    probe = probe_audio(part_path)
+    try:
+        if probe is not None and not probe:
+            raise UploadError('O arquivo não contém áudio reconhecível', 415)
+        duration = (probe or {}).get("duration")
+        if UPLOAD_MAX_DURATION_MINUTES and duration and duration > UPLOAD_MAX_DURATION_MINUTES * 60:
+            raise UploadError(f'Áudio mais longo que o limite de {UPLOAD_MAX_DURATION_MINUTES:g} minutos', 413)
+    except UploadError:
+        os.remove(part_path)
+        raise
+    os.replace(part_path, final_path)
+    return probe
+
+class UploadSession:
+    """Upload em blocos de um arquivo de tamanho conhecido, recebido em `folder/<id>.part`."""
+
+    def __init__(self, filename, size, folder):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.size = size
+        self.path = os.path.join(folder, f"{self.id}.part")
+        self.received = 0
+        self.digest = hashlib.sha256()
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+
+    @property
+    def complete(self):
+        return self.received == self.size
+
+    def to_dict(self):
+        return {
+            "upload_session": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.received,
+            "chunk_size": UPLOAD_CHUNK_BYTES,
+        }
+
+class UploadSessionManager:
+    """
+    Sessões de upload retomáveis: o cliente declara nome e tamanho do arquivo e
+    envia blocos em sequência, cada um com o offset em que começa.
+
+    Se a conexão cair, o cliente consulta o offset recebido e continua dali.
+    Cada bloco vai direto para o arquivo parcial e atualiza o hash SHA-256,
+    de modo que, ao fim, o hash do arquivo já está pronto. As sessões ficam
+    em memória; as abandonadas há mais de `ttl_seconds` são descartadas.
+    """
+
+    def __init__(self, folder, ttl_seconds=UPLOAD_SESSION_TTL_HOURS * 3600):
+        self.folder = folder
+        self.ttl_seconds = ttl_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, filename, size):
+        check_upload_name(filename)
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('Tamanho do arquivo inválido')
+        if size > UPLOAD_MAX_BYTES:
+            raise _too_large()
+
+        self.expire()
+        session = UploadSession(filename, size, self.folder)
+        open(session.path, "wb").close()
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def write_chunk(self, session_id, offset, stream):
+        """
+        Acrescenta um bloco começando em `offset`.
+
+        Um offset diferente do já recebido levanta UploadError 409 (o cliente
+        deve consultar a sessão e continuar do offset informado). Se o bloco
+        falhar no meio, o arquivo e o hash voltam ao estado anterior.
+        """
+        session = self.get(session_id)
+        if session is None:
+            raise UploadError('Sessão de upload não encontrada', 404)
+        if not session.lock.acquire(blocking=False):
+            raise UploadError('Outro bloco desta sessão ainda está sendo recebido', 409)
+        try:
+            if offset != session.received:
+                raise UploadError(f'Offset esperado: {session.received}', 409)
+            digest = session.digest.copy()
+            try:
+                received = receive_stream(stream, session.path, digest, session.size - offset, append=True)
+            except BaseException:
+                with open(session.path, "r+b") as file:
+                    file.truncate(session.received)
+                raise
+            session.digest = digest
+            session.received += received
+            session.updated_at = time.time()
+            return session
+        finally:
+            session.lock.release()
+
+    def finish(self, session_id):
+        """Encerra uma sessão completa e retorna (caminho do arquivo parcial, nome original, SHA-256)."""
+        with self._lock:
+            session = self._sessions.pop(session_id)
+        return session.path, session.filename, session.digest.hexdigest()
+
+    def cancel(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None and os.path.exists(session.path):
+            os.remove(session.path)
+        return session is not None
+
+    def expire(self):
+        """Descarta as sessões sem atividade há mais de `ttl_seconds`."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [session_id for session_id, session in self._sessions.items()
+                       if session.updated_at < cutoff]
+        for session_id in expired:
+            self.cancel(session_id)
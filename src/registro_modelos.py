@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from src.config import WHISPER_MAX_LOADED_MODELS, WHISPER_MODEL_MEMORY_BUDGET_MB
+
+class _ModelEntry:
+    """Modelo carregado e mantido em memória pelo registro."""
+
+    def __init__(self, key, model, load_time, size_mb):
+        self.key = key
+        self.model = model
+        self.load_time = load_time
+        self.size_mb = size_mb
+        self.hits = 0
+        self.last_used = time.time()
+        # O Whisper instala hooks de cache no decodificador durante a transcrição,
+        # então cada modelo só pode ser usado por uma transcrição de cada vez
+        self.lock = threading.Lock()
+
+class ModelRegistry:
+    """
+    Registro de modelos carregados uma única vez por processo.
+
+    Os modelos ficam "quentes" em memória e são reaproveitados entre chamadas.
+    Quando há mais modelos do que o limite configurado (quantidade ou memória
+    estimada em MB), o modelo usado há mais tempo é descartado (LRU).
+    """
+
+    def __init__(self, max_models=None, memory_budget_mb=None):
+        self.max_models = max_models
+        self.memory_budget_mb = memory_budget_mb
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading_locks = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._total_load_time = 0.0
+
+    def _get_loading_lock(self, key):
+        with self._lock:
+            if key not in self._loading_locks:
+                self._loading_locks[key] = threading.Lock()
+            return self._loading_locks[key]
+
+    def get(self, key, loader, size_mb=0.0):
+        """Retorna a entrada do modelo `key`, carregando-o com `loader()` apenas na primeira vez."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                entry.last_used = time.time()
+                self._hits += 1
+                return entry
+
+        # Carregar fora do lock global para não bloquear outros modelos
+        with self._get_loading_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.hits += 1
+                    entry.last_used = time.time()
+                    self._hits += 1
+                    return entry
+                self._misses += 1
+
+            print(f"Carregando modelo '{key}' no registro de modelos...")
+            start_time = time.time()
+            model = loader()
+            load_time = time.time() - start_time
+            print(f"Modelo '{key}' carregado em {load_time:.2f} segundos")
+
+            entry = _ModelEntry(key, model, load_time, size_mb or 0.0)
+            with self._lock:
+                self._total_load_time += load_time
+                self._entries[key] = entry
+                self._evict(keep=key)
+            return entry
+
+    @contextmanager
+    def use(self, key, loader, size_mb=0.0):
+        """Empresta o modelo `key` com uso exclusivo durante o bloco `with`."""
+        entry = self.get(key, loader, size_mb)
+        with entry.lock:
+            yield entry.model
+
+    def _evict(self, keep=None):
+        """Descarta os modelos menos usados até respeitar os limites configurados."""
+        def over_limit():
+            if self.max_models and len(self._entries) > self.max_models:
+                return True
+            if self.memory_budget_mb:
+                used_mb = sum(entry.size_mb for entry in self._entries.values())
+                return used_mb > self.memory_budget_mb
+            return False
+
+        while len(self._entries) > 1 and over_limit():
+            oldest_key = next(iter(self._entries))
+            if oldest_key == keep:
+                break
+            # Modelos em uso continuam vivos até o fim da transcrição atual
+            self._entries.pop(oldest_key)
+            self._evictions += 1
+            print(f"Modelo '{oldest_key}' descartado do registro de modelos")
+
+    def unload(self, key):
+        """Remove explicitamente um modelo do registro."""
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        """Remove todos os modelos do registro."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Retorna estatísticas de uso do registro (acertos, faltas e tempos de carga)."""
+        with self._lock:
+            requests_count = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / requests_count) if requests_count else 0.0,
+                "evictions": self._evictions,
+                "total_load_time": round(self._total_load_time, 3),
+                "max_models": self.max_models,
+                "memory_budget_mb": self.memory_budget_mb,
+                "memory_used_mb": round(sum(entry.size_mb for entry in self._entries.values()), 1),
+                "loaded": [
+                    {
+                        "key": entry.key,
+                        "load_time": round(entry.load_time, 3),
+                        "hits": entry.hits,
+                        "size_mb": round(entry.size_mb, 1),
+                        "in_use": entry.lock.locked(),
+                        "last_used": entry.last_used,
+                    }
+                    for entry in self._entries.values()
+                ],
+            }
+
+# Registro único por processo
+_registry = ModelRegistry(
+    max_models=WHISPER_MAX_LOADED_MODELS or None,
+    memory_budget_mb=WHISPER_MODEL_MEMORY_BUDGET_MB or None,
+)
+
+def get_model_registry():
+    """Retorna o registro de modelos do processo."""
+    return _registry
@@ -0,0 +1,283 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from src.config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RETENTION
+from src.transcricao import transcribe_with_whisper, stream_with_whisper, resolve_profile, TranscriptionCancelled
+from src.processa_texto import SegmentEnhancer
+from src.indice_palavras import WordIndex
+from src.transcricao_compacta import CompactTranscript
+from src.armazenamento_decupagens import get_decupagem_store
+from src.admissao import get_admission_controller, AdmissionCancelled
+
+# Tempo máximo (segundos) que `cancel` aguarda uma tarefa em espera por vaga registrar o cancelamento
+CANCEL_WAIT_SECONDS = 2.0
+
+class QueueFullError(Exception):
+    """A fila de tarefas de transcrição atingiu o limite configurado."""
+
+def transcribe_file(file_path, language="pt-BR", model_size=None, enhance=True, progress_callback=None,
+                    segment_callback=None, profile=None, parallel_workers=None, backend=None):
+    """
+    Transcreve um arquivo e aplica o aprimoramento de texto, como faz a rota /api/transcribe.
+    
+    O aprimoramento é feito por segmento, à medida que os segmentos ficam
+    prontos: o texto e as palavras de cada segmento são pontuados mantendo os
+    timestamps, e o texto completo é a junção dos segmentos aprimorados.
+    `segment_callback`, se informado, recebe cada lote de segmentos já
+    aprimorados assim que ele é processado.
+    """
+    enhancer = SegmentEnhancer() if enhance else None
+    
+    def on_segments(segments):
+        if enhancer is not None:
+            segments = enhancer.feed(segments)
+        if segment_callback is not None:
+            segment_callback(segments)
+    
+    result = transcribe_with_whisper(file_path, language, model_size, progress_callback=progress_callback,
+                                     parallel_workers=parallel_workers, segment_callback=on_segments,
+                                     profile=profile, backend=backend)
+    
+    # Montar o resultado com os segmentos aprimorados, sem alterar o resultado original (que pode estar no cache)
+    transcript_text = result["text"]
+    if enhancer is not None and transcript_text and not transcript_text.startswith("Erro:"):
+        result = dict(result, text=enhancer.text, segments=enhancer.segments)
+    
+    return result
+
+def stream_transcribe_file(file_path, language="pt-BR", model_size=None, enhance=True, profile=None):
+    """
+    Transcreve um arquivo em streaming, gerando eventos à medida que os segmentos são decodificados.
+    
+    Yields:
+        dict: Eventos `{"type": "segments", "segments": [...], "progress": %}` para
+        cada bloco e, ao final, `{"type": "done", "text": ...}` com o texto completo,
+        o perfil, o modelo usados e o índice de palavras (`WordIndex`)
+    """
+    profile, model_size, _ = resolve_profile(profile, model_size)
+    enhancer = SegmentEnhancer() if enhance else None
+    all_segments = []
+    
+    for segments, decoded_seconds, total_seconds in stream_with_whisper(file_path, language, model_size,
+                                                                        profile=profile):
+        if enhancer is not None:
+            segments = enhancer.feed(segments)
+        all_segments.extend(segments)
+        yield {
+            "type": "segments",
+            "segments": segments,
+            "progress": round(100.0 * decoded_seconds / total_seconds, 1) if total_seconds else 100.0,
+        }
+    
+    text = " ".join(segment["text"] for segment in all_segments if segment["text"])
+    yield {"type": "done", "text": text, "profile": profile, "model": model_size,
+           "index": WordIndex.from_segments(all_segments).to_dict()}
+
+class TranscriptionJob:
+    """Tarefa de transcrição executada em segundo plano."""
+
+    def __init__(self, file_path, language, model_size, enhance, profile=None):
+        self.id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.language = language
+        self.profile, self.model_size, _ = resolve_profile(profile, model_size)
+        self.enhance = enhance
+        self.status = "queued"
+        self.progress = 0.0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.transcript_id = None
+        self.segments = []
+        self._word_index = None
+        self.error = None
+        self.future = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error", "cancelled")
+
+    @property
+    def word_index(self):
+        """Índice de palavras do resultado, construído uma vez quando a tarefa termina."""
+        if self.result is None:
+            return None
+        if self._word_index is None:
+            self._word_index = WordIndex.from_segments(self.result.to_dict()["segments"])
+        return self._word_index
+
+    def to_dict(self, include_result=False, segments_since=None, compact=False):
+        """
+        Representação da tarefa para a API.
+        
+        Com `segments_since`, inclui os segmentos já prontos a partir desse
+        índice, para que o cliente exiba a transcrição antes do fim da tarefa.
+        Com `compact`, o resultado vai no formato em colunas (`CompactTranscript.to_wire`).
+        """
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 1),
+            "file_path": self.file_path,
+            "model": self.model_size,
+            "profile": self.profile,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "segments_ready": len(self.result) if self.result is not None else len(self.segments),
+            "transcript_id": self.transcript_id,
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_result and self.result is not None:
+            result = self.result.to_wire() if compact else self.result.to_dict()
+            data["result"] = dict(result, index=self.word_index.to_dict())
+        if segments_since is not None:
+            if self.result is not None:
+                data["segments"] = [self.result.segment_dict(index)
+                                    for index in range(max(0, segments_since), len(self.result))]
+            else:
+                data["segments"] = self.segments[segments_since:]
+        return data
+
+class JobManager:
+    """
+    Fila de transcrições com um conjunto limitado de workers.
+
+    As tarefas recebem um ID ao serem enfileiradas; o progresso é medido pelo
+    tempo de áudio já decodificado pelo Whisper e pode ser consultado a qualquer
+    momento. Tarefas na fila ou em execução podem ser canceladas. Cada tarefa
+    ocupa uma vaga do controle de admissão de transcrições. Com um
+    `store` (`DecupagemStore`), o status de cada tarefa e a transcrição
+    concluída são guardados e sobrevivem a um reinício.
+    """
+
+    def __init__(self, max_workers=2, max_queue=32, retention=100, store=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retention = retention
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcricao")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_path, language="pt-BR", model_size=None, enhance=True, profile=None):
+        """Enfileira uma transcrição e retorna a tarefa criada."""
+        job = TranscriptionJob(file_path, language, model_size, enhance, profile)
+        with self._lock:
+            queued = sum(1 for existing in self._jobs.values() if existing.status == "queued")
+            if queued >= self.max_queue:
+                raise QueueFullError("Fila de transcrições cheia. Tente novamente em instantes.")
+            self._jobs[job.id] = job
+            self._prune()
+        self._persist(job)
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancela uma tarefa. Retorna a tarefa ou None se ela não existir."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.finished:
+            return job
+        job.cancel_event.set()
+        # Tarefas ainda na fila são canceladas imediatamente
+        if job.future is not None and job.future.cancel():
+            self._finish(job, "cancelled")
+        elif job.status == "queued" and job.future is not None:
+            # O worker está esperando uma vaga de transcrição: acordá-lo para que desista na hora
+            get_admission_controller("transcription").interrupt()
+            wait([job.future], timeout=CANCEL_WAIT_SECONDS)
+        return job
+
+    def _prune(self):
+        """Descarta as tarefas finalizadas mais antigas além do limite de retenção."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+
+    def _persist(self, job):
+        """Registra o status da tarefa no armazenamento; uma falha aqui não interrompe a transcrição."""
+        if self.store is None:
+            return
+        try:
+            self.store.save_job(job)
+        except Exception as e:
+            print(f"Erro ao registrar a tarefa {job.id}: {type(e).__name__}: {e}")
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self._persist(job)
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            self._finish(job, "cancelled")
+            return
+
+        # As tarefas dividem as vagas de transcrição com /api/transcribe, sem ocupar a fila de espera dele;
+        # uma tarefa cancelada enquanto espera desiste sem ocupar a vaga
+        try:
+            with get_admission_controller("transcription").slot(queue=False, cancel_event=job.cancel_event):
+                if job.cancel_event.is_set():
+                    self._finish(job, "cancelled")
+                    return
+                self._execute(job)
+        except AdmissionCancelled:
+            self._finish(job, "cancelled")
+
+    def _execute(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        self._persist(job)
+
+        def on_progress(decoded_seconds, total_seconds):
+            if job.cancel_event.is_set():
+                raise TranscriptionCancelled()
+            # Reservar os últimos 5% para o aprimoramento do texto
+            job.progress = min(95.0, 95.0 * decoded_seconds / total_seconds)
+
+        try:
+            result = transcribe_file(job.file_path, job.language, job.model_size, job.enhance,
+                                     progress_callback=on_progress,
+                                     segment_callback=job.segments.extend, profile=job.profile)
+            # As tarefas concluídas ficam retidas: guardar o resultado em colunas
+            job.result = CompactTranscript.from_result(result)
+            job.segments = []
+            if self.store is not None:
+                job.transcript_id = self.store.save_transcript(job.file_path, result, job.language)
+            job.progress = 100.0
+            self._finish(job, "done")
+        except TranscriptionCancelled:
+            print(f"Tarefa {job.id} cancelada")
+            self._finish(job, "cancelled")
+        except Exception as e:
+            print(f"Erro na tarefa {job.id}: {type(e).__name__}: {e}")
+            self._finish(job, "error", str(e))
+
+# Gerenciador único por processo
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """Retorna o gerenciador de tarefas do processo, criando-o no primeiro uso."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RETENTION, get_decupagem_store())
+        return _manager
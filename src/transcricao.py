@@ -1,75 +1,104 @@
 import os
-import requests
+import threading
+import types
 
-from src.config import MODELS_DIR
+from src.config import (MODELS_DIR, PARALLEL_TRANSCRIPTION_WORKERS, WHISPER_DECODING_PROFILE,
+                        WHISPER_BACKEND, CT2_MODELS_DIR, CT2_COMPUTE_TYPE, MODEL_DOWNLOAD_CONNECTIONS,
+                        VAD_ENABLED, VAD_MIN_SILENCE_MS, VAD_PADDING_MS, VAD_SILENCE_THRESH_DB,
+                        VAD_MIN_SAVING, WHISPER_SAMPLE_RATE)
+from src.registro_modelos import get_model_registry
+from src.cache_transcricao import get_transcript_cache
+from src.armazenamento_audio import get_audio_store
 from src.processa_audio import convert_mp3_to_wav
+from src.importacao import timed_import
+from src.auxiliares import file_sha256
+from src.download_modelos import (WHISPER_MODEL_URLS, expected_sha256, model_source, fetch_file,
+                                  discard_partial)
 
-def download_whisper_model(model_size="small", force=False):
-    """Baixa explicitamente um modelo Whisper para uso na pasta local do projeto."""
+# Modelos Whisper aceitos
+VALID_MODELS = ["tiny", "base", "small", "medium", "large"]
+
+# Perfis de decodificação: modelo padrão, beam search (None = busca gulosa) e
+# temperaturas de fallback. 'fast' é para rascunhos de decupagem (várias vezes
+# mais rápido, um pouco menos preciso); 'balanced' é o comportamento original.
+DECODING_PROFILES = {
+    "fast": {"model": "base", "beam_size": None, "temperature": (0.0,)},
+    "balanced": {"model": "small", "beam_size": 5, "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)},
+    "accurate": {"model": "medium", "beam_size": 5, "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)},
+}
+
+# Tamanho dos blocos na transcrição em streaming: curtos para o primeiro texto sair em segundos
+STREAM_CHUNK_MS = 30 * 1000
+
+def resolve_profile(profile=None, model_size=None):
+    """
+    Resolve o perfil de decodificação e o modelo a usar.
+    
+    Sem `profile`, usa WHISPER_DECODING_PROFILE da configuração; um
+    `model_size` explícito substitui o modelo padrão do perfil.
+    
+    Returns:
+        tuple: (nome do perfil, modelo, opções de decodificação {beam_size, temperature})
+    """
+    profile = profile or WHISPER_DECODING_PROFILE
+    if profile not in DECODING_PROFILES:
+        print(f"Perfil de decodificação '{profile}' inválido. Usando perfil 'balanced'.")
+        profile = "balanced"
+    
+    settings = DECODING_PROFILES[profile]
+    model_size = model_size or settings["model"]
+    if model_size not in VALID_MODELS:
+        print(f"Modelo '{model_size}' inválido. Usando modelo '{settings['model']}'.")
+        model_size = settings["model"]
+    
+    decoding = {"beam_size": settings["beam_size"], "temperature": settings["temperature"]}
+    return profile, model_size, decoding
+
+def download_whisper_model(model_size="small", force=False, mirror=None, connections=None):
+    """
+    Baixa explicitamente um modelo Whisper para uso na pasta local do projeto.
+
+    O download é retomável, pode usar várias conexões e só é gravado no lugar
+    do modelo depois de conferido o SHA-256 da URL oficial (veja
+    `src.download_modelos.fetch_file`). `mirror` (padrão: WHISPER_MODEL_MIRROR)
+    é uma pasta ou URL base com os arquivos <modelo>.pt, para nós sem internet.
+    """
     try:
-        import whisper
-        
         # Verificar se o modelo é válido
-        valid_models = ["tiny", "base", "small", "medium", "large"]
-        if model_size not in valid_models:
+        if model_size not in VALID_MODELS:
             print(f"Modelo '{model_size}' inválido. Usando modelo 'small'.")
             model_size = "small"
         
         # Definir caminhos
         model_path = os.path.join(MODELS_DIR, f"{model_size}.pt")
+        sha256 = expected_sha256(WHISPER_MODEL_URLS[model_size])
         
-        # Verificar se já existe
+        # Verificar se já existe e está íntegro (um download antigo interrompido deixava o arquivo corrompido)
         if os.path.exists(model_path) and not force:
-            print(f"Modelo '{model_size}' já está disponível localmente.")
-            file_size_mb = os.path.getsize(model_path) / (1024 * 1024)
-            print(f"Localização do modelo: {model_path}")
-            print(f"Tamanho do arquivo: {file_size_mb:.1f} MB")
-            return True
+            if sha256 and file_sha256(model_path) != sha256:
+                print(f"Modelo '{model_size}' local está corrompido (SHA-256 não confere). Baixando novamente...")
+            else:
+                print(f"Modelo '{model_size}' já está disponível localmente.")
+                file_size_mb = os.path.getsize(model_path) / (1024 * 1024)
+                print(f"Localização do modelo: {model_path}")
+                print(f"Tamanho do arquivo: {file_size_mb:.1f} MB")
+                return True
         
         if force:
             print(f"Forçando download do modelo '{model_size}'...")
+            discard_partial(model_path)
         
-        # URLs dos modelos
-        urls = {
-            "tiny": "https://openaipublic.azureedge.net/main/whisper/models/65147644a518d12f04e32d6f3b26facc3f8dd46e5390956a9424a650c0ce22b9/tiny.pt",
-            "base": "https://openaipublic.azureedge.net/main/whisper/models/ed3a0b6b1c0edf879ad9b11b1af5a0e6ab5db9205f891f668f8b0e6c6326e34e/base.pt",
-            "small": "https://openaipublic.azureedge.net/main/whisper/models/9ecf779972d90ba49c06d968637d720dd632c55bbf19d441fb42bf17a411e794/small.pt",
-            "medium": "https://openaipublic.azureedge.net/main/whisper/models/345ae4da62f9b3d59415adc60127b97c714f32e89e936602e85993674d08dcb1/medium.pt",
-            "large": "https://openaipublic.azureedge.net/main/whisper/models/e4b87e7e0bf463eb8e6956e646f1e277e901512310def2c24bf0e11bd3c28e9a/large.pt"
-        }
-        
-        if model_size not in urls:
-            print(f"URL para modelo '{model_size}' não encontrada.")
-            return False
-            
         # Baixar o modelo
+        source = model_source(model_size, mirror)
         print(f"Baixando modelo Whisper '{model_size}' (isso pode levar vários minutos)...")
+        print(f"Origem: {source}")
         print(f"O arquivo será salvo em: {model_path}")
         
         # Criar diretório se não existir
         if not os.path.exists(MODELS_DIR):
             os.makedirs(MODELS_DIR)
         
-        # Baixar com progresso
-        response = requests.get(urls[model_size], stream=True)
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 1024 * 1024  # 1 MB
-        
-        with open(model_path, 'wb') as file:
-            if total_size > 0:
-                print(f"Tamanho total do download: {total_size / (1024 * 1024):.1f} MB")
-                downloaded = 0
-                for data in response.iter_content(block_size):
-                    downloaded += len(data)
-                    file.write(data)
-                    done = int(50 * downloaded / total_size)
-                    percent = int(100 * downloaded / total_size)
-                    import sys
-                    sys.stdout.write(f"\r[{'=' * done}{' ' * (50-done)}] {percent}% ")
-                    sys.stdout.flush()
-                sys.stdout.write("\n")
-            else:
-                file.write(response.content)
+        fetch_file(source, model_path, sha256, connections or MODEL_DOWNLOAD_CONNECTIONS)
         
         print(f"Modelo '{model_size}' baixado com sucesso para {model_path}")
         file_size_mb = os.path.getsize(model_path) / (1024 * 1024)
@@ -81,17 +110,379 @@ def download_whisper_model(model_size="small", force=False):
         print(f"Erro ao baixar modelo Whisper: {e}")
         return False
 
-def transcribe_with_whisper(audio_file_path, language="pt", model_size="small"):
-    """Transcreve áudio usando o modelo Whisper da OpenAI com maior precisão."""
-    import whisper
-    
-    # Caminho para o modelo local
+def whisper_model_path(model_size="small"):
+    """Retorna o caminho do modelo Whisper local, verificando se ele existe."""
     model_path = os.path.join(MODELS_DIR, f"{model_size}.pt")
     
     # Verificar se o modelo existe localmente
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Modelo Whisper '{model_size}' não encontrado em: {model_path}")
     
+    return model_path
+
+def load_whisper_model(model_size="small", backend=None):
+    """
+    Retorna o modelo Whisper local pelo registro de modelos, carregando-o só na primeira vez.
+    
+    `backend` escolhe o backend de inferência (padrão: WHISPER_BACKEND da configuração).
+    """
+    return get_backend(backend).use_model(model_size)
+
+class TranscriptionCancelled(Exception):
+    """Levantada pelo callback de progresso para interromper uma transcrição em andamento."""
+
+# Callback de progresso da transcrição em execução na thread atual
+_progress_state = threading.local()
+
+def _install_progress_hook():
+    """Substitui a barra de progresso do Whisper para repassar o avanço da decodificação."""
+    tqdm = timed_import("tqdm")
+    whisper_transcribe = timed_import("whisper.transcribe")
+    
+    if getattr(whisper_transcribe, "_progress_hook_installed", False):
+        return
+    
+    class ProgressBar(tqdm.tqdm):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.decoded_frames = 0
+        
+        def update(self, n=1):
+            # O Whisper atualiza a barra a cada janela decodificada, em quadros de 10 ms
+            self.decoded_frames += n
+            callback = getattr(_progress_state, "callback", None)
+            if callback is not None and self.total:
+                callback(self.decoded_frames / 100.0, self.total / 100.0)
+            return super().update(n)
+    
+    whisper_transcribe.tqdm = types.SimpleNamespace(tqdm=ProgressBar)
+    whisper_transcribe._progress_hook_installed = True
+
+class WhisperBackend:
+    """
+    Backend de inferência do Whisper.
+    
+    Cada backend sabe onde ficam seus pesos locais, como carregá-los e como
+    transcrever um array float32 mono em 16 kHz, devolvendo sempre o mesmo
+    resultado estruturado (texto e segmentos com timestamps por palavra).
+    O progresso é informado pelo callback da thread atual (`_progress_state`).
+    """
+    
+    name = None
+    
+    def model_path(self, model_size):
+        """Caminho dos pesos locais do modelo; levanta FileNotFoundError se não existirem."""
+        raise NotImplementedError
+    
+    def model_size_mb(self, model_path):
+        """Memória estimada do modelo, pelo tamanho dos pesos em disco."""
+        return os.path.getsize(model_path) / (1024 * 1024)
+    
+    def download(self, model_size, force=False, mirror=None, connections=None):
+        """Baixa os pesos do modelo para o caminho de `model_path`; retorna se deu certo."""
+        raise NotImplementedError
+    
+    def load(self, model_size, model_path):
+        raise NotImplementedError
+    
+    def transcribe(self, model, audio, whisper_language, decoding):
+        raise NotImplementedError
+    
+    def use_model(self, model_size):
+        """Reserva o modelo no registro de modelos, carregando-o só na primeira vez."""
+        model_path = self.model_path(model_size)
+        return get_model_registry().use(
+            f"{self.name}:{model_size}",
+            lambda: self.load(model_size, model_path),
+            self.model_size_mb(model_path)
+        )
+
+class OpenAIWhisperBackend(WhisperBackend):
+    """Backend padrão: openai-whisper (PyTorch, fp32 na CPU)."""
+    
+    name = "openai"
+    
+    def model_path(self, model_size):
+        return whisper_model_path(model_size)
+    
+    def download(self, model_size, force=False, mirror=None, connections=None):
+        return download_whisper_model(model_size, force, mirror, connections)
+    
+    def load(self, model_size, model_path):
+        whisper = timed_import("whisper")
+        print(f"Carregando modelo Whisper {model_size} do local: {model_path}")
+        return whisper.load_model(model_path)
+    
+    def transcribe(self, model, audio, whisper_language, decoding):
+        if getattr(_progress_state, "callback", None) is not None:
+            _install_progress_hook()
+        return _run_whisper(model, audio, whisper_language, decoding)
+
+class FasterWhisperBackend(WhisperBackend):
+    """
+    Backend CTranslate2 (faster-whisper) com pesos quantizados em int8 na CPU.
+    
+    Os pesos convertidos ficam em CT2_MODELS_DIR/<modelo>, por exemplo:
+    ct2-transformers-converter --model openai/whisper-small --quantization int8
+    --output_dir src/models/ct2/small
+    """
+    
+    name = "faster-whisper"
+    
+    def __init__(self, compute_type="int8"):
+        self.compute_type = compute_type
+        # Threads por modelo (0 = todas); ajustado pelos processos da transcrição paralela
+        self.cpu_threads = 0
+    
+    def model_path(self, model_size):
+        model_path = os.path.join(CT2_MODELS_DIR, model_size)
+        if not os.path.exists(os.path.join(model_path, "model.bin")):
+            raise FileNotFoundError(f"Modelo CTranslate2 '{model_size}' não encontrado em: {model_path}")
+        return model_path
+    
+    def model_size_mb(self, model_path):
+        return sum(
+            os.path.getsize(os.path.join(model_path, name)) for name in os.listdir(model_path)
+        ) / (1024 * 1024)
+    
+    def download(self, model_size, force=False, mirror=None, connections=None):
+        """
+        Baixa os pesos CTranslate2 já convertidos (Hugging Face) para
+        CT2_MODELS_DIR/<modelo>. Eles vêm em float16 e são quantizados para
+        `compute_type` ao carregar. `mirror` e `connections` só valem para os
+        pesos .pt do openai-whisper.
+        """
+        model_path = os.path.join(CT2_MODELS_DIR, model_size)
+        if os.path.exists(os.path.join(model_path, "model.bin")) and not force:
+            print(f"Modelo CTranslate2 '{model_size}' já está disponível localmente.")
+            print(f"Localização do modelo: {model_path}")
+            return True
+        if mirror:
+            print("O espelho de modelos não vale para o backend faster-whisper; baixando do Hugging Face.")
+        
+        try:
+            download_model = timed_import("faster_whisper").download_model
+            print(f"Baixando modelo CTranslate2 '{model_size}' (isso pode levar vários minutos)...")
+            print(f"O modelo será salvo em: {model_path}")
+            download_model(model_size, output_dir=model_path)
+            print(f"Modelo '{model_size}' baixado com sucesso para {model_path}")
+            return True
+        except Exception as e:
+            print(f"Erro ao baixar modelo CTranslate2: {e}")
+            return False
+    
+    def load(self, model_size, model_path):
+        WhisperModel = timed_import("faster_whisper").WhisperModel
+        print(f"Carregando modelo CTranslate2 {model_size} ({self.compute_type}) do local: {model_path}")
+        return WhisperModel(model_path, device="cpu", compute_type=self.compute_type,
+                            cpu_threads=self.cpu_threads, local_files_only=True)
+    
+    def transcribe(self, model, audio, whisper_language, decoding):
+        segments, info = model.transcribe(
+            audio,
+            language=whisper_language,
+            beam_size=decoding["beam_size"] or 1,  # 1 = busca gulosa
+            temperature=list(decoding["temperature"]),
+            word_timestamps=True,
+            without_timestamps=False,
+        )
+        
+        # Os segmentos são decodificados à medida que o gerador é consumido
+        callback = getattr(_progress_state, "callback", None)
+        structured_segments = []
+        for segment in segments:
+            segment_data = {
+                "id": len(structured_segments),
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text.strip()
+            }
+            if segment.words:
+                segment_data["words"] = [
+                    {"word": word.word, "start": word.start, "end": word.end}
+                    for word in segment.words
+                ]
+            structured_segments.append(segment_data)
+            
+            if callback is not None and info.duration:
+                callback(min(segment.end, info.duration), info.duration)
+        
+        structured_transcription = {
+            "text": " ".join(segment["text"] for segment in structured_segments if segment["text"]),
+            "segments": structured_segments
+        }
+        print(f"Transcrição concluída com {len(structured_segments)} segmentos")
+        return structured_transcription
+
+# Backends disponíveis, pelo nome usado em WHISPER_BACKEND
+BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend(),
+    FasterWhisperBackend.name: FasterWhisperBackend(CT2_COMPUTE_TYPE),
+}
+
+def get_backend(name=None):
+    """Retorna o backend de inferência pelo nome (padrão: WHISPER_BACKEND da configuração)."""
+    name = name or WHISPER_BACKEND
+    if name not in BACKENDS:
+        print(f"Backend de inferência '{name}' inválido. Usando backend 'openai'.")
+        name = OpenAIWhisperBackend.name
+    return BACKENDS[name]
+
+def transcribe_with_whisper(audio_file_path, language="pt", model_size=None, progress_callback=None,
+                            parallel_workers=None, use_cache=True, segment_callback=None, profile=None,
+                            backend=None, vad=None):
+    """
+    Transcreve áudio usando o modelo Whisper da OpenAI com maior precisão.
+    
+    `backend` escolhe o backend de inferência ('openai' ou 'faster-whisper');
+    sem ele, usa WHISPER_BACKEND da configuração. Todos produzem o mesmo
+    resultado estruturado.
+    
+    Com a detecção de voz (`vad`, padrão VAD_ENABLED, desligada salvo
+    configuração), as pausas longas são removidas antes da decodificação e os
+    timestamps voltam para a linha do tempo original.
+    
+    `profile` escolhe o perfil de decodificação (veja DECODING_PROFILES) e
+    `model_size`, se informado, substitui o modelo do perfil. O perfil e o
+    modelo usados são registrados no resultado.
+    
+    Se `progress_callback` for informado, ele é chamado como
+    `progress_callback(segundos_decodificados, duracao_total)` a cada janela
+    decodificada e pode levantar `TranscriptionCancelled` para interromper.
+    
+    Com `parallel_workers` maior que 1, o áudio é dividido nas pausas e os
+    blocos são transcritos em paralelo por processos separados. Se não for
+    informado, usa PARALLEL_TRANSCRIPTION_WORKERS da configuração.
+    
+    Transcrições do mesmo áudio com os mesmos parâmetros são servidas pelo
+    cache de transcrições, a menos que `use_cache` seja False.
+    
+    Se `segment_callback` for informado, ele recebe listas de segmentos novos,
+    na ordem do áudio, assim que ficam prontos (a cada bloco no modo paralelo,
+    ou todos de uma vez ao final); cada segmento é entregue uma única vez.
+    """
+    profile, model_size, decoding = resolve_profile(profile, model_size)
+    backend = get_backend(backend)
+    audio_file_path = _check_audio_file(audio_file_path)
+    
+    whisper_language = _whisper_language(language)
+    
+    if parallel_workers is None:
+        parallel_workers = PARALLEL_TRANSCRIPTION_WORKERS
+    if vad is None:
+        vad = VAD_ENABLED
+    
+    # Usar o PCM do upload já decodificado: o mesmo buffer serve para a chave do cache e para a transcrição
+    audio = get_audio_store().get_whisper_audio(audio_file_path)
+    
+    # Consultar o cache de transcrições antes de rodar o Whisper
+    cache = get_transcript_cache() if use_cache else None
+    if cache is not None:
+        cache_key = cache.make_key(audio, _cache_params(model_size, whisper_language, decoding,
+                                                        parallel_workers > 1, backend=backend, vad=vad))
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            print("Transcrição encontrada no cache, Whisper não será executado")
+            if segment_callback is not None and cached_result["segments"]:
+                segment_callback(cached_result["segments"])
+            return dict(cached_result, profile=profile, model=model_size, backend=backend.name)
+    
+    print(f"Perfil de decodificação: {profile} (modelo {model_size}, backend {backend.name})")
+    # Decodificar só os trechos com voz; os segmentos são remapeados para a linha do tempo original
+    timeline = None
+    if vad:
+        from src.detecao_voz import gate_silence
+        audio, timeline = gate_silence(audio)
+    if timeline is not None and segment_callback is not None:
+        original_callback = segment_callback
+        
+        def segment_callback(segments):
+            original_callback(timeline.remap_segments(segments))
+    
+    result = _transcribe(audio, whisper_language, model_size, decoding, progress_callback, parallel_workers,
+                         segment_callback, backend)
+    if timeline is not None:
+        result = timeline.remap_result(result)
+    result["profile"] = profile
+    result["model"] = model_size
+    result["backend"] = backend.name
+    
+    if cache is not None:
+        cache.put(cache_key, result)
+    return result
+
+def stream_with_whisper(audio_file_path, language="pt", model_size=None, use_cache=True, profile=None,
+                        backend=None, vad=None):
+    """
+    Transcreve o áudio em blocos curtos, entregando os segmentos de cada bloco assim que ficam prontos.
+    
+    O áudio é dividido nas pausas em blocos de cerca de STREAM_CHUNK_MS, que
+    são transcritos em sequência pelo modelo do registro. O modelo só fica
+    reservado durante cada bloco, então outras transcrições podem se alternar
+    com o streaming. Ao final, a transcrição completa vai para o cache.
+    
+    Com a detecção de voz, os blocos são planejados sobre o áudio sem as
+    pausas longas e os segmentos são entregues na linha do tempo original.
+    
+    Yields:
+        tuple: (segmentos novos na linha do tempo original, segundos decodificados, duração total)
+    """
+    from src.transcricao_paralela import plan_transcription_chunks, shift_segments, stitch_chunk_results
+    
+    profile, model_size, decoding = resolve_profile(profile, model_size)
+    backend = get_backend(backend)
+    audio_file_path = _check_audio_file(audio_file_path)
+    whisper_language = _whisper_language(language)
+    
+    if vad is None:
+        vad = VAD_ENABLED
+    
+    audio = get_audio_store().get_whisper_audio(audio_file_path)
+    total_seconds = len(audio) / WHISPER_SAMPLE_RATE
+    
+    cache = get_transcript_cache() if use_cache else None
+    if cache is not None:
+        cache_key = cache.make_key(audio, _cache_params(model_size, whisper_language, decoding, False,
+                                                        stream=True, backend=backend, vad=vad))
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            print("Transcrição encontrada no cache, Whisper não será executado")
+            yield cached_result["segments"], total_seconds, total_seconds
+            return
+    
+    timeline = None
+    if vad:
+        from src.detecao_voz import gate_silence
+        audio, timeline = gate_silence(audio)
+    decode_seconds = len(audio) / WHISPER_SAMPLE_RATE
+    
+    chunks = plan_transcription_chunks(audio, STREAM_CHUNK_MS)
+    print(f"Transcrição em streaming: {len(chunks)} bloco(s) com modelo Whisper {model_size} (perfil {profile})")
+    
+    chunk_results = []
+    segment_count = 0
+    for start_ms, end_ms in chunks:
+        start_sample = start_ms * WHISPER_SAMPLE_RATE // 1000
+        end_sample = end_ms * WHISPER_SAMPLE_RATE // 1000
+        with backend.use_model(model_size) as model:
+            result = backend.transcribe(model, audio[start_sample:end_sample], whisper_language, decoding)
+        chunk_results.append((start_ms, result))
+        
+        segments = shift_segments(result["segments"], start_ms / 1000.0, segment_count)
+        segment_count += len(segments)
+        if timeline is not None:
+            segments = timeline.remap_segments(segments)
+        # Progresso proporcional ao áudio já decodificado (sem contar as pausas removidas)
+        yield segments, total_seconds * (end_ms / 1000.0) / decode_seconds, total_seconds
+    
+    if cache is not None:
+        result = stitch_chunk_results(chunk_results)
+        if timeline is not None:
+            result = timeline.remap_result(result)
+        cache.put(cache_key, dict(result, profile=profile, model=model_size, backend=backend.name))
+
+def _check_audio_file(audio_file_path):
+    """Verifica o arquivo de áudio e retorna seu caminho absoluto."""
     # Normalizar e verificar caminho do arquivo
     audio_file_path = os.path.abspath(audio_file_path)
     
@@ -99,7 +490,57 @@ def transcribe_with_whisper(audio_file_path, language="pt", model_size="small"):
         raise FileNotFoundError(f"Arquivo de áudio não encontrado: {audio_file_path}")
     
     print(f"Verificado o arquivo: {audio_file_path}")
+    return audio_file_path
+
+def _cache_params(model_size, whisper_language, decoding, parallel, stream=False, backend=None, vad=False):
+    """Parâmetros de decodificação que entram na chave do cache de transcrições."""
+    params = {
+        "model": model_size,
+        "language": whisper_language,
+        "beam_size": decoding["beam_size"],
+        "temperature": list(decoding["temperature"]),
+        "parallel": parallel,
+    }
+    # Os blocos do streaming são cortados em outros pontos, então o resultado pode diferir
+    if stream:
+        params["stream"] = True
+    # Outros backends (e quantizações) produzem resultados diferentes do openai-whisper
+    if backend is not None and backend.name != OpenAIWhisperBackend.name:
+        params["backend"] = backend.name
+        params["compute_type"] = backend.compute_type
+    # A detecção de voz muda o áudio enviado ao decodificador
+    if vad:
+        params["vad"] = [VAD_MIN_SILENCE_MS, VAD_PADDING_MS, VAD_SILENCE_THRESH_DB, VAD_MIN_SAVING]
+    return params
+
+def _transcribe(audio, whisper_language, model_size, decoding, progress_callback, parallel_workers,
+                segment_callback=None, backend=None):
+    """Escolhe entre a transcrição paralela em blocos e a transcrição com um único modelo."""
+    backend = backend or get_backend()
+    
+    # Modo paralelo: cada processo carrega o próprio modelo e transcreve blocos do áudio
+    if parallel_workers > 1:
+        from src.transcricao_paralela import transcribe_in_chunks
+        backend.model_path(model_size)
+        return transcribe_in_chunks(audio, whisper_language, model_size, parallel_workers,
+                                    progress_callback, segment_callback, decoding, backend.name)
     
+    # Obter o modelo do registro (carregado uma única vez por processo)
+    with backend.use_model(model_size) as model:
+        print(f"Transcrevendo com modelo Whisper {model_size}...")
+        _progress_state.callback = progress_callback
+        try:
+            result = backend.transcribe(model, audio, whisper_language, decoding)
+        finally:
+            _progress_state.callback = None
+    
+    # O Whisper só devolve os segmentos ao final da transcrição
+    if segment_callback is not None and result["segments"]:
+        segment_callback(result["segments"])
+    return result
+
+def _whisper_language(language):
+    """Converte códigos de idioma como 'pt-BR' para o formato do Whisper."""
     # Mapear códigos de idioma para formato do Whisper
     language_map = {
         "pt-BR": "pt",
@@ -112,37 +553,36 @@ def transcribe_with_whisper(audio_file_path, language="pt", model_size="small"):
     
     # Converter código de idioma se necessário
     if language in language_map:
-        whisper_language = language_map[language]
-    else:
-        whisper_language = language.split('-')[0]  # Extrair parte principal do código
-    
-    # Verificar se o modelo escolhido existe
-    valid_models = ["tiny", "base", "small", "medium", "large"]
-    if model_size not in valid_models:
-        print(f"Modelo '{model_size}' inválido. Usando modelo 'small'.")
-        model_size = "small"
+        return language_map[language]
+    return language.split('-')[0]  # Extrair parte principal do código
+
+def _run_whisper(model, audio, whisper_language, decoding=None):
+    """
+    Executa a transcrição com um modelo Whisper já carregado e estrutura o resultado.
     
-    print(f"Carregando modelo Whisper {model_size} do local: {model_path}")
+    `audio` pode ser o caminho do arquivo ou um array float32 mono em 16 kHz.
+    `decoding` traz o beam size e as temperaturas do perfil (padrão: 'balanced').
+    """
+    whisper = timed_import("whisper")
     
-    # Carregar modelo do caminho local
-    model = whisper.load_model(model_path)
+    if decoding is None:
+        _, _, decoding = resolve_profile("balanced")
     
-    print(f"Transcrevendo com modelo Whisper {model_size}...")
+    audio_file_path = audio if isinstance(audio, str) else None
     
     try:
         # Primeiro, verificamos se o arquivo é MP3 - Whisper tem problemas com MP3 em alguns sistemas
-        _, file_extension = os.path.splitext(audio_file_path)
         temp_wav = None
         
-        if (file_extension.lower() == '.mp3'):
+        if audio_file_path and os.path.splitext(audio_file_path)[1].lower() == '.mp3':
             print("Convertendo MP3 para WAV para compatibilidade com Whisper...")
             temp_wav = convert_mp3_to_wav(audio_file_path)
             if temp_wav:
-                audio_file_path = temp_wav
+                audio = temp_wav
             else:
                 raise RuntimeError("Falha ao converter MP3 para WAV para uso com Whisper")
             
-            print(f"Usando arquivo WAV temporário: {audio_file_path}")
+            print(f"Usando arquivo WAV temporário: {temp_wav}")
         
         # Transcrever com maior precisão e solicitar timestamps por palavra
         try:
@@ -150,55 +590,28 @@ def transcribe_with_whisper(audio_file_path, language="pt", model_size="small"):
             # As versões mais recentes do Whisper suportam word_timestamps
             try:
                 result = model.transcribe(
-                    audio_file_path,
+                    audio,
                     language=whisper_language,
                     fp16=False,          # Definir como False para compatibilidade com CPU
-                    verbose=True,        # Mais informações de debug
-                    beam_size=5,         # Aumentar beam search para maior precisão
+                    verbose=None,        # Sem imprimir cada segmento; o progresso vem do callback
+                    beam_size=decoding["beam_size"],  # Beam search do perfil (None = busca gulosa)
                     word_timestamps=True,  # Obter timestamps para cada palavra
                     without_timestamps=False,  # Assegurar que os timestamps serão gerados
-                    temperature=[0.0, 0.2, 0.4, 0.6, 0.8, 1.0]  # Usar várias temperaturas para melhores resultados
+                    temperature=list(decoding["temperature"])  # Temperaturas de fallback do perfil
                 )
             except TypeError:
                 # Se a versão não suporta word_timestamps, usar a API padrão
                 print("Esta versão do Whisper não suporta word_timestamps, usando método padrão")
                 result = model.transcribe(
-                    audio_file_path,
+                    audio,
                     language=whisper_language,
                     fp16=False,
-                    verbose=True,
-                    temperature=[0.0, 0.2, 0.4, 0.6, 0.8, 1.0]
+                    verbose=None,
+                    beam_size=decoding["beam_size"],
+                    temperature=list(decoding["temperature"])
                 )
             
-            # Estruturar a saída para incluir segmentos com timestamps
-            structured_transcription = {
-                "text": result["text"].strip(),
-                "segments": []
-            }
-            
-            # Processar os segmentos
-            for segment in result["segments"]:
-                segment_data = {
-                    "id": segment["id"],
-                    "start": segment["start"],
-                    "end": segment["end"],
-                    "text": segment["text"].strip()
-                }
-                
-                # Adicionar palavras com timestamps se disponíveis
-                if "words" in segment and segment["words"]:
-                    words = []
-                    for word_data in segment["words"]:
-                        if isinstance(word_data, dict) and "word" in word_data:
-                            words.append({
-                                "word": word_data["word"],
-                                "start": word_data["start"],
-                                "end": word_data["end"],
-                            })
-                    
-                    segment_data["words"] = words
-                
-                structured_transcription["segments"].append(segment_data)
+            structured_transcription = _structure_result(result)
                 
             print(f"Transcrição concluída com {len(structured_transcription['segments'])} segmentos")
             return structured_transcription
@@ -208,6 +621,8 @@ def transcribe_with_whisper(audio_file_path, language="pt", model_size="small"):
             if temp_wav and os.path.exists(temp_wav):
                 os.remove(temp_wav)
                 
+    except TranscriptionCancelled:
+        raise
     except Exception as e:
         print(f"Erro detalhado ao usar Whisper: {type(e).__name__}: {e}")
         # Tentar usar o método alternativo mais simples
@@ -215,12 +630,17 @@ def transcribe_with_whisper(audio_file_path, language="pt", model_size="small"):
             import whisper.transcribe
             print("Tentando método alternativo de transcrição...")
             # Carregar o áudio usando o método interno do whisper
-            audio = whisper.load_audio(audio_file_path)
+            if audio_file_path:
+                audio = whisper.load_audio(audio_file_path)
             # Transcrever usando método mais direto, ainda solicitando timestamps
             result = whisper.transcribe.transcribe(
                 model, 
                 audio, 
                 language=whisper_language,
+                fp16=False,
+                verbose=None,
+                beam_size=decoding["beam_size"],
+                temperature=list(decoding["temperature"]),
                 word_timestamps=True,
                 without_timestamps=False
             )
@@ -247,9 +667,43 @@ def transcribe_with_whisper(audio_file_path, language="pt", model_size="small"):
             print(f"Erro no método alternativo: {e2}")
             raise
 
+def _structure_result(result):
+    """Estrutura a saída do Whisper em texto e segmentos com timestamps por palavra."""
+    # Estruturar a saída para incluir segmentos com timestamps
+    structured_transcription = {
+        "text": result["text"].strip(),
+        "segments": []
+    }
+    
+    # Processar os segmentos
+    for segment in result["segments"]:
+        segment_data = {
+            "id": segment["id"],
+            "start": segment["start"],
+            "end": segment["end"],
+            "text": segment["text"].strip()
+        }
+        
+        # Adicionar palavras com timestamps se disponíveis
+        if "words" in segment and segment["words"]:
+            words = []
+            for word_data in segment["words"]:
+                if isinstance(word_data, dict) and "word" in word_data:
+                    words.append({
+                        "word": word_data["word"],
+                        "start": word_data["start"],
+                        "end": word_data["end"],
+                    })
+            
+            segment_data["words"] = words
+        
+        structured_transcription["segments"].append(segment_data)
+    
+    return structured_transcription
+
 def transcribe_audio(audio_file_path, language="pt-BR"):
     """Transcreve um arquivo de áudio para texto usando Google Speech Recognition."""
-    import speech_recognition as sr
+    sr = timed_import("speech_recognition")
     
     # Verificar se o arquivo existe
     if not os.path.exists(audio_file_path):
@@ -0,0 +1,255 @@
+from array import array
+from itertools import accumulate
+
+# Identificador do formato compacto (cache e API)
+WIRE_FORMAT = "compact-1"
+
+# Campos guardados em colunas; qualquer outro campo vai para os extras
+SEGMENT_FIELDS = ("id", "start", "end", "text", "words")
+WORD_FIELDS = ("word", "start", "end")
+
+def _encode_times(values):
+    """Coluna de tempos em diferenças de milissegundos, se isso não perder precisão; senão, floats."""
+    milliseconds = [round(value * 1000) for value in values]
+    if any(ms / 1000 != value for ms, value in zip(milliseconds, values)):
+        return list(values)
+    return {"ms_delta": [ms - previous for ms, previous in zip(milliseconds, [0] + milliseconds[:-1])]}
+
+def _decode_times(column):
+    if isinstance(column, dict):
+        return [ms / 1000 for ms in accumulate(column["ms_delta"])]
+    return column
+
+class CompactTranscript:
+    """
+    Transcrição estruturada em colunas, em vez de um dict por segmento e por palavra.
+
+    Os tempos ficam em arrays de float64, os ids em int64 e todos os textos
+    (primeiro os dos segmentos, depois os das palavras) em uma única string,
+    indexada por offsets. As palavras do segmento i são as de índice
+    [word_offsets[i], word_offsets[i + 1]). Campos fora do formato usual (em
+    segmentos, palavras ou no resultado) são guardados à parte, de modo que
+    `to_dict` reproduz exatamente o resultado original.
+    """
+
+    __slots__ = ("text", "meta", "buffer", "segment_ids", "segment_starts", "segment_ends",
+                 "segment_text_offsets", "word_offsets", "has_words", "word_starts", "word_ends",
+                 "word_text_offsets", "segment_extras", "word_extras")
+
+    def __init__(self, text, meta, buffer, segment_ids, segment_starts, segment_ends, segment_text_offsets,
+                 word_offsets, has_words, word_starts, word_ends, word_text_offsets,
+                 segment_extras=None, word_extras=None):
+        self.text = text
+        self.meta = meta
+        self.buffer = buffer
+        self.segment_ids = segment_ids
+        self.segment_starts = segment_starts
+        self.segment_ends = segment_ends
+        self.segment_text_offsets = segment_text_offsets
+        self.word_offsets = word_offsets
+        self.has_words = has_words
+        self.word_starts = word_starts
+        self.word_ends = word_ends
+        self.word_text_offsets = word_text_offsets
+        self.segment_extras = segment_extras or {}
+        self.word_extras = word_extras or {}
+
+    @classmethod
+    def from_result(cls, result):
+        """Converte uma transcrição estruturada (`{"text", "segments", ...}`) para o formato em colunas."""
+        segment_ids, segment_starts, segment_ends = array("q"), array("d"), array("d")
+        word_starts, word_ends = array("d"), array("d")
+        segment_texts, word_texts, word_counts = [], [], []
+        segment_extras, word_extras = {}, {}
+
+        for segment_index, segment in enumerate(result.get("segments", [])):
+            segment_ids.append(segment["id"])
+            segment_starts.append(segment["start"])
+            segment_ends.append(segment["end"])
+            segment_texts.append(segment["text"])
+            extras = {key: value for key, value in segment.items() if key not in SEGMENT_FIELDS}
+            if extras:
+                segment_extras[segment_index] = extras
+
+            words = segment.get("words")
+            # -1 distingue o segmento sem o campo "words" do segmento com lista vazia
+            word_counts.append(len(words) if "words" in segment else -1)
+            for word in words or []:
+                extras = {key: value for key, value in word.items() if key not in WORD_FIELDS}
+                if extras:
+                    word_extras[len(word_texts)] = extras
+                word_starts.append(word["start"])
+                word_ends.append(word["end"])
+                word_texts.append(word["word"])
+
+        return cls.from_columns(
+            text=result.get("text", ""),
+            meta={key: value for key, value in result.items() if key not in ("text", "segments")},
+            segment_texts=segment_texts,
+            word_buffer="".join(word_texts),
+            segment_ids=segment_ids,
+            segment_starts=segment_starts,
+            segment_ends=segment_ends,
+            word_counts=word_counts,
+            word_starts=word_starts,
+            word_ends=word_ends,
+            word_lengths=[len(word_text) for word_text in word_texts],
+            segment_extras=segment_extras,
+            word_extras=word_extras,
+        )
+
+    def __len__(self):
+        return len(self.segment_ids)
+
+    @property
+    def word_count(self):
+        return len(self.word_starts)
+
+    def segment_text(self, index):
+        return self.buffer[self.segment_text_offsets[index]:self.segment_text_offsets[index + 1]]
+
+    def word_text(self, index):
+        return self.buffer[self.word_text_offsets[index]:self.word_text_offsets[index + 1]]
+
+    def segment_dict(self, index):
+        """Segmento `index` no formato de dicionário da transcrição estruturada."""
+        segment = {
+            "id": self.segment_ids[index],
+            "start": self.segment_starts[index],
+            "end": self.segment_ends[index],
+            "text": self.segment_text(index),
+        }
+        if self.has_words[index]:
+            segment["words"] = [
+                dict({"word": self.word_text(word), "start": self.word_starts[word], "end": self.word_ends[word]},
+                     **self.word_extras.get(word, {}))
+                for word in range(self.word_offsets[index], self.word_offsets[index + 1])
+            ]
+        segment.update(self.segment_extras.get(index, {}))
+        return segment
+
+    def to_dict(self):
+        """Transcrição estruturada original (`{"text", "segments", ...}`), sem perdas."""
+        return dict({"text": self.text, "segments": [self.segment_dict(index) for index in range(len(self))]},
+                    **self.meta)
+
+    def to_wire(self):
+        """
+        Formato compacto para o cache e a API: colunas em listas JSON, textos em
+        um único buffer e comprimentos no lugar de offsets.
+
+        Colunas de tempo com no máximo milissegundos (o caso do Whisper) vão
+        como diferenças em milissegundos entre valores consecutivos; as demais
+        vão como floats. O texto de um segmento que é apenas a junção das suas
+        palavras não é repetido no buffer (comprimento -2). Nada é arredondado:
+        `from_wire(to_wire())` reproduz a transcrição original.
+        """
+        segment_lengths, buffer = [], []
+        for index in range(len(self)):
+            text = self.segment_text(index)
+            first, last = self.word_offsets[index], self.word_offsets[index + 1]
+            if last > first and text == self.buffer[self.word_text_offsets[first]:self.word_text_offsets[last]].strip():
+                segment_lengths.append(-2)
+            else:
+                segment_lengths.append(len(text))
+                buffer.append(text)
+        buffer.append(self.buffer[self.word_text_offsets[0]:])
+
+        wire = dict(self.meta, **{
+            "format": WIRE_FORMAT,
+            "text": self.text,
+            "buffer": "".join(buffer),
+            "segments": {
+                "id": self.segment_ids.tolist(),
+                "start": _encode_times(self.segment_starts),
+                "end": _encode_times(self.segment_ends),
+                "text_length": segment_lengths,
+                # -1 indica segmento sem o campo "words"
+                "word_count": [self.word_offsets[index + 1] - self.word_offsets[index] if self.has_words[index] else -1
+                               for index in range(len(self))],
+            },
+            "words": {
+                "start": _encode_times(self.word_starts),
+                "end": _encode_times(self.word_ends),
+                "text_length": [self.word_text_offsets[index + 1] - self.word_text_offsets[index]
+                                for index in range(self.word_count)],
+            },
+        })
+        if self.segment_extras or self.word_extras:
+            wire["extras"] = {
+                "segments": {str(index): extras for index, extras in self.segment_extras.items()},
+                "words": {str(index): extras for index, extras in self.word_extras.items()},
+            }
+        return wire
+
+    @classmethod
+    def from_wire(cls, wire):
+        """Reconstrói a transcrição a partir do formato compacto gerado por `to_wire`."""
+        segments, words = wire["segments"], wire["words"]
+        extras = wire.get("extras", {})
+        buffer = wire["buffer"]
+        word_counts = [max(count, 0) for count in segments["word_count"]]
+        word_offsets = list(accumulate(word_counts, initial=0))
+
+        # Textos das palavras: a parte final do buffer
+        stored_segment_chars = sum(length for length in segments["text_length"] if length >= 0)
+        word_text_offsets = list(accumulate(words["text_length"], initial=stored_segment_chars))
+
+        segment_texts, position = [], 0
+        for index, length in enumerate(segments["text_length"]):
+            if length >= 0:
+                segment_texts.append(buffer[position:position + length])
+                position += length
+            else:
+                first, last = word_offsets[index], word_offsets[index + 1]
+                segment_texts.append(buffer[word_text_offsets[first]:word_text_offsets[last]].strip())
+
+        return cls.from_columns(
+            text=wire["text"],
+            meta={key: value for key, value in wire.items()
+                  if key not in ("format", "text", "buffer", "segments", "words", "extras")},
+            segment_texts=segment_texts,
+            word_buffer=buffer[stored_segment_chars:],
+            segment_ids=segments["id"],
+            segment_starts=_decode_times(segments["start"]),
+            segment_ends=_decode_times(segments["end"]),
+            word_counts=segments["word_count"],
+            word_starts=_decode_times(words["start"]),
+            word_ends=_decode_times(words["end"]),
+            word_lengths=words["text_length"],
+            segment_extras={int(index): value for index, value in extras.get("segments", {}).items()},
+            word_extras={int(index): value for index, value in extras.get("words", {}).items()},
+        )
+
+    @classmethod
+    def from_columns(cls, text, meta, segment_texts, word_buffer, segment_ids, segment_starts, segment_ends,
+                     word_counts, word_starts, word_ends, word_lengths, segment_extras=None, word_extras=None):
+        """Monta a transcrição a partir das colunas já separadas (`word_counts` com -1 para segmentos sem "words")."""
+        segment_text_offsets = array("q", accumulate((len(segment_text) for segment_text in segment_texts), initial=0))
+        return cls(
+            text=text,
+            meta=meta,
+            buffer="".join(segment_texts) + word_buffer,
+            segment_ids=array("q", segment_ids),
+            segment_starts=array("d", segment_starts),
+            segment_ends=array("d", segment_ends),
+            segment_text_offsets=segment_text_offsets,
+            word_offsets=array("q", accumulate((max(count, 0) for count in word_counts), initial=0)),
+            has_words=array("b", (count >= 0 for count in word_counts)),
+            word_starts=array("d", word_starts),
+            word_ends=array("d", word_ends),
+            word_text_offsets=array("q", accumulate(word_lengths, initial=segment_text_offsets[-1])),
+            segment_extras=segment_extras,
+            word_extras=word_extras,
+        )
+
+    @staticmethod
+    def is_wire(data):
+        """Indica se `data` está no formato compacto."""
+        return isinstance(data, dict) and data.get("format") == WIRE_FORMAT
+
+    def nbytes(self):
+        """Memória aproximada ocupada pelas colunas e pelo buffer de texto."""
+        columns = (self.segment_ids, self.segment_starts, self.segment_ends, self.segment_text_offsets,
+                   self.word_offsets, self.has_words, self.word_starts, self.word_ends, self.word_text_offsets)
+        return sum(column.itemsize * len(column) for column in columns) + len(self.buffer.encode("utf-8"))
@@ -0,0 +1,333 @@
+import atexit
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from src.config import WHISPER_MAX_LOADED_MODELS, WHISPER_MODEL_MEMORY_BUDGET_MB, WHISPER_SAMPLE_RATE
+from src.processa_audio import detect_speech_ranges, merge_speech_ranges, plan_chunks
+from src.importacao import timed_import
+
+# Limites para o tamanho dos blocos enviados a cada processo
+MIN_CHUNK_MS = 30 * 1000
+MAX_CHUNK_MS = 5 * 60 * 1000
+
+def warm_up_model(model_size, threads_per_worker, backend_name):
+    """
+    Prepara o processo atual para transcrever: limita as threads da inferência
+    e carrega o modelo no registro de modelos.
+
+    Usada como inicializador dos processos do pool e para pré-carregar os
+    modelos no servidor e nos processos do lote.
+    """
+    from src.transcricao import get_backend, FasterWhisperBackend
+
+    # Evitar que cada processo tente usar todos os núcleos da máquina
+    backend = get_backend(backend_name)
+    if isinstance(backend, FasterWhisperBackend):
+        backend.cpu_threads = threads_per_worker
+    else:
+        torch = timed_import("torch")
+        torch.set_num_threads(threads_per_worker)
+
+    # Carregar o modelo uma única vez por processo (fica no registro de modelos)
+    with backend.use_model(model_size):
+        pass
+
+class _PoolEntry:
+    """Pool de processos em cache, com a memória estimada dos modelos e quantas transcrições o usam."""
+
+    def __init__(self, pool, workers, size_mb):
+        self.pool = pool
+        self.workers = workers
+        self.size_mb = size_mb
+        self.users = 0
+
+    @property
+    def memory_mb(self):
+        # Cada processo mantém sua própria cópia do modelo
+        return self.workers * self.size_mb
+
+# Pools de processos por (modelo, backend, processos), reaproveitados entre transcrições para
+# que cada processo carregue o modelo uma única vez. Ordenados do menos ao mais recentemente usado.
+_pools = OrderedDict()
+_pools_lock = threading.Lock()
+
+def _evict_worker_pools():
+    """
+    Encerra os pools ociosos usados há mais tempo até respeitar os mesmos
+    limites do registro de modelos (WHISPER_MAX_LOADED_MODELS pools e
+    WHISPER_MODEL_MEMORY_BUDGET_MB somando os modelos de todos os processos).
+
+    Pools em uso por uma transcrição não são encerrados; eles voltam a ser
+    avaliados quando a transcrição termina. Chamada com `_pools_lock`.
+    """
+    def over_limit():
+        if WHISPER_MAX_LOADED_MODELS and len(_pools) > WHISPER_MAX_LOADED_MODELS:
+            return True
+        total_mb = sum(entry.memory_mb for entry in _pools.values())
+        return bool(WHISPER_MODEL_MEMORY_BUDGET_MB) and total_mb > WHISPER_MODEL_MEMORY_BUDGET_MB
+
+    for key in list(_pools):
+        if not over_limit():
+            break
+        entry = _pools[key]
+        if entry.users:
+            continue
+        del _pools[key]
+        entry.pool.shutdown(wait=False, cancel_futures=True)
+        model_size, backend_name, workers = key
+        print(f"Pool de {workers} processo(s) do modelo {model_size} ({backend_name}) encerrado "
+              f"para liberar memória")
+
+@contextmanager
+def use_worker_pool(model_size, backend_name, workers):
+    """
+    Fornece o pool de `workers` processos de transcrição com o modelo
+    `model_size` do backend `backend_name`, criando-o se necessário.
+
+    Enquanto o bloco roda, o pool não é encerrado para abrir espaço a outro;
+    ao criar um pool novo, os pools ociosos usados há mais tempo são
+    encerrados se os limites de modelos carregados forem ultrapassados.
+
+    Os processos são iniciados com "spawn": criados com fork a partir de um
+    servidor com várias threads e com o torch/OpenMP já inicializados, eles
+    podem travar.
+    """
+    key = (model_size, backend_name, workers)
+    with _pools_lock:
+        entry = _pools.get(key)
+        if entry is None:
+            from src.transcricao import get_backend
+
+            backend = get_backend(backend_name)
+            size_mb = backend.model_size_mb(backend.model_path(model_size))
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=warm_up_model,
+                                       initargs=(model_size, threads_per_worker, backend_name))
+            entry = _PoolEntry(pool, workers, size_mb)
+            _pools[key] = entry
+        _pools.move_to_end(key)
+        entry.users += 1
+        _evict_worker_pools()
+    try:
+        yield entry.pool
+    finally:
+        with _pools_lock:
+            entry.users -= 1
+            _evict_worker_pools()
+
+_main_lock = threading.Lock()
+
+@contextmanager
+def _worker_entry_point():
+    """
+    Inicia os processos do pool sem o script principal.
+
+    Com "spawn", cada processo novo reimporta o `__main__` do servidor
+    (app.py, decupagem.py) como `__mp_main__`. Os processos do pool só
+    precisam deste módulo, então enquanto eles são criados o `__main__` é
+    trocado por um módulo vazio, e o multiprocessing não tem o que reimportar.
+    O pool cria os processos dentro de `submit`, que deve rodar neste bloco.
+    """
+    with _main_lock:
+        main = sys.modules.get("__main__")
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
+
+def _discard_worker_pool(pool):
+    """Remove um pool quebrado (um processo morreu) para que a próxima transcrição crie outro."""
+    with _pools_lock:
+        for key, cached in list(_pools.items()):
+            if cached.pool is pool:
+                del _pools[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+@atexit.register
+def shutdown_worker_pools():
+    """Encerra os processos de todos os pools (chamada também ao sair do programa)."""
+    with _pools_lock:
+        pools = [entry.pool for entry in _pools.values()]
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _transcribe_chunk(chunk_audio, whisper_language, model_size, decoding, backend_name):
+    """Transcreve um bloco de áudio dentro de um processo do pool."""
+    from src.transcricao import get_backend
+
+    backend = get_backend(backend_name)
+    with backend.use_model(model_size) as model:
+        return backend.transcribe(model, chunk_audio, whisper_language, decoding)
+
+def plan_transcription_chunks(audio, target_chunk_ms):
+    """
+    Divide o áudio em blocos de cerca de `target_chunk_ms`, cortando nas pausas.
+
+    Args:
+        audio: Array float32 mono em 16 kHz, como retornado por `whisper.load_audio`
+
+    Returns:
+        list: Pares (início, fim) em milissegundos
+    """
+    import numpy as np
+
+    total_ms = int(len(audio) * 1000 / WHISPER_SAMPLE_RATE)
+
+    # Reaproveitar a detecção de silêncio sobre o mesmo PCM já decodificado
+    pcm16 = np.clip(audio * 32768.0, -32768, 32767).astype(np.int16)
+    speech_ranges = merge_speech_ranges(detect_speech_ranges(pcm16, WHISPER_SAMPLE_RATE))
+    return plan_chunks(speech_ranges, total_ms, target_chunk_ms)
+
+def find_chunk_boundaries(audio, workers):
+    """
+    Calcula os blocos de transcrição cortando nas pausas detectadas no áudio.
+
+    Args:
+        audio: Array float32 mono em 16 kHz, como retornado por `whisper.load_audio`
+        workers: Número de processos que vão transcrever os blocos
+
+    Returns:
+        list: Pares (início, fim) em milissegundos
+    """
+    total_ms = int(len(audio) * 1000 / WHISPER_SAMPLE_RATE)
+
+    # Blocos suficientes para ocupar todos os processos, sem ficarem curtos demais
+    target_chunk_ms = min(MAX_CHUNK_MS, max(MIN_CHUNK_MS, total_ms // (workers * 2)))
+    return plan_transcription_chunks(audio, target_chunk_ms)
+
+def shift_segments(segments, offset, first_id):
+    """Desloca os timestamps dos segmentos e das palavras e renumera os segmentos a partir de `first_id`."""
+    shifted = []
+    for segment in segments:
+        # Deslocar timestamps do segmento e das palavras para a posição global
+        segment_data = dict(segment)
+        segment_data["id"] = first_id + len(shifted)
+        segment_data["start"] = segment["start"] + offset
+        segment_data["end"] = segment["end"] + offset
+        if "words" in segment:
+            segment_data["words"] = [
+                dict(word, start=word["start"] + offset, end=word["end"] + offset)
+                for word in segment["words"]
+            ]
+        shifted.append(segment_data)
+    return shifted
+
+def stitch_chunk_results(chunk_results):
+    """
+    Junta os resultados dos blocos em uma única transcrição.
+
+    Args:
+        chunk_results: Lista de pares (início do bloco em ms, resultado estruturado)
+            na ordem do áudio
+
+    Returns:
+        dict: Transcrição com texto e segmentos na linha do tempo original
+    """
+    texts = []
+    segments = []
+
+    for chunk_start_ms, result in chunk_results:
+        if result["text"]:
+            texts.append(result["text"])
+        segments.extend(shift_segments(result["segments"], chunk_start_ms / 1000.0, len(segments)))
+
+    return {
+        "text": " ".join(texts),
+        "segments": segments
+    }
+
+def transcribe_in_chunks(audio, whisper_language, model_size="small", workers=None,
+                         progress_callback=None, segment_callback=None, decoding=None,
+                         backend_name=None):
+    """
+    Transcreve arquivos longos em paralelo, dividindo o áudio nas pausas.
+
+    Os processos do pool (veja `use_worker_pool`) são reaproveitados entre
+    chamadas e cada um mantém seu próprio modelo carregado; eles transcrevem
+    blocos independentes, e os segmentos e palavras são costurados de volta com
+    os deslocamentos corretos na linha do tempo original.
+
+    `audio` pode ser o caminho do arquivo ou o array float32 mono em 16 kHz
+    já decodificado.
+
+    Se `segment_callback` for informado, ele recebe os segmentos (já na linha
+    do tempo original) assim que todos os blocos anteriores estiverem prontos,
+    então cada segmento é entregue uma única vez e na ordem do áudio.
+
+    `decoding` traz o beam size e as temperaturas do perfil de decodificação e
+    `backend_name` o backend de inferência usado pelos processos.
+    """
+    from src.transcricao import get_backend, resolve_profile
+
+    backend_name = get_backend(backend_name).name
+    if decoding is None:
+        _, _, decoding = resolve_profile("balanced")
+
+    cpu_count = os.cpu_count() or 1
+    workers = workers or cpu_count
+    threads_per_worker = max(1, cpu_count // workers)
+
+    # Decodificar o arquivo uma única vez; os blocos são fatias deste array
+    if isinstance(audio, str):
+        audio = timed_import("whisper").load_audio(audio)
+    total_seconds = len(audio) / WHISPER_SAMPLE_RATE
+
+    chunks = find_chunk_boundaries(audio, workers)
+    print(f"Transcrição paralela: {len(chunks)} bloco(s) em {workers} processo(s) "
+          f"({threads_per_worker} thread(s) cada)")
+
+    start_time = time.time()
+    results = [None] * len(chunks)
+    decoded_seconds = 0.0
+    emitted_chunks = 0
+    emitted_segments = 0
+
+    with use_worker_pool(model_size, backend_name, workers) as pool:
+        futures = {}
+        try:
+            with _worker_entry_point():
+                for i, (start_ms, end_ms) in enumerate(chunks):
+                    start_sample = start_ms * WHISPER_SAMPLE_RATE // 1000
+                    end_sample = end_ms * WHISPER_SAMPLE_RATE // 1000
+                    future = pool.submit(_transcribe_chunk, audio[start_sample:end_sample],
+                                         whisper_language, model_size, decoding, backend_name)
+                    futures[future] = i
+
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = (chunks[i][0], future.result())
+
+                decoded_seconds += (chunks[i][1] - chunks[i][0]) / 1000.0
+                if progress_callback is not None:
+                    progress_callback(decoded_seconds, total_seconds)
+
+                # Entregar os blocos contíguos já concluídos
+                while emitted_chunks < len(results) and results[emitted_chunks] is not None:
+                    chunk_start_ms, result = results[emitted_chunks]
+                    segments = shift_segments(result["segments"], chunk_start_ms / 1000.0, emitted_segments)
+                    emitted_chunks += 1
+                    emitted_segments += len(segments)
+                    if segment_callback is not None and segments:
+                        segment_callback(segments)
+        except BrokenProcessPool:
+            _discard_worker_pool(pool)
+            raise
+        except BaseException:
+            # Não deixar os blocos restantes ocupando o pool se a transcrição foi interrompida
+            for future in futures:
+                future.cancel()
+            raise
+
+    print(f"Transcrição paralela concluída em {time.time() - start_time:.2f} segundos")
+    return stitch_chunk_results(results)
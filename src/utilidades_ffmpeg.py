@@ -1,81 +1,178 @@
 import os
+import re
 import shutil
+import subprocess
+import threading
 import urllib.request
 import zipfile
 
-def check_ffmpeg():
-    """Verifica se o FFmpeg está disponível e, se não, tenta obter uma versão portátil."""
-    # Primeiro, verificar se existe o FFmpeg na pasta portable
-    ffmpeg_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ffmpeg_portable")
-    portable_ffmpeg_path = os.path.join(ffmpeg_dir, "bin", "ffmpeg.exe")
-    
-    # Se já existe o FFmpeg portable, usá-lo diretamente
-    if (os.path.exists(portable_ffmpeg_path)):
-        bin_path = os.path.join(ffmpeg_dir, "bin")
-        if (bin_path not in os.environ["PATH"]):
-            os.environ["PATH"] += os.pathsep + bin_path
-        print(f"Usando FFmpeg portátil: {portable_ffmpeg_path}")
-        return True
-    
-    # Verificar se o FFmpeg está no PATH do sistema
-    ffmpeg_path = shutil.which('ffmpeg')
-    if (ffmpeg_path):
-        print(f"FFmpeg encontrado no sistema: {ffmpeg_path}")
-        return True
-    
-    print("FFmpeg não encontrado. Tentando obter uma versão portátil...")
-    
-    # Tentar baixar automaticamente sem perguntar ao usuário
-    if download_portable_ffmpeg():
-        return True
-    
-    # Se não conseguiu baixar automaticamente, mostrar opções manuais
-    print("\nOpções para usar FFmpeg sem instalação administrativa:")
-    
-    print("\n1. Tentar baixar FFmpeg portátil novamente (para Windows)")
-    print("2. Instalar via conda (se você usa Anaconda/Miniconda)")
-    print("3. Tentar usar versão fornecida pelo imageio-ffmpeg")
-    print("4. Informar caminho para executável do FFmpeg manualmente")
-    
-    choice = input("\nEscolha uma opção (1-4) ou pressione Enter para cancelar: ")
-    
-    if not choice:
-        return False
-    
-    if choice == "1":
-        return download_portable_ffmpeg()
-    elif choice == "2":
-        print("\nExecute o seguinte comando no terminal:")
-        print("conda install -c conda-forge ffmpeg")
-        return False
-    elif choice == "3":
-        # Importação condicional para evitar erros de linter
-        imageio_ffmpeg = None
-        try:
-            # Tentativa de importar o módulo apenas quando necessário
-            import importlib
-            imageio_ffmpeg = importlib.import_module('imageio_ffmpeg')
-            
-            ffmpeg_path = imageio_ffmpeg.get_ffmpeg_exe()
-            os.environ["PATH"] += os.pathsep + os.path.dirname(ffmpeg_path)
-            print(f"Usando FFmpeg do pacote imageio_ffmpeg: {ffmpeg_path}")
-            return True
-        except ImportError:
-            print("O pacote imageio_ffmpeg não está instalado.")
-            print("Você pode instalá-lo com: pip install imageio-ffmpeg")
-            return False
-    elif choice == "4":
-        custom_path = input("\nInforme o caminho completo para o executável do FFmpeg: ")
-        if os.path.exists(custom_path) and os.path.isfile(custom_path):
-            os.environ["PATH"] += os.pathsep + os.path.dirname(custom_path)
-            print(f"FFmpeg adicionado ao PATH: {custom_path}")
-            return True
-        else:
-            print("Caminho inválido ou arquivo não encontrado.")
-            return False
+from src.config import FFMPEG_BINARY, FFMPEG_DIR, FFMPEG_PROBE_TIMEOUT, WHISPER_SAMPLE_RATE
+from src.importacao import timed_import
+
+class FFmpegNotFoundError(RuntimeError):
+    """O FFmpeg não foi encontrado em nenhum dos locais configurados."""
+
+class FFmpegInfo:
+    """
+    Resultado da descoberta do FFmpeg: executáveis, origem, versão e recursos.
+
+    `filters` e `encoders` são os nomes listados por `ffmpeg -filters` e
+    `ffmpeg -encoders`. Quando nenhum executável foi encontrado, `ffmpeg` é
+    None e `available` é falso.
+    """
+
+    def __init__(self, ffmpeg=None, ffprobe=None, source=None, version=None, filters=(), encoders=()):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.source = source
+        self.version = version
+        self.filters = frozenset(filters)
+        self.encoders = frozenset(encoders)
+
+    @property
+    def available(self):
+        return self.ffmpeg is not None
+
+    def has_filter(self, name):
+        return name in self.filters
+
+    def has_encoder(self, name):
+        return name in self.encoders
+
+    def missing_filters(self, names):
+        """Filtros de `names` que este FFmpeg não oferece (vazio se a lista de filtros não pôde ser lida)."""
+        if not self.filters:
+            return []
+        return [name for name in names if name not in self.filters]
+
+    def to_dict(self):
+        return {
+            "available": self.available,
+            "ffmpeg": self.ffmpeg,
+            "ffprobe": self.ffprobe,
+            "source": self.source,
+            "version": self.version,
+            "filters": len(self.filters),
+            "encoders": sorted(self.encoders),
+        }
+
+# Resultado da descoberta, guardado para o processo
+_ffmpeg_info = None
+_ffmpeg_lock = threading.Lock()
+# Último resultado mostrado por check_ffmpeg, para não repetir a mensagem
+_reported_info = None
+
+def resolve_ffmpeg(refresh=False):
+    """
+    Localiza o FFmpeg uma única vez por processo e retorna um `FFmpegInfo`.
+
+    A ordem de busca é: FFMPEG_BINARY, PATH do sistema, pacote imageio-ffmpeg
+    e a pasta FFMPEG_DIR. Nada é perguntado nem baixado, então a função pode
+    ser chamada em qualquer requisição do servidor; depois da primeira vez,
+    ela não toca no disco. O resultado, inclusive "não encontrado", fica
+    guardado até uma chamada com `refresh=True`.
+    """
+    global _ffmpeg_info
+    with _ffmpeg_lock:
+        if _ffmpeg_info is None or refresh:
+            _ffmpeg_info = _discover_ffmpeg()
+        return _ffmpeg_info
+
+def ffmpeg_executable():
+    """Caminho do FFmpeg resolvido; levanta FFmpegNotFoundError se não houver nenhum."""
+    info = resolve_ffmpeg()
+    if not info.available:
+        raise FFmpegNotFoundError("FFmpeg não encontrado (configure FFMPEG_BINARY ou FFMPEG_DIR, "
+                                  "instale no sistema ou instale o pacote imageio-ffmpeg)")
+    return info.ffmpeg
+
+def _ffmpeg_candidates():
+    """Executáveis candidatos, na ordem de prioridade: pares (origem, caminho)."""
+    if FFMPEG_BINARY:
+        yield "FFMPEG_BINARY", FFMPEG_BINARY
+    yield "PATH", "ffmpeg"
+    try:
+        yield "imageio-ffmpeg", timed_import("imageio_ffmpeg").get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        pass
+    yield "FFMPEG_DIR", os.path.join(FFMPEG_DIR, "ffmpeg")
+
+def _discover_ffmpeg():
+    for source, candidate in _ffmpeg_candidates():
+        ffmpeg = shutil.which(candidate)
+        if ffmpeg:
+            break
+        if source == "FFMPEG_BINARY":
+            # Um caminho configurado explicitamente e inválido não deve passar despercebido
+            print(f"Aviso: FFMPEG_BINARY não é um executável válido ({candidate}); procurando o FFmpeg em outros locais")
     else:
-        print("Opção inválida.")
-        return False
+        return FFmpegInfo()
+
+    ffmpeg = os.path.abspath(ffmpeg)
+    bin_dir = os.path.dirname(ffmpeg)
+    # Whisper e pydub chamam "ffmpeg" pelo nome: a pasta escolhida vai para a frente do PATH
+    if shutil.which("ffmpeg") != ffmpeg and os.path.basename(ffmpeg).lower() in ("ffmpeg", "ffmpeg.exe"):
+        os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    ffprobe = shutil.which("ffprobe", path=bin_dir) or shutil.which("ffprobe")
+
+    version_output = _probe(ffmpeg, "-version")
+    match = re.search(r"version\s+(\S+)", version_output)
+    return FFmpegInfo(
+        ffmpeg=ffmpeg,
+        ffprobe=os.path.abspath(ffprobe) if ffprobe else None,
+        source=source,
+        version=match.group(1) if match else None,
+        filters=_listed_names(_probe(ffmpeg, "-hide_banner", "-filters")),
+        encoders=_listed_names(_probe(ffmpeg, "-hide_banner", "-encoders")),
+    )
+
+def _probe(ffmpeg, *args):
+    """Saída de uma consulta rápida ao FFmpeg, ou "" se ele falhar ou demorar mais que o limite."""
+    try:
+        result = subprocess.run([ffmpeg, *args], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, timeout=FFMPEG_PROBE_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return result.stdout.decode(errors="replace")
+
+# Linha das tabelas de `ffmpeg -filters` e `-encoders`: flags (ex.: "TSC", "A....D") seguidas do nome
+_LISTED_NAME = re.compile(r"^\s*[A-Z.|]{3,}\s+(\S+)\s")
+
+def _listed_names(output):
+    """Nomes listados por `ffmpeg -filters` ou `-encoders` (a legenda do início é ignorada)."""
+    names = []
+    for line in output.splitlines():
+        match = _LISTED_NAME.match(line)
+        if match and match.group(1) != "=":
+            names.append(match.group(1))
+    return names
+
+def check_ffmpeg(allow_download=False):
+    """
+    Verifica se o FFmpeg está disponível e mostra onde ele foi encontrado.
+
+    Nunca pergunta nada nem acessa a rede, exceto com `allow_download` (uso
+    na linha de comando), quando a versão portátil é baixada se nenhum
+    FFmpeg for encontrado.
+    """
+    global _reported_info
+    info = resolve_ffmpeg()
+    if not info.available and allow_download and download_portable_ffmpeg():
+        info = resolve_ffmpeg(refresh=True)
+
+    if info is not _reported_info:
+        _reported_info = info
+        if info.available:
+            print(f"FFmpeg {info.version or '(versão desconhecida)'} encontrado ({info.source}): {info.ffmpeg}")
+            if not info.ffprobe:
+                print("Aviso: ffprobe não encontrado junto ao FFmpeg.")
+        else:
+            print("FFmpeg não encontrado. Opções para usá-lo sem instalação administrativa:")
+            print("- Instalar via conda: conda install -c conda-forge ffmpeg")
+            print("- Instalar o pacote imageio-ffmpeg: pip install imageio-ffmpeg")
+            print("- Informar o executável em FFMPEG_BINARY ou a pasta dele em FFMPEG_DIR")
+            print("- Baixar a versão portátil (Windows) com: python decupagem.py")
+    return info.available
 
 def download_portable_ffmpeg():
     """Baixa e configura uma versão portátil do FFmpeg."""
@@ -134,3 +231,97 @@ def download_portable_ffmpeg():
     except Exception as e:
         print(f"Erro ao baixar FFmpeg: {e}")
         return False
+
+def decode_audio(audio_path, sample_rate=WHISPER_SAMPLE_RATE, channels=1):
+    """
+    Decodifica um arquivo de áudio para PCM 16 bits com o FFmpeg, sem arquivos temporários.
+
+    Returns:
+        numpy.ndarray: Array int16 com formato (quadros, canais)
+    """
+    import numpy as np
+    
+    ffmpeg_cmd = [
+        ffmpeg_executable(), '-nostdin', '-threads', '0',
+        '-i', audio_path,
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ac', str(channels), '-ar', str(sample_rate),
+        '-'
+    ]
+    result = subprocess.run(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return np.frombuffer(result.stdout, dtype=np.int16).reshape(-1, channels)
+
+def resample_pcm(pcm, sample_rate, channels, target_rate, target_channels):
+    """Converte PCM 16 bits já em memória para outra taxa de amostragem e número de canais."""
+    import numpy as np
+    
+    ffmpeg_cmd = [
+        ffmpeg_executable(), '-nostdin',
+        '-f', 's16le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ac', str(target_channels), '-ar', str(target_rate),
+        'pipe:1'
+    ]
+    pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+    result = subprocess.run(ffmpeg_cmd, input=memoryview(pcm).cast('B'),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return np.frombuffer(result.stdout, dtype=np.int16).reshape(-1, target_channels)
+
+def encode_pcm_stream(buffers, sample_rate, channels, output_format='mp3', codec='libmp3lame',
+                      chunk_size=64 * 1024):
+    """
+    Codifica PCM 16 bits com o FFmpeg em streaming, sem arquivos temporários.
+
+    Os `buffers` (objetos com buffer protocol, como fatias de arrays NumPy) são
+    escritos no stdin do FFmpeg por uma thread enquanto os bytes codificados são
+    devolvidos à medida que ficam prontos.
+
+    Yields:
+        bytes: Pedaços do arquivo codificado
+    """
+    ffmpeg_cmd = [
+        ffmpeg_executable(), '-nostdin', '-loglevel', 'error',
+        '-f', 's16le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+        '-acodec', codec, '-f', output_format, 'pipe:1'
+    ]
+    process = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    
+    def write_input():
+        try:
+            for buffer in buffers:
+                process.stdin.write(buffer)
+        except (BrokenPipeError, OSError):
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+    
+    writer = threading.Thread(target=write_input, daemon=True)
+    writer.start()
+    
+    # Ler stderr em paralelo para o FFmpeg não travar com o buffer cheio
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+    
+    try:
+        while True:
+            data = process.stdout.read(chunk_size)
+            if not data:
+                break
+            yield data
+        
+        process.wait()
+        stderr_reader.join()
+        if process.returncode != 0:
+            error = b"".join(stderr_chunks).decode(errors="replace").strip()
+            raise RuntimeError(f"FFmpeg falhou ao codificar o áudio: {error}")
+    finally:
+        # Se o cliente desconectar no meio do download, encerrar o FFmpeg
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        writer.join()
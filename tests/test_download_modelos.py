@@ -0,0 +1,184 @@
+"""Downloads de src/download_modelos.py contra um servidor HTTP local com suporte a Range."""
+import glob
+import hashlib
+import os
+import re
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import download_modelos
+from src.download_modelos import ModelDownloadError, fetch_file
+
+PAYLOAD = os.urandom(256 * 1024)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+class _StandIn:
+    """Estado do servidor: se ele respeita Range e quantas respostas derrubar no meio."""
+
+    def __init__(self):
+        self.honor_range = True
+        self.advertise_ranges = True
+        self.drops = 0
+        self.drop_after = len(PAYLOAD) // 3
+        self.requests = []
+        self.lock = threading.Lock()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self, status, length, content_range=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        if self.server.stand_in.advertise_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._headers(200, len(PAYLOAD))
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        header = self.headers.get("Range")
+        with stand_in.lock:
+            stand_in.requests.append(header)
+            drop = stand_in.drops > 0
+            stand_in.drops -= drop
+
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", header or "")
+        if match and stand_in.honor_range:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(PAYLOAD) - 1
+            if start >= len(PAYLOAD):
+                self._headers(416, 0)
+                return
+            body = PAYLOAD[start:end + 1]
+            self._headers(206, len(body), f"bytes {start}-{end}/{len(PAYLOAD)}")
+        else:
+            body = PAYLOAD
+            self._headers(200, len(body))
+
+        if drop:
+            # Derrubar a conexão no meio da resposta, como uma rede instável
+            self.wfile.write(body[:stand_in.drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.stand_in = _StandIn()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/modelo.pt"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # Blocos menores que o arquivo de teste, para que a queda no meio deixe dados no .part
+    monkeypatch.setattr(download_modelos, "DOWNLOAD_BLOCK_SIZE", 16 * 1024)
+
+@pytest.fixture
+def small_parallel_size(monkeypatch):
+    monkeypatch.setattr(download_modelos, "MIN_PARALLEL_SIZE", 1024)
+
+def _leftovers(dest):
+    return glob.glob(f"{glob.escape(dest)}.part*")
+
+def _read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+def test_single_stream_resumes_after_dropped_connection(server, tmp_path):
+    dest = str(tmp_path / "modelo.pt")
+    server.stand_in.drops = 1
+
+    with pytest.raises(Exception):
+        fetch_file(server.url, dest, PAYLOAD_SHA256)
+    assert not os.path.exists(dest)
+    partial = os.path.getsize(f"{dest}.part")
+    assert 0 < partial < len(PAYLOAD)
+
+    fetch_file(server.url, dest, PAYLOAD_SHA256)
+    assert _read(dest) == PAYLOAD
+    assert server.stand_in.requests[-1] == f"bytes={partial}-"
+    assert _leftovers(dest) == []
+
+def test_parallel_ranges_resume_after_dropped_connection(server, tmp_path, small_parallel_size):
+    dest = str(tmp_path / "modelo.pt")
+    server.stand_in.drops = 2
+    server.stand_in.drop_after = 40 * 1024
+
+    with pytest.raises(Exception):
+        fetch_file(server.url, dest, PAYLOAD_SHA256, connections=4)
+    assert len(_leftovers(dest)) == 4
+    assert not os.path.exists(f"{dest}.part")
+    assert sum(os.path.getsize(path) for path in _leftovers(dest)) > 0
+
+    fetch_file(server.url, dest, PAYLOAD_SHA256, connections=4)
+    assert _read(dest) == PAYLOAD
+    assert _leftovers(dest) == []
+    # As faixas retomadas não recomeçam do início
+    resumed = [header for header in server.stand_in.requests[4:] if header]
+    assert resumed and not any(header.startswith("bytes=0-") for header in resumed)
+
+def test_interrupted_merge_leaves_no_range_files(server, tmp_path, small_parallel_size, monkeypatch):
+    dest = str(tmp_path / "modelo.pt")
+    copies = []
+    copyfileobj = shutil.copyfileobj
+
+    def failing_copy(source, target, length=0):
+        # A junção falha ao copiar a segunda faixa
+        copies.append(source)
+        if len(copies) == 2:
+            raise OSError("disco cheio")
+        copyfileobj(source, target, length)
+
+    monkeypatch.setattr(download_modelos.shutil, "copyfileobj", failing_copy)
+    with pytest.raises(OSError):
+        fetch_file(server.url, dest, PAYLOAD_SHA256, connections=4)
+    monkeypatch.undo()
+    assert os.path.exists(f"{dest}.part") and len(_leftovers(dest)) == 5
+
+    # O .part incompleto é continuado em conexão única; as faixas restantes são apagadas no fim
+    fetch_file(server.url, dest, PAYLOAD_SHA256, connections=4)
+    assert _read(dest) == PAYLOAD
+    assert _leftovers(dest) == []
+
+def test_sha256_mismatch_keeps_destination(server, tmp_path):
+    dest = str(tmp_path / "modelo.pt")
+    with open(dest, "wb") as file:
+        file.write(b"modelo anterior")
+
+    with pytest.raises(ModelDownloadError):
+        fetch_file(server.url, dest, "0" * 64)
+    assert _read(dest) == b"modelo anterior"
+    assert _leftovers(dest) == []
+
+@pytest.mark.parametrize("advertise_ranges", [False, True])
+def test_server_ignoring_range_restarts_from_zero(server, tmp_path, small_parallel_size, advertise_ranges):
+    dest = str(tmp_path / "modelo.pt")
+    server.stand_in.honor_range = False
+    server.stand_in.advertise_ranges = advertise_ranges
+    with open(f"{dest}.part", "wb") as file:
+        file.write(PAYLOAD[:1000])
+
+    fetch_file(server.url, dest, PAYLOAD_SHA256)
+    assert _read(dest) == PAYLOAD
+
+    os.remove(dest)
+    fetch_file(server.url, dest, PAYLOAD_SHA256, connections=4)
+    assert _read(dest) == PAYLOAD
+    assert _leftovers(dest) == []
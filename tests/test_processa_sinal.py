@@ -0,0 +1,89 @@
+"""Paridade das funções vetorizadas de src/processa_sinal.py com as originais do pydub."""
+import numpy as np
+import pytest
+from pydub import AudioSegment
+from pydub.effects import compress_dynamic_range
+from pydub.silence import detect_silence, detect_nonsilent
+
+from src.processa_sinal import (
+    INT16_MAX_AMPLITUDE,
+    compress_dynamic_range_array,
+    detect_nonsilent_ranges,
+    detect_silent_ranges,
+)
+
+# Diferença máxima aceita entre o compressor vetorizado e o do pydub: 1% do fundo de escala
+COMPRESSOR_TOLERANCE = int(0.01 * INT16_MAX_AMPLITUDE)
+
+def _segment(samples, sample_rate):
+    return AudioSegment(samples.tobytes(), frame_rate=sample_rate, sample_width=2, channels=samples.shape[1])
+
+def _pydub_samples(segment, shape):
+    return np.frombuffer(segment.raw_data, dtype=np.int16).reshape(shape).astype(np.int64)
+
+def _speech_like(seed, sample_rate, seconds, channels=1):
+    """Ruído com envelope em degraus de 50 ms, alternando fala alta, baixa e pausas."""
+    rng = np.random.default_rng(seed)
+    frames = int(sample_rate * seconds)
+    step = sample_rate // 20
+    levels = rng.choice([0.0, 0.002, 0.05, 0.4, 0.8], size=frames // step + 1, p=[0.2, 0.1, 0.2, 0.3, 0.2])
+    envelope = np.repeat(levels, step)[:frames]
+    noise = rng.normal(0.0, 1.0, (frames, channels)) * envelope[:, None] * 12000
+    return np.clip(noise, -32768, 32767).astype(np.int16)
+
+def _switching_tone(sample_rate, seconds=3.0, loud=0.9, quiet=0.05, period=0.5):
+    """Tom de 220 Hz alternando entre amplitude alta e baixa a cada `period` segundos."""
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    amplitude = np.where((t / period).astype(int) % 2 == 0, loud, quiet)
+    return (np.sin(2 * np.pi * 220 * t) * amplitude * 32767).astype(np.int16).reshape(-1, 1)
+
+@pytest.mark.parametrize("seed, sample_rate, channels, min_silence_len, silence_thresh, seek_step", [
+    (1, 16000, 1, 500, -40, 1),
+    (2, 16000, 1, 100, -30, 10),
+    (3, 44100, 2, 300, -35, 1),
+    (4, 8000, 1, 1000, -16, 7),
+])
+def test_silence_ranges_match_pydub(seed, sample_rate, channels, min_silence_len, silence_thresh, seek_step):
+    samples = _speech_like(seed, sample_rate, 4.0, channels)
+    segment = _segment(samples, sample_rate)
+    kwargs = dict(min_silence_len=min_silence_len, silence_thresh=silence_thresh, seek_step=seek_step)
+
+    assert detect_silent_ranges(samples, sample_rate, **kwargs) == detect_silence(segment, **kwargs)
+    assert detect_nonsilent_ranges(samples, sample_rate, **kwargs) == detect_nonsilent(segment, **kwargs)
+
+def test_silence_ranges_edge_cases():
+    sample_rate = 16000
+    silent = np.zeros((sample_rate * 2, 1), dtype=np.int16)
+    loud = (np.sin(np.arange(sample_rate * 2) * 0.1) * 20000).astype(np.int16).reshape(-1, 1)
+    short = loud[:sample_rate // 10]
+
+    for samples in (silent, loud, short):
+        segment = _segment(samples, sample_rate)
+        assert detect_silent_ranges(samples, sample_rate, 500, -40) == detect_silence(segment, 500, -40)
+        assert detect_nonsilent_ranges(samples, sample_rate, 500, -40) == detect_nonsilent(segment, 500, -40)
+
+@pytest.mark.parametrize("samples, sample_rate", [
+    (_switching_tone(16000), 16000),
+    (_switching_tone(44100, seconds=1.5), 44100),
+    (_speech_like(5, 16000, 3.0), 16000),
+    (_speech_like(6, 44100, 1.5, channels=2), 44100),
+])
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"threshold": -15.0, "ratio": 2.0},
+    {"threshold": -24.0, "ratio": 2.5, "attack": 10.0, "release": 100.0},
+])
+def test_compressor_within_tolerance_of_pydub(samples, sample_rate, kwargs):
+    expected = _pydub_samples(compress_dynamic_range(_segment(samples, sample_rate), **kwargs), samples.shape)
+    result = compress_dynamic_range_array(samples, sample_rate, **kwargs)
+
+    assert result.dtype == samples.dtype and result.shape == samples.shape
+    assert np.abs(result.astype(np.int64) - expected).max() <= COMPRESSOR_TOLERANCE
+
+def test_compressor_below_threshold_is_untouched():
+    samples = _switching_tone(16000, loud=0.05, quiet=0.01)
+    np.testing.assert_array_equal(compress_dynamic_range_array(samples, 16000), samples)
+
+def test_compressor_keeps_mono_shape():
+    samples = _switching_tone(16000, seconds=0.5).ravel()
+    assert compress_dynamic_range_array(samples, 16000).shape == samples.shape
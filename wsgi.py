@@ -0,0 +1,59 @@
+"""
+Ponto de entrada para produção.
+
+    gunicorn -c gunicorn.conf.py wsgi:app    (Linux)
+    python wsgi.py                           (waitress; também no Windows)
+
+Diferente de `python app.py` (servidor de desenvolvimento do Flask, com
+debug), aqui os modelos Whisper são carregados antes das primeiras
+requisições e as threads da inferência são divididas entre as vagas de
+transcrição do controle de admissão.
+"""
+import os
+import time
+
+from src.importacao import record_startup_phase, print_import_report
+from src.config import setup_whisper_environment, WHISPER_PRELOAD_MODELS, ADMISSION_TRANSCRIBE_CONCURRENCY
+
+_phase_start = time.perf_counter()
+from app import app, startup
+_phase_start = record_startup_phase("aplicação", _phase_start)
+
+def preload_models():
+    """
+    Carrega os modelos de WHISPER_PRELOAD_MODELS (padrão: o do perfil padrão) no
+    registro de modelos, limitando as threads de cada inferência para que as
+    transcrições simultâneas não disputem os mesmos núcleos.
+    """
+    from src.transcricao import resolve_profile, get_backend
+    from src.transcricao_paralela import warm_up_model
+
+    setup_whisper_environment()
+    if WHISPER_PRELOAD_MODELS.strip().lower() == "none":
+        return
+    models = [model.strip() for model in WHISPER_PRELOAD_MODELS.split(",") if model.strip()]
+    threads = max(1, (os.cpu_count() or 1) // ADMISSION_TRANSCRIBE_CONCURRENCY)
+    backend_name = get_backend().name
+
+    for model_size in models or [resolve_profile()[1]]:
+        start = time.perf_counter()
+        try:
+            warm_up_model(model_size, threads, backend_name)
+            record_startup_phase(f"modelo {model_size}", start)
+        except Exception as e:
+            print(f"Não foi possível pré-carregar o modelo '{model_size}': {type(e).__name__}: {e}")
+
+if __name__ == '__main__':
+    from src.admissao import required_threads
+
+    try:
+        from waitress import serve
+    except ImportError:
+        raise SystemExit("waitress não está instalado (pip install waitress). "
+                         "No Linux, use: gunicorn -c gunicorn.conf.py wsgi:app")
+
+    startup()
+    preload_models()
+    print_import_report()
+    serve(app, host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", "5000")),
+          threads=required_threads())